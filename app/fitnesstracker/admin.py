@@ -0,0 +1,74 @@
+import datetime
+
+from django.contrib import admin
+from django.db.models import Avg, Count, Max
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
+
+# Register your models here.
+from .models import RequestProfile
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = [
+        "created", "method", "path", "status", "duration", "query_count",
+        "query_duration", "duplicate_queries",
+    ]
+    list_filter = ["method", "status", "view",]
+    search_fields = ["path",]
+    date_hierarchy = "created"
+    readonly_fields = [field.name for field in RequestProfile._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                "slowest/",
+                self.admin_site.admin_view(self.slowest_view),
+                name="fitnesstracker_requestprofile_slowest",
+            ),
+        ] + super().get_urls()
+
+    def slowest_view(self, request):
+        """ List the views with the slowest average duration over the last
+        week, or the number of days given in the days parameter.
+        """
+        try:
+            days = max(int(request.GET.get("days", 7)), 1)
+        except ValueError:
+            days = 7
+        since = timezone.now() - datetime.timedelta(days=days)
+        views = (
+            RequestProfile.objects.filter(created__gte=since)
+            .values("view")
+            .annotate(
+                requests=Count("pk"),
+                average=Avg("duration"),
+                slowest=Max("duration"),
+                queries=Avg("query_count"),
+                query_duration=Avg("query_duration"),
+                duplicate_queries=Max("duplicate_queries"),
+            )
+            .order_by("-average")[:50]
+        )
+        # The changelist is sorted by the index of a column, counting the
+        # checkbox for the actions.
+        list_display = list(self.get_list_display(request))
+        if self.get_actions(request):
+            list_display.insert(0, "action_checkbox")
+        return TemplateResponse(
+            request, "admin/fitnesstracker/requestprofile/slowest.html", {
+                **self.admin_site.each_context(request),
+                "title": f"Slowest views over the last {days} days",
+                "opts": self.model._meta,
+                "views": views,
+                "duration_column": list_display.index("duration"),
+            },
+        )
+
+admin.site.register(RequestProfile, RequestProfileAdmin)
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class FitnessTrackerConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'fitnesstracker'
+    verbose_name = 'Fitness tracker'
+
+    def ready(self):
+        # Instrument the database connections as they are created.
+        from . import metrics, signals
@@ -0,0 +1,92 @@
+""" Helpers for async views. In Django 4.2 the built in view decorators, such
+as staff_member_required and require_GET, only support sync views and would
+hand the unawaited coroutine of an async view back to the handler, so there
+are async versions of them here.
+"""
+import datetime
+from functools import wraps
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseNotAllowed
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+async def aiterator(queryset, chunk_size: int=2000):
+    """ Iterate over a queryset from an async context, fetching chunk_size rows
+    at a time in a sync thread. This works for every kind of queryset, unlike
+    QuerySet.aiterator() in Django 4.2, which runs values_list() queries in the
+    async context and fails.
+    """
+    # Creating the iterator does not run the query, the first chunk does.
+    rows = queryset.iterator(chunk_size=chunk_size)
+    fetch = sync_to_async(lambda: list(islice(rows, chunk_size)))
+    while True:
+        chunk = await fetch()
+        for row in chunk:
+            yield row
+        if len(chunk) < chunk_size:
+            break
+
+def _is_staff(request) -> bool:
+    # Loading the user from the session queries the database, so it cannot be
+    # done directly in an async view.
+    return request.user.is_active and request.user.is_staff
+
+def async_staff_member_required(view_func):
+    """ Check that the user is logged in and is a staff member, redirecting to
+    the admin login page if not, like staff_member_required.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if await sync_to_async(_is_staff)(request):
+            return await view_func(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+    return wrapper
+
+def async_require_GET(view_func):
+    """ Only allow GET and HEAD requests, like require_GET. """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """ Handle conditional GET and HEAD requests with the ETag and last
+    modified date returned by the given async functions, like condition.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            etag = None
+            if etag_func is not None:
+                etag = await etag_func(request, *args, **kwargs)
+                etag = quote_etag(etag) if etag else None
+
+            last_modified = None
+            if last_modified_func is not None:
+                date = await last_modified_func(request, *args, **kwargs)
+                if date:
+                    if not timezone.is_aware(date):
+                        date = timezone.make_aware(date, datetime.timezone.utc)
+                    last_modified = int(date.timestamp())
+
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified,
+            )
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag and not response.has_header('ETag'):
+                    response.headers['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
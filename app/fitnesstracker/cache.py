@@ -0,0 +1,176 @@
+""" Caching kept consistent through version tokens stored in a shared cache.
+Computed values are cached under keys that include the version of the data
+they depend on, so that all of them can be invalidated at once by replacing
+the version rather than finding and deleting each key. Rarely changing values
+are cached in the memory of each process and loaded again when their version
+changes.
+"""
+import hashlib
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .metrics import cache_request
+
+# Distinguishes a missing value from a cached None.
+_missing = object()
+
+# The most seconds that a VersionedCache keeps values for in a cache that is not
+# shared between processes, as another process may have changed the data
+# without being able to replace this process's version of it.
+UNSHARED_TIMEOUT = 10
+
+def shared_version(key: str, alias: str='default') -> str:
+    """ Return the version token stored under key in the cache with the given
+    alias, creating one if there is none.
+    """
+    cache = caches[alias]
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+def replace_version(key: str, alias: str='default'):
+    caches[alias].set(key, uuid.uuid4().hex, timeout=None)
+
+class VersionedCache:
+    """ VersionedCache stores values computed from some data in the Django
+    cache with the given alias, under keys made from the given name, the
+    current version of the data and the parts that identify each value, such as
+    the parameters of a report. Data can be split into scopes, such as the
+    Measurements of each MeasurementType, that are versioned separately.
+    Invalidating a scope replaces its version once the current transaction
+    commits, so every value computed from it is missed from then on and left to
+    expire. Values that are also computed from the data of other
+    VersionedCaches can depend on them, given as (cache, scope) pairs, so that
+    they are invalidated along with them too.
+
+    A local memory cache holds a separate version in each process, so an
+    invalidation is only seen by the process that made it. Values are then
+    only kept for UNSHARED_TIMEOUT seconds, which bounds how stale the other
+    processes' values can be.
+    """
+    def __init__(self, name: str, alias: str='default', timeout=DEFAULT_TIMEOUT,
+                 depends_on=()):
+        self.name = name
+        self.alias = alias
+        self.timeout = timeout
+        self.depends_on = depends_on
+
+    def version_key(self, scope='') -> str:
+        return f'{self.name}:{scope}:version'
+
+    def _key(self, version, parts, scope) -> str:
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return f'{self.name}:{scope}:{version}:{digest}'
+
+    def version(self, scope='') -> str:
+        version = shared_version(self.version_key(scope), self.alias)
+        for cache, dependency_scope in self.depends_on:
+            version += ':' + cache.version(dependency_scope)
+        return version
+
+    def key(self, parts, scope='') -> str:
+        return self._key(self.version(scope), parts, scope)
+
+    def get_timeout(self, cache):
+        timeout = self.timeout
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = cache.default_timeout
+        if isinstance(cache, LocMemCache):
+            timeout = min(timeout or UNSHARED_TIMEOUT, UNSHARED_TIMEOUT)
+        return timeout
+
+    def get_or_set(self, parts, compute, scope=''):
+        """ Return the cached value for parts, calling compute() to compute
+        and cache it if it is not cached.
+        """
+        cache = caches[self.alias]
+        key = self.key(parts, scope)
+        value = cache.get(key, _missing)
+        cache_request(self.name, value is not _missing)
+        if value is _missing:
+            value = compute()
+            cache.set(key, value, self.get_timeout(cache))
+        return value
+
+    async def aget_or_set(self, parts, compute, scope=''):
+        """ An async version of get_or_set(), where compute() is awaited. """
+        cache = caches[self.alias]
+        version = await sync_to_async(self.version)(scope)
+        key = self._key(version, parts, scope)
+        value = await cache.aget(key, _missing)
+        cache_request(self.name, value is not _missing)
+        if value is _missing:
+            value = await compute()
+            await cache.aset(key, value, self.get_timeout(cache))
+        return value
+
+    def invalidate(self, scope=''):
+        transaction.on_commit(
+            lambda: replace_version(self.version_key(scope), self.alias)
+        )
+
+class SharedVersionCache:
+    """ SharedVersionCache holds a single value in process memory so that
+    reading it costs nothing. A version token for the value is kept in the
+    Django cache with the given alias, which should be one that is shared
+    between processes such as Redis or Memcached. Invalidating the value in
+    one process replaces the token, so that every process loads the value
+    again the next time it checks the token, which is at most once every
+    check_interval seconds. The value is also loaded again after max_age
+    seconds, which bounds how stale it can be if the cache is not shared, such
+    as with the default local memory cache.
+    """
+    def __init__(self, key: str, alias: str='default',
+                 check_interval: float=1.0, max_age: float=60.0):
+        self.key = key
+        self.alias = alias
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self.entry = None
+
+    def shared_version(self) -> str:
+        return shared_version(self.key, self.alias)
+
+    def get(self, load):
+        """ Return the cached value, calling load() to load it if it is not
+        cached or has been invalidated.
+        """
+        now = time.monotonic()
+        if self.entry is not None and now - self.entry[2] < self.max_age:
+            version, checked, loaded, value = self.entry
+            if now - checked < self.check_interval:
+                cache_request(self.key, True)
+                return value
+            if self.shared_version() == version:
+                self.entry = (version, now, loaded, value)
+                cache_request(self.key, True)
+                return value
+
+        cache_request(self.key, False)
+
+        # Read the version before loading so that a change made while the value
+        # is being loaded invalidates it again.
+        version = self.shared_version()
+        value = load()
+        self.entry = (version, now, now, value)
+        return value
+
+    def invalidate(self):
+        """ Drop the value in this process straight away and in every other
+        process once the current transaction, if any, commits, so that they
+        cannot load the value again before the change is visible to them.
+        """
+        self.entry = None
+        transaction.on_commit(self.replace_version)
+
+    def replace_version(self):
+        self.entry = None
+        replace_version(self.key, self.alias)
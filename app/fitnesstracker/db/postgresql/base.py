@@ -0,0 +1,97 @@
+""" A PostgreSQL database backend that takes its connections from a psycopg 3
+connection pool and returns them to it when Django closes them, rather than
+connecting to the database for every request. Django 4.2 has no connection
+pooling of its own.
+
+Each process has one pool for each database alias and configuration, which is
+configured through the "pool" dict in the database's OPTIONS with any of the arguments of
+psycopg_pool.ConnectionPool, such as min_size, max_size and timeout. As the
+pool keeps the connections open, CONN_MAX_AGE must be 0 so that Django hands
+them back at the end of every request, and CONN_HEALTH_CHECKS makes the pool
+check each connection before handing it out.
+"""
+import threading
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+from psycopg import IsolationLevel
+from psycopg_pool import ConnectionPool
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    @property
+    def pool_key(self) -> tuple:
+        """ The key of the pool that this connection uses, so that connections
+        to the same alias with different settings, such as those compared by
+        the benchmark_connections command, do not share a pool.
+        """
+        return (
+            self.alias,
+            self.settings_dict['CONN_HEALTH_CHECKS'],
+            repr(sorted(self.settings_dict['OPTIONS'].get('pool', {}).items())),
+        )
+
+    @property
+    def pool(self) -> ConnectionPool:
+        key = self.pool_key
+        with self._pools_lock:
+            if key not in self._pools:
+                if self.settings_dict['CONN_MAX_AGE'] != 0:
+                    raise ImproperlyConfigured(
+                        'CONN_MAX_AGE must be 0 for pooled database connections'
+                    )
+                conn_params = self.get_connection_params()
+                options = dict(conn_params.pop('pool'))
+                if self.settings_dict['CONN_HEALTH_CHECKS']:
+                    options.setdefault('check', ConnectionPool.check_connection)
+                self._pools[key] = ConnectionPool(
+                    kwargs=conn_params,
+                    name=f'{self.alias}-pool',
+                    open=True,
+                    **options,
+                )
+            return self._pools[key]
+
+    def close_pool(self):
+        """ Close the pool that this connection uses, along with every
+        connection in it, if it has been opened.
+        """
+        with self._pools_lock:
+            pool = self._pools.pop(self.pool_key, None)
+        if pool is not None:
+            pool.close()
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.setdefault('pool', {})
+        return conn_params
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = IsolationLevel.READ_COMMITTED
+        if 'isolation_level' in options:
+            try:
+                self.isolation_level = IsolationLevel(options['isolation_level'])
+            except ValueError:
+                raise ImproperlyConfigured(
+                    f'Invalid transaction isolation level '
+                    f'{options["isolation_level"]} specified. Use one of the '
+                    f'psycopg.IsolationLevel values.'
+                )
+
+        connection = self.pool.getconn()
+        if 'isolation_level' in options:
+            connection.isolation_level = self.isolation_level
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
+            # The connection belongs to the pool again, even if it was closed
+            # in the middle of a transaction.
+            self.connection = None
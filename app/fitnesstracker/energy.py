@@ -0,0 +1,204 @@
+""" Estimates of the energy burned by exercise and the daily energy balance.
+
+The calories of a SessionExercise are often not recorded, so they are
+estimated from the metabolic equivalent (MET) of its Exercise's type, its
+duration and the body weight from the latest Measurement of the
+settings.BODY_WEIGHT_MEASUREMENT type taken on or before its Session:
+
+    kcal = MET × body weight in kg × duration in hours
+
+The daily series of the energy taken in from the Journals, burned by exercise
+and the difference between them is computed for a whole range of days at once
+and cached until any of the Journals, workouts or body weights change.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import (
+    Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from measurements.models import (
+    Measurement, MeasurementType, measurement_as_of, measurements_as_of,
+)
+from nutrition.models import Journal, journal_totals_cache
+from workouts.models import Session, SessionExercise
+from .cache import VersionedCache
+
+# The MET of each Exercise.type, from the Compendium of Physical Activities:
+# moderate running or cycling, vigorous weight lifting and stretching.
+METS = {
+    'Aerobic': 7.0,
+    'Anaerobic': 6.0,
+    'Flexibility': 2.5,
+}
+
+KG_PER_POUND = 0.45359237
+
+# The daily energy series, which are also invalidated whenever the Journals'
+# totals are.
+energy_cache = VersionedCache(
+    'energy:daily', depends_on=[(journal_totals_cache, '')],
+)
+
+def body_weight_type():
+    return MeasurementType.objects.filter(
+        name=settings.BODY_WEIGHT_MEASUREMENT,
+    ).first()
+
+def met(prefix: str=''):
+    """ Return an expression of the MET of the Exercise of a SessionExercise,
+    where prefix is the path to the SessionExercise.
+    """
+    return Case(
+        *[
+            When(**{f'{prefix}exercise__type': type}, then=Value(value))
+            for type, value in METS.items()
+        ],
+        output_field=FloatField(),
+    )
+
+def body_weight(type: MeasurementType, date):
+    """ Return an expression of the body weight in kg as of a date, which is
+    usually an OuterRef. Dates before the first Measurement use the first.
+    """
+    if type is None:
+        return Value(None, output_field=FloatField())
+    first = Subquery(
+        Measurement.objects.filter(type=type).order_by('date').values('measurement')[:1]
+    )
+    weight = Coalesce(measurement_as_of(type.pk, date), first, output_field=FloatField())
+    if type.symbol.lower() in ('lb', 'lbs'):
+        weight = weight * Value(KG_PER_POUND)
+    return weight
+
+def body_weights(type: MeasurementType, dates: list) -> list:
+    """ Return the body weight in kg as of each of a list of dates, as
+    body_weight() does, with a single batched lookup rather than a subquery
+    for each.
+    """
+    if type is None:
+        return [None] * len(dates)
+    weights = measurements_as_of(type.pk, dates)
+    if None in weights:
+        first = (
+            Measurement.objects.filter(type=type).order_by('date')
+            .values_list('measurement', flat=True).first()
+        )
+        weights = [first if weight is None else weight for weight in weights]
+    if type.symbol.lower() in ('lb', 'lbs'):
+        weights = [
+            None if weight is None else weight * KG_PER_POUND for weight in weights
+        ]
+    return weights
+
+def with_burned_calories(queryset):
+    """ Annotate SessionExercises with the body_weight as of their Session, the
+    estimated_calories that they burned, if they have a duration, and the
+    burned_calories, which are the recorded calories if there are any and the
+    estimated ones otherwise.
+    """
+    return queryset.annotate(
+        body_weight=body_weight(body_weight_type(), OuterRef('session__date')),
+        estimated_calories=(
+            met() * F('body_weight') * F('duration') / Value(3600.0)
+        ),
+        burned_calories=Coalesce(
+            'calories', 'estimated_calories', output_field=FloatField(),
+        ),
+    )
+
+def daily_energy(start: datetime.date=None, end: datetime.date=None) -> list:
+    """ Return the energy balance of every day from start (inclusive) until end
+    (exclusive) with a Journal or a Session, in date order, as dicts of:
+
+    * intake: the kcal of the day's Journal, or None if there is none.
+    * burned: the kcal burned by the day's SessionExercises.
+    * estimated: how many of those kcal were estimated.
+    * unestimated: the number of SessionExercises without calories that could
+      not be estimated, because they have no duration or there is no body
+      weight to estimate them from.
+    * net: intake - burned, or None if there is no intake.
+    """
+    return energy_cache.get_or_set(
+        ('daily', start, end, settings.BODY_WEIGHT_MEASUREMENT),
+        lambda: _daily_energy(start, end),
+    )
+
+def _daily_energy(start, end):
+    def midnight(day):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time()))
+
+    journals = Journal.objects.all()
+    sessions = Session.objects.all()
+    if start is not None:
+        journals = journals.filter(date__gte=start)
+        sessions = sessions.filter(date__gte=midnight(start))
+    if end is not None:
+        journals = journals.filter(date__lt=end)
+        sessions = sessions.filter(date__lt=midnight(end))
+
+    # The recorded calories of each Session and the MET seconds of its
+    # SessionExercises without any, which are multiplied by the body weight,
+    # along with the number of those that cannot be estimated without a
+    # duration and the number that can only be estimated with a body weight.
+    totals = {
+        row['session_id']: row
+        for row in SessionExercise.objects.filter(session__in=sessions)
+        .values('session_id')
+        .annotate(
+            recorded=Coalesce(Sum('calories', output_field=FloatField()), 0.0),
+            met_seconds=Sum(
+                Case(
+                    When(calories__isnull=True, then=met() * F('duration')),
+                    output_field=FloatField(),
+                ),
+            ),
+            unestimated=Count('pk', filter=Q(
+                calories__isnull=True, duration__isnull=True,
+            )),
+            timed=Count('pk', filter=Q(
+                calories__isnull=True, duration__isnull=False,
+            )),
+        )
+        .order_by()
+    }
+
+    days = {}
+    def day(date):
+        if date not in days:
+            days[date] = {
+                'date': date, 'intake': None, 'burned': 0.0, 'estimated': 0.0,
+                'unestimated': 0, 'net': None,
+            }
+        return days[date]
+
+    for date, intake in journals.values_list('date', 'nutrition_summary__energy'):
+        day(date)['intake'] = intake or 0.0
+
+    # The body weights as of every Session with SessionExercises are looked up
+    # together.
+    rows = [
+        (pk, date)
+        for pk, date in sessions.order_by('date').values_list('pk', 'date')
+        if pk in totals
+    ]
+    weights = body_weights(body_weight_type(), [date for pk, date in rows])
+    for (pk, date), weight in zip(rows, weights):
+        total = totals[pk]
+        balance = day(timezone.localdate(date))
+        balance['burned'] += total['recorded']
+        balance['unestimated'] += total['unestimated']
+        if weight is None:
+            balance['unestimated'] += total['timed']
+        elif total['met_seconds']:
+            estimated = total['met_seconds'] * weight / 3600
+            balance['burned'] += estimated
+            balance['estimated'] += estimated
+
+    for balance in days.values():
+        if balance['intake'] is not None:
+            balance['net'] = balance['intake'] - balance['burned']
+    return sorted(days.values(), key=lambda balance: balance['date'])
@@ -0,0 +1,90 @@
+""" Streaming exports of the data from every app as CSV or newline-delimited
+JSON. Rows are read from the database in chunks through a server-side cursor
+where the database supports one and written out as they are read, so exports
+of any size use a constant amount of memory.
+"""
+import csv
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from fitnesstracker.asynchronous import aiterator
+from measurements.exports import EXPORTS as MEASUREMENT_EXPORTS
+from nutrition.exports import EXPORTS as NUTRITION_EXPORTS
+from workouts.exports import EXPORTS as WORKOUT_EXPORTS
+
+EXPORTS = {**NUTRITION_EXPORTS, **WORKOUT_EXPORTS, **MEASUREMENT_EXPORTS}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+
+class _Echo:
+    """ A file-like object that returns what is written to it, so that the csv
+    module can format one row at a time.
+    """
+    def write(self, value):
+        return value
+
+def parse_export_date(value):
+    """ Parse an ISO 8601 date or date and time into an aware datetime, treating
+    dates and naive datetimes as being in the current time zone.
+    """
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Invalid date: {value}')
+        date = datetime.datetime.combine(day, datetime.time())
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+def _formatter(format, columns):
+    """ Return the header line of the format, if it has one, and a function to
+    format a row as a line.
+    """
+    if format == 'csv':
+        writer = csv.writer(_Echo())
+        return writer.writerow(columns), writer.writerow
+
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    return None, lambda row: encoder.encode(dict(zip(columns, row))) + '\n'
+
+def _lines(header, format_row, rows):
+    if header is not None:
+        yield header
+    for row in rows:
+        yield format_row(row)
+
+async def _alines(header, format_row, rows):
+    if header is not None:
+        yield header
+    async for row in rows:
+        yield format_row(row)
+
+def export_lines(name: str, format: str='csv', start=None, end=None,
+                 chunk_size: int=CHUNK_SIZE, asynchronous: bool=False):
+    """ Return an iterator over the lines of the named export in the given
+    format, limited to the rows from start (inclusive) until end (exclusive).
+    Nothing is read from the database until the iterator is consumed. If
+    asynchronous is True, it is an async iterator for serving over ASGI.
+    """
+    if name not in EXPORTS:
+        raise ValueError(f'Invalid export: {name}')
+    if format not in FORMATS:
+        raise ValueError(f'Invalid format: {format}')
+
+    columns, rows = EXPORTS[name](start, end)
+    header, format_row = _formatter(format, columns)
+    if asynchronous:
+        return _alines(header, format_row, aiterator(rows, chunk_size))
+    return _lines(header, format_row, rows.iterator(chunk_size=chunk_size))
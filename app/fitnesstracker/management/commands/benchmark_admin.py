@@ -0,0 +1,155 @@
+import json
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from fitnesstracker.queries import QueryRecorder
+
+class Command(BaseCommand):
+    help = (
+        'Time every registered admin changelist, change form and autocomplete '
+        'and count the queries that each one makes. The report can be saved '
+        'and compared against a later run to spot regressions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='The username of the staff user to make the requests as, '
+                 'defaults to the first active superuser',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='The number of times to request each page',
+        )
+        parser.add_argument(
+            '--term', default='a',
+            help='The search term to use for the autocomplete requests',
+        )
+        parser.add_argument(
+            '--output', help='Save the report as JSON to the given file',
+        )
+        parser.add_argument(
+            '--compare', help='Compare the results with a previously saved report',
+        )
+
+    def handle(self, *args, **options):
+        self.user = self.get_user(options['user'])
+        self.client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        self.client.force_login(self.user)
+        self.repeat = options['repeat']
+
+        report = {}
+        for name, path in self.pages(options['term']):
+            report[name] = self.benchmark(path)
+            self.stdout.write(self.format(name, report[name]))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved the report to {options["output"]}')
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), report)
+
+    def get_user(self, username):
+        users = get_user_model().objects.filter(is_active=True, is_staff=True)
+        if username:
+            user = users.filter(username=username).first()
+        else:
+            user = users.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError(
+                'No active staff user to make the requests as, create one '
+                'with the createsuperuser command or pass --user'
+            )
+        return user
+
+    def pages(self, term):
+        """ Yield the name and path of every page of the admin to benchmark. """
+        autocompletes = set()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        for model, model_admin in admin.site._registry.items():
+            opts = model._meta
+            prefix = f'admin:{opts.app_label}_{opts.model_name}'
+            name = f'{opts.app_label}.{opts.model_name}'
+
+            yield f'{name} changelist', reverse(f'{prefix}_changelist')
+            if model_admin.has_add_permission(request):
+                yield f'{name} add', reverse(f'{prefix}_add')
+
+            obj = model._default_manager.order_by('-pk').first()
+            if obj is not None:
+                yield f'{name} change', reverse(f'{prefix}_change', args=[obj.pk])
+
+            # The autocomplete of each field that uses it.
+            for inline in [model_admin, *model_admin.inlines]:
+                source = getattr(inline, 'model', model)
+                for field_name in inline.autocomplete_fields:
+                    if (source, field_name) in autocompletes:
+                        continue
+                    autocompletes.add((source, field_name))
+                    yield (
+                        f'{source._meta.app_label}.{source._meta.model_name}.'
+                        f'{field_name} autocomplete',
+                        reverse('admin:autocomplete') + (
+                            f'?term={term}&app_label={source._meta.app_label}'
+                            f'&model_name={source._meta.model_name}'
+                            f'&field_name={field_name}'
+                        ),
+                    )
+
+    def benchmark(self, path):
+        timings, counts, query_timings = [], [], []
+        for _ in range(self.repeat):
+            with QueryRecorder() as queries:
+                start = time.perf_counter()
+                response = self.client.get(path)
+                timings.append((time.perf_counter() - start) * 1000)
+            counts.append(len(queries))
+            query_timings.append(queries.duration * 1000)
+
+        return {
+            'path': path,
+            'status': response.status_code,
+            'queries': statistics.median_low(counts),
+            'query_ms': round(statistics.median(query_timings), 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'min_ms': round(min(timings), 2),
+        }
+
+    def format(self, name, result):
+        return (
+            f'{name:<55} {result["status"]:>3} {result["queries"]:>5} queries '
+            f'{result["median_ms"]:>9.1f}ms'
+        )
+
+    def compare(self, baseline, report):
+        self.stdout.write('\nChanges compared with the baseline report:')
+        for name, result in report.items():
+            before = baseline.get(name)
+            if before is None:
+                self.stdout.write(f'{name:<55} new')
+                continue
+
+            queries = result['queries'] - before['queries']
+            change = (
+                (result['median_ms'] - before['median_ms'])
+                / max(before['median_ms'], 0.001) * 100
+            )
+            line = (
+                f'{name:<55} {queries:>+5} queries {change:>+8.1f}% time'
+            )
+            if queries > 0:
+                line = self.style.ERROR(line)
+            elif queries < 0:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
@@ -0,0 +1,97 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+POOLED_ENGINE = 'fitnesstracker.db.postgresql'
+
+class Command(BaseCommand):
+    help = (
+        'Time a series of simulated requests that each run a query, opening a '
+        'new database connection for every request and then reusing '
+        'persistent or pooled connections, to show the latency that each '
+        'saves per request.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='The database to connect to',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='The number of requests to simulate for each configuration',
+        )
+        parser.add_argument(
+            '--max-age', type=int, default=60,
+            help='The CONN_MAX_AGE to use for the persistent connections',
+        )
+        parser.add_argument(
+            '--query', default='SELECT 1',
+            help='The SQL query to run in each request',
+        )
+
+    def handle(self, *args, **options):
+        self.requests = options['requests']
+        self.query = options['query']
+        alias = options['database']
+        settings_dict = connections[alias].settings_dict
+
+        engine = settings_dict['ENGINE']
+        if engine == POOLED_ENGINE:
+            engine = 'django.db.backends.postgresql'
+        configurations = [
+            ('New connection per request', engine, 0, False),
+            ('Persistent connection', engine, options['max_age'], False),
+            (
+                'Persistent connection with health checks',
+                engine, options['max_age'], True,
+            ),
+        ]
+        if engine == 'django.db.backends.postgresql':
+            configurations += [
+                ('Connection pool', POOLED_ENGINE, 0, False),
+                ('Connection pool with health checks', POOLED_ENGINE, 0, True),
+            ]
+
+        baseline = None
+        for name, engine, max_age, health_checks in configurations:
+            wrapper = load_backend(engine).DatabaseWrapper({
+                **settings_dict,
+                'ENGINE': engine,
+                'CONN_MAX_AGE': max_age,
+                'CONN_HEALTH_CHECKS': health_checks,
+            }, alias)
+            try:
+                median = self.benchmark(wrapper)
+            finally:
+                wrapper.close()
+                if engine == POOLED_ENGINE:
+                    # Each configuration is timed with a pool of its own.
+                    wrapper.close_pool()
+
+            line = f'{name:<42} {median:>8.3f}ms median per request'
+            if baseline is None:
+                baseline = median
+            else:
+                line += f' {baseline - median:>+8.3f}ms saved'
+            self.stdout.write(line)
+
+    def benchmark(self, wrapper):
+        """ Return the median time in milliseconds of a request that runs the
+        query, including what Django does with the connection at the start and
+        end of every request.
+        """
+        timings = []
+        for _ in range(self.requests):
+            start = time.perf_counter()
+            # What the request_started and request_finished signals do.
+            wrapper.close_if_unusable_or_obsolete()
+            with wrapper.cursor() as cursor:
+                cursor.execute(self.query)
+                cursor.fetchall()
+            wrapper.close_if_unusable_or_obsolete()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
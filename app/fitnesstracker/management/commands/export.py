@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fitnesstracker.export import (
+    CHUNK_SIZE, EXPORTS, FORMATS, export_lines, parse_export_date,
+)
+
+class Command(BaseCommand):
+    help = (
+        'Export Journals, JournalItems, Sessions, SessionExercises or '
+        'Measurements as CSV or newline-delimited JSON, streaming the rows '
+        'from the database so that any amount of history can be exported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument(
+            '--format', choices=sorted(FORMATS), default='csv',
+            help='The format to export in, defaults to csv',
+        )
+        parser.add_argument(
+            '--start', help='Only export rows from this ISO 8601 date onwards',
+        )
+        parser.add_argument(
+            '--end', help='Only export rows from before this ISO 8601 date',
+        )
+        parser.add_argument(
+            '--output', help='Write the export to the given file rather than '
+                             'standard output',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='The number of rows to read from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            lines = export_lines(
+                options['name'], options['format'],
+                parse_export_date(options['start']),
+                parse_export_date(options['end']),
+                options['chunk_size'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as f:
+                f.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
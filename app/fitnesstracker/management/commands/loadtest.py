@@ -0,0 +1,179 @@
+import json
+import math
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from measurements.models import MeasurementType
+
+class Command(BaseCommand):
+    help = (
+        'Load test a running server by making many concurrent requests to the '
+        'read-heavy API endpoints and report the throughput and latency of '
+        'each. Run it against the server in WSGI and then ASGI mode, saving '
+        'the report of the first run and comparing the second with it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://localhost:8080',
+            help='The URL of the server to load test',
+        )
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='A path to request, which can be given more than once and '
+                 'defaults to the journal nutrition, measurement series and '
+                 'journals export endpoints',
+        )
+        parser.add_argument(
+            '--user',
+            help='The username of the staff user to make the requests as, '
+                 'defaults to the first active superuser',
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=20,
+            help='The number of requests to make at the same time',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='The number of requests to make to each path',
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=30.0,
+            help='The number of seconds to wait for each response',
+        )
+        parser.add_argument(
+            '--output', help='Save the report as JSON to the given file',
+        )
+        parser.add_argument(
+            '--compare', help='Compare the results with a previously saved report',
+        )
+
+    def handle(self, *args, **options):
+        self.base_url = options['base_url'].rstrip('/')
+        self.timeout = options['timeout']
+        self.cookie = self.session_cookie(options['user'])
+
+        report = {}
+        for path in options['paths'] or self.default_paths():
+            report[path] = self.load_test(
+                path, options['requests'], options['concurrency'],
+            )
+            self.stdout.write(self.format(path, report[path]))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(f'Saved the report to {options["output"]}')
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), report)
+
+    def session_cookie(self, username):
+        """ Log the user in and return the session cookie for the requests.
+        The session is saved with the configured session engine, so the
+        server must share the database and cache with this command.
+        """
+        users = get_user_model().objects.filter(is_active=True, is_staff=True)
+        if username:
+            user = users.filter(username=username).first()
+        else:
+            user = users.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError(
+                'No active staff user to make the requests as, create one '
+                'with the createsuperuser command or pass --user'
+            )
+
+        client = Client()
+        client.force_login(user)
+        name = settings.SESSION_COOKIE_NAME
+        return f'{name}={client.cookies[name].value}'
+
+    def default_paths(self):
+        paths = [reverse('nutrition:journal_nutrition')]
+        type_id = MeasurementType.objects.order_by('pk').values_list(
+            'pk', flat=True,
+        ).first()
+        if type_id is not None:
+            series = reverse('measurements:measurement_series', args=[type_id])
+            paths += [series, f'{series}?period=week']
+        paths.append(reverse('export', args=['journals']))
+        return paths
+
+    def request(self, path):
+        """ Make a request and return its status and latency in milliseconds.
+        The status is None if the request failed without a response.
+        """
+        request = urllib.request.Request(
+            self.base_url + path, headers={'Cookie': self.cookie},
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            status = None
+        return status, (time.perf_counter() - start) * 1000
+
+    def load_test(self, path, requests, concurrency):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(self.request, [path] * requests))
+        elapsed = time.perf_counter() - start
+
+        timings = sorted(ms for _status, ms in results)
+        errors = sum(1 for status, _ms in results if status != 200)
+        return {
+            'requests': requests,
+            'concurrency': concurrency,
+            'errors': errors,
+            'requests_per_second': round(requests / elapsed, 2),
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[math.ceil(len(timings) * 0.95) - 1], 2),
+            'max_ms': round(timings[-1], 2),
+        }
+
+    def format(self, path, result):
+        line = (
+            f'{path:<50} {result["requests_per_second"]:>8.1f} req/s '
+            f'{result["median_ms"]:>8.1f}ms median {result["p95_ms"]:>8.1f}ms p95'
+        )
+        if result['errors']:
+            line = self.style.ERROR(f'{line} {result["errors"]} errors')
+        return line
+
+    def compare(self, baseline, report):
+        self.stdout.write('\nChanges compared with the baseline report:')
+        for path, result in report.items():
+            before = baseline.get(path)
+            if before is None:
+                self.stdout.write(f'{path:<50} new')
+                continue
+
+            throughput = (
+                (result['requests_per_second'] - before['requests_per_second'])
+                / max(before['requests_per_second'], 0.001) * 100
+            )
+            p95 = (
+                (result['p95_ms'] - before['p95_ms'])
+                / max(before['p95_ms'], 0.001) * 100
+            )
+            line = f'{path:<50} {throughput:>+8.1f}% req/s {p95:>+8.1f}% p95'
+            if throughput < 0:
+                line = self.style.ERROR(line)
+            elif throughput > 0:
+                line = self.style.SUCCESS(line)
+            self.stdout.write(line)
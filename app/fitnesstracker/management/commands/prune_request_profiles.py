@@ -0,0 +1,41 @@
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from fitnesstracker.models import RequestProfile
+
+class Command(BaseCommand):
+    help = (
+        'Delete the RequestProfiles, and their cProfile statistics files, '
+        'that are older than a number of days.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help='The number of days of request profiles to keep (default: 7)',
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days must not be negative')
+        before = timezone.now() - datetime.timedelta(days=options['days'])
+        profiles = RequestProfile.objects.filter(created__lt=before)
+
+        files = 0
+        for path in profiles.filter(profile__isnull=False).values_list(
+            'profile', flat=True,
+        ).iterator():
+            try:
+                os.remove(path)
+                files += 1
+            except FileNotFoundError:
+                pass
+        deleted, _counts = profiles.delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} request profiles and {files} cProfile files '
+            f'from before {before:%Y-%m-%d %H:%M}'
+        ))
@@ -0,0 +1,282 @@
+import datetime
+import random
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from measurements.models import Measurement, MeasurementType
+from nutrition.models import (
+    FoodCategory, FoodItem, Journal, JournalItem, JournalNutritionSummary,
+)
+from workouts.models import (
+    Exercise, Location, Session, SessionExercise, SessionType,
+)
+
+FOOD_CATEGORIES = (
+    'Bakery', 'Cereals', 'Dairy', 'Drinks', 'Fish', 'Fruit', 'Meat', 'Pasta',
+    'Ready meals', 'Snacks', 'Sweets', 'Vegetables',
+)
+FOOD_WORDS = (
+    'apple', 'bacon', 'banana', 'bean', 'beef', 'berry', 'biscuit', 'bread',
+    'butter', 'cake', 'carrot', 'cheese', 'chicken', 'chilli', 'chocolate',
+    'coconut', 'cod', 'cola', 'cookie', 'cream', 'crisp', 'curry', 'egg',
+    'ginger', 'granola', 'ham', 'honey', 'juice', 'lamb', 'lemon', 'lentil',
+    'mango', 'milk', 'mushroom', 'noodle', 'nut', 'oat', 'onion', 'orange',
+    'pasta', 'pea', 'pepper', 'pie', 'pizza', 'pork', 'potato', 'prawn',
+    'rice', 'salmon', 'sausage', 'soup', 'spinach', 'steak', 'strawberry',
+    'sweetcorn', 'tea', 'tomato', 'tuna', 'vanilla', 'yoghurt',
+)
+BRANDS = (
+    'Acme', 'Bountiful', 'Country Fresh', 'Daily Good', 'Everyday', 'Farmhouse',
+    'Golden Fields', 'Harvest', 'Nature\'s Best', 'Premium', 'Value',
+)
+EXERCISES = (
+    ('Running', 'Aerobic'), ('Cycling', 'Aerobic'), ('Rowing', 'Aerobic'),
+    ('Swimming', 'Aerobic'), ('Back squat', 'Anaerobic'),
+    ('Bench press', 'Anaerobic'), ('Deadlift', 'Anaerobic'),
+    ('Overhead press', 'Anaerobic'), ('Pull up', 'Anaerobic'),
+    ('Leg curl', 'Anaerobic'), ('Bicep curl', 'Anaerobic'),
+    ('Plank', 'Anaerobic'), ('Yoga', 'Flexibility'),
+    ('Stretching', 'Flexibility'),
+)
+SESSION_TYPES = ('Lower body', 'Upper body', 'Full body', 'Cardio', 'Parkrun')
+# The name, unit, symbol, starting value and daily variation of each series.
+MEASUREMENT_TYPES = (
+    ('Weight', 'kilograms', 'kg', 80.0, 0.3),
+    ('Resting heart rate', 'beats per minute', 'bpm', 60.0, 2.0),
+    ('Waist', 'centimetres', 'cm', 90.0, 0.2),
+)
+HEART_RATE = ('Heart rate', 'beats per minute', 'bpm', 75.0, 15.0)
+
+class Command(BaseCommand):
+    help = (
+        'Seed the database with a configurable volume of realistic, randomly '
+        'generated data for load testing and benchmarking.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--years', type=int, default=10,
+            help='The number of years of daily Journals and Measurements',
+        )
+        parser.add_argument(
+            '--food-items', type=int, default=50_000,
+            help='The number of FoodItems to create',
+        )
+        parser.add_argument(
+            '--items-per-journal', type=int, default=8,
+            help='The average number of JournalItems in each Journal',
+        )
+        parser.add_argument(
+            '--sessions', type=int, default=3_000,
+            help='The number of exercise Sessions to spread over the years',
+        )
+        parser.add_argument(
+            '--exercises-per-session', type=int, default=6,
+            help='The average number of SessionExercises in each Session',
+        )
+        parser.add_argument(
+            '--readings-per-day', type=int, default=24,
+            help='The number of heart rate Measurements to create each day',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5_000,
+            help='The number of rows to insert with each query',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Seed the random number generator to make the data repeatable',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.end = timezone.localdate()
+        self.start = self.end - datetime.timedelta(days=365 * options['years'])
+
+        with transaction.atomic():
+            food_items = self.seed_food_items(options['food_items'])
+            self.seed_journals(food_items, options['items_per_journal'])
+            self.seed_sessions(
+                options['sessions'], options['exercises_per_session'],
+            )
+            self.seed_measurements(options['readings_per_day'])
+
+    def days(self):
+        day = self.start
+        while day < self.end:
+            yield day
+            day += datetime.timedelta(days=1)
+
+    def at(self, day, hour=0.0):
+        """ Return an aware datetime for the given number of hours into day. """
+        return timezone.make_aware(
+            datetime.datetime.combine(day, datetime.time())
+            + datetime.timedelta(hours=hour)
+        )
+
+    def report(self, count, name):
+        self.stdout.write(f'Created {count:,} {name}')
+
+    def seed_food_items(self, count):
+        categories = [
+            FoodCategory.objects.get_or_create(name=name)[0]
+            for name in FOOD_CATEGORIES
+        ]
+        r = self.random
+        food_items = []
+        for i in range(count):
+            fat = round(r.uniform(0, 40), 1)
+            carbohydrates = round(r.uniform(0, 80), 1)
+            food_items.append(FoodItem(
+                name=' '.join(r.sample(FOOD_WORDS, r.randint(1, 3))).capitalize(),
+                category=r.choice(categories),
+                brand=r.choice(BRANDS) if r.random() < 0.7 else None,
+                range=r.choice(('Light', 'Organic', 'Finest')) if r.random() < 0.2 else None,
+                favourite=r.random() < 0.01,
+                unit_quantity=r.choice((100.0, 100.0, 100.0, 1.0, 250.0)),
+                unit_units=r.choice(('g', 'g', 'ml', 'units', 'servings')),
+                energy=round(fat * 9 + carbohydrates * 4 + r.uniform(0, 60), 0),
+                fat=fat,
+                saturates=round(fat * r.uniform(0, 0.6), 1),
+                carbohydrates=carbohydrates,
+                sugars=round(carbohydrates * r.uniform(0, 0.8), 1),
+                protein=round(r.uniform(0, 30), 1),
+                salt=round(r.uniform(0, 2.5), 2),
+            ))
+        food_items = FoodItem.objects.bulk_create(food_items, self.batch_size)
+        self.report(len(food_items), 'food items')
+        return food_items
+
+    def seed_journals(self, food_items, items_per_journal):
+        if not food_items:
+            return
+        existing = set(Journal.objects.values_list('date', flat=True))
+        journals = Journal.objects.bulk_create(
+            [Journal(date=day) for day in self.days() if day not in existing],
+            self.batch_size,
+        )
+        self.report(len(journals), 'journals')
+
+        r = self.random
+        types = [choice[0] for choice in JournalItem.TYPE_CHOICES]
+        items = [
+            JournalItem(
+                journal=journal,
+                food_item=r.choice(food_items),
+                type=r.choice(types),
+                quantity=round(r.uniform(10, 250), 0),
+            )
+            for journal in journals
+            for _ in range(r.randint(1, items_per_journal * 2 - 1))
+        ]
+        JournalItem.objects.bulk_create(items, self.batch_size)
+        self.report(len(items), 'journal items')
+
+        # bulk_create() does not send the signals that maintain the summaries.
+        JournalNutritionSummary.refresh([journal.pk for journal in journals])
+
+    def seed_sessions(self, count, exercises_per_session):
+        r = self.random
+        session_types = [
+            SessionType.objects.get_or_create(name=name)[0]
+            for name in SESSION_TYPES
+        ]
+        locations = [
+            Location.objects.get_or_create(name=name)[0]
+            for name in ('Gym', 'Park', 'Home')
+        ]
+        exercises = [
+            Exercise.objects.get_or_create(name=name, defaults={'type': type})[0]
+            for name, type in EXERCISES
+        ]
+        span = (self.end - self.start).days * 24
+        sessions = Session.objects.bulk_create(
+            [
+                Session(
+                    date=self.at(self.start, r.uniform(0, span)),
+                    session_type=r.choice(session_types),
+                    location=r.choice(locations),
+                )
+                for _ in range(count)
+            ],
+            self.batch_size,
+        )
+        self.report(len(sessions), 'sessions')
+
+        session_exercises = []
+        for session in sessions:
+            for _ in range(r.randint(1, exercises_per_session * 2 - 1)):
+                exercise = r.choice(exercises)
+                if exercise.type == 'Aerobic':
+                    distance = r.randint(1_000, 21_000)
+                    values = {
+                        'distance': distance,
+                        'duration': int(distance * r.uniform(0.2, 0.45)),
+                        'calories': r.choice((None, int(distance * 0.06))),
+                    }
+                elif exercise.type == 'Anaerobic':
+                    values = {
+                        'weight': round(r.uniform(5, 150) / 2.5) * 2.5,
+                        'sets': r.randint(1, 5),
+                        'reps': r.randint(1, 15),
+                    }
+                else:
+                    values = {'duration': r.randint(300, 3_600)}
+                session_exercises.append(
+                    SessionExercise(session=session, exercise=exercise, **values)
+                )
+        SessionExercise.objects.bulk_create(session_exercises, self.batch_size)
+        self.report(len(session_exercises), 'session exercises')
+
+        # bulk_create() does not send the signals that maintain the personal
+        # bests.
+        call_command('rebuild_personal_bests', stdout=self.stdout)
+
+    def seed_measurements(self, readings_per_day):
+        r = self.random
+        series = [(values, 1) for values in MEASUREMENT_TYPES]
+        if readings_per_day:
+            series.append((HEART_RATE, readings_per_day))
+
+        created = 0
+        measurements = []
+        types = []
+        for (name, unit, symbol, value, variation), per_day in series:
+            type = MeasurementType.objects.get_or_create(
+                name=name, defaults={'unit': unit, 'symbol': symbol},
+            )[0]
+            types.append(type.pk)
+            for day in self.days():
+                if per_day == 1:
+                    # Daily series wander slowly away from their starting value.
+                    value = max(0.0, value + r.gauss(0, variation))
+                    readings = [(7.0, value)]
+                else:
+                    readings = [
+                        (i * 24 / per_day, max(0.0, r.gauss(value, variation)))
+                        for i in range(per_day)
+                    ]
+                measurements.extend(
+                    Measurement(
+                        date=self.at(day, hour), type=type,
+                        measurement=round(measurement, 1),
+                    )
+                    for hour, measurement in readings
+                )
+
+                # Insert as we go to avoid holding every Measurement in memory.
+                if len(measurements) >= self.batch_size:
+                    Measurement.objects.bulk_create(measurements)
+                    created += len(measurements)
+                    measurements = []
+
+        Measurement.objects.bulk_create(measurements)
+        self.report(created + len(measurements), 'measurements')
+
+        # bulk_create() does not send the signals that maintain the rollups.
+        call_command(
+            'rebuild_measurement_rollups', types=types, stdout=self.stdout,
+        )
@@ -0,0 +1,189 @@
+""" Prometheus metrics for the app, served from /metrics.
+
+The MetricsMiddleware times every request by the name of its URL pattern and
+the admin model that it is for, if any, and counts the requests in progress.
+Every database query is counted against the view that made it through an
+execute wrapper installed on each new connection, and the caches in
+fitnesstracker.cache count their hits and misses. The numbers of rows in the
+main tables are read when the metrics are collected.
+
+When the PROMETHEUS_MULTIPROC_DIR environment variable is set, which
+gunicorn.conf.py does, each worker process writes its metrics to files in that
+directory and /metrics reports the totals of every worker, so it does not
+matter which worker serves it.
+"""
+import os
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from prometheus_client import (
+    REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+REQUEST_DURATION = Histogram(
+    'ft_http_request_duration_seconds',
+    'The time taken to respond to requests.',
+    ['method', 'view', 'model', 'status'],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'ft_http_requests_in_progress',
+    'The number of requests being handled.',
+    multiprocess_mode='livesum',
+)
+WORKER_PROCESSES = Gauge(
+    'ft_worker_processes',
+    'The number of worker processes serving requests.',
+    multiprocess_mode='livesum',
+)
+DB_QUERIES = Counter(
+    'ft_db_queries', 'The number of database queries made.', ['view'],
+)
+DB_QUERY_DURATION = Histogram(
+    'ft_db_query_duration_seconds',
+    'The time taken to execute database queries.',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+CACHE_REQUESTS = Counter(
+    'ft_cache_requests',
+    'The number of values read from the caches, by whether they were found.',
+    ['cache', 'result'],
+)
+
+# The tables to report the number of rows of, by model.
+TABLES = ('nutrition.JournalItem', 'measurements.Measurement', 'workouts.SessionExercise')
+
+# The view and admin model of the request being handled in this context, which
+# async views carry into the threads that run their queries.
+_current_view = ContextVar('metrics_view', default=('', ''))
+
+WORKER_PROCESSES.set(1)
+
+def request_labels(request) -> tuple:
+    """ Return the name of the URL pattern that a request matched and the label
+    of the admin model that it is for, if any.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>', ''
+    model_admin = getattr(match.func, 'model_admin', None)
+    model = model_admin.opts.label_lower if model_admin is not None else ''
+    return match.view_name or '<unnamed>', model
+
+def cache_request(cache: str, hit: bool):
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+def _observe_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERY_DURATION.observe(time.perf_counter() - start)
+        DB_QUERIES.labels(_current_view.get()[0]).inc()
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Connections can be opened inside execute_wrapper() blocks, such as a
+    # QueryRecorder's, which remove the last wrapper when they exit, so this
+    # one goes first to outlast them.
+    if _observe_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _observe_query)
+
+class TableRowsCollector:
+    """ TableRowsCollector reports the number of rows in each of TABLES. On
+    PostgreSQL, these are the planner's estimates, as counting the rows of the
+    largest tables on every scrape would be slow.
+    """
+    def collect(self):
+        family = GaugeMetricFamily(
+            'ft_table_rows', 'The number of rows in the main tables.',
+            labels=['table'],
+        )
+        models = [apps.get_model(label) for label in TABLES]
+        connection = connections['default']
+        estimates = {}
+        if connection.vendor == 'postgresql':
+            tables = [model._meta.db_table for model in models]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)',
+                    [tables],
+                )
+                # Tables that have never been analysed have no estimate.
+                estimates = {
+                    table: rows for table, rows in cursor.fetchall() if rows >= 0
+                }
+        for model in models:
+            table = model._meta.db_table
+            rows = estimates.get(table)
+            if rows is None:
+                rows = model._default_manager.count()
+            family.add_metric([table], rows)
+        yield family
+
+_table_rows = CollectorRegistry()
+_table_rows.register(TableRowsCollector())
+
+def latest() -> bytes:
+    """ Return every metric in the Prometheus text format. """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_table_rows)
+
+class MetricsMiddleware:
+    """ MetricsMiddleware records the duration of every request. It supports
+    both sync and async views so that it does not make async views run in a
+    thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+        self.finish(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            REQUESTS_IN_PROGRESS.dec()
+        self.finish(request, response, start)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _current_view.set(request_labels(request))
+
+    def start(self, request) -> float:
+        _current_view.set(('<unresolved>', ''))
+        REQUESTS_IN_PROGRESS.inc()
+        return time.perf_counter()
+
+    def finish(self, request, response, start):
+        view, model = request_labels(request)
+        REQUEST_DURATION.labels(
+            request.method, view, model, response.status_code,
+        ).observe(time.perf_counter() - start)
+        _current_view.set(('', ''))
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('method', models.CharField(max_length=16)),
+                ('path', models.CharField(max_length=2048)),
+                ('view', models.CharField(blank=True, help_text='The name of the URL pattern or view that handled the request', max_length=256)),
+                ('status', models.PositiveSmallIntegerField()),
+                ('duration', models.FloatField(help_text='The wall time in milliseconds')),
+                ('query_count', models.PositiveIntegerField()),
+                ('query_duration', models.FloatField(help_text='The time spent executing queries in milliseconds')),
+                ('duplicate_queries', models.PositiveIntegerField(help_text='The number of queries that repeated an earlier query')),
+                ('duplicates', models.JSONField(blank=True, default=list, help_text='The most repeated queries and how many times each was made')),
+                ('profile', models.CharField(blank=True, help_text='The file that the cProfile statistics were saved to', max_length=1024, null=True)),
+            ],
+            options={
+                'ordering': ['-created'],
+                'indexes': [models.Index(fields=['view', '-duration'], name='requestprofile_view_duration')],
+            },
+        ),
+    ]
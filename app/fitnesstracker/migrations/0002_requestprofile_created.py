@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fitnesstracker', '0001_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requestprofile',
+            index=models.Index(fields=['-created'], name='requestprofile_created'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import models
+from django.utils.translation import gettext as _
+
+class RequestProfile(models.Model):
+    """ RequestProfile records how long a request took to handle and the
+    database queries that it made, as recorded by the ProfilingMiddleware.
+    """
+    created = models.DateTimeField(auto_now_add=True)
+    method = models.CharField(max_length=16)
+    path = models.CharField(max_length=2048)
+    view = models.CharField(
+        max_length=256, blank=True,
+        help_text=_('The name of the URL pattern or view that handled the request'),
+    )
+    status = models.PositiveSmallIntegerField()
+    duration = models.FloatField(help_text=_('The wall time in milliseconds'))
+    query_count = models.PositiveIntegerField()
+    query_duration = models.FloatField(
+        help_text=_('The time spent executing queries in milliseconds'),
+    )
+    duplicate_queries = models.PositiveIntegerField(
+        help_text=_('The number of queries that repeated an earlier query'),
+    )
+    duplicates = models.JSONField(
+        default=list, blank=True,
+        help_text=_('The most repeated queries and how many times each was made'),
+    )
+    profile = models.CharField(
+        max_length=1024, null=True, blank=True,
+        help_text=_('The file that the cProfile statistics were saved to'),
+    )
+
+    class Meta:
+        ordering = ["-created",]
+        indexes = [
+            models.Index(fields=["-created"], name="requestprofile_created"),
+            models.Index(
+                fields=["view", "-duration"],
+                name="requestprofile_view_duration",
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.method} {self.path[:100]} | {self.duration:.0f}ms'
@@ -0,0 +1,131 @@
+""" Opt-in profiling of requests. The ProfilingMiddleware records the wall time
+of a request with the number, duration and duplicates of the database queries
+that it made, logs them as JSON and saves them as a RequestProfile to browse in
+the admin. It can also save cProfile statistics for each request.
+
+Every request is profiled when settings.PROFILE is true. Otherwise, only
+requests with the X-Profile header from one of settings.PROFILE_IPS are, which
+allows a single slow page to be profiled in production.
+"""
+import cProfile
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RequestProfile
+from .queries import QueryRecorder
+
+logger = logging.getLogger(__name__)
+
+# The number of the most repeated queries to keep with each profile.
+DUPLICATES_KEPT = 5
+
+def duplicate_queries(queries) -> Counter:
+    """ Return how many times each query that was made more than once was made.
+    Queries are compared without their parameters, so the queries that load
+    the same related object for each row of a list, one at a time, count as
+    duplicates.
+    """
+    counts = Counter(sql for sql, _duration in queries)
+    return Counter({sql: count for sql, count in counts.items() if count > 1})
+
+def profile_requested(request) -> bool:
+    if settings.PROFILE:
+        return True
+    return (
+        'HTTP_X_PROFILE' in request.META
+        and request.META.get('REMOTE_ADDR') in settings.PROFILE_IPS
+    )
+
+class ProfilingMiddleware:
+    """ ProfilingMiddleware profiles the requests chosen by
+    profile_requested(). It is only installed when profiling is configured,
+    as it is sync only and so adds the cost of switching threads to async
+    views under ASGI.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profile_requested(request):
+            return self.get_response(request)
+
+        profiler = None
+        if settings.PROFILE_DIR and (
+            settings.PROFILE_CPROFILE
+            or request.META.get('HTTP_X_PROFILE') == 'cprofile'
+        ):
+            profiler = cProfile.Profile()
+
+        with QueryRecorder() as queries:
+            start = time.perf_counter()
+            if profiler is not None:
+                profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+            duration = (time.perf_counter() - start) * 1000
+
+        duplicates = duplicate_queries(queries.queries)
+        match = request.resolver_match
+        profile = RequestProfile(
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            view=(match.view_name if match else '')[:256],
+            status=response.status_code,
+            duration=duration,
+            query_count=len(queries),
+            query_duration=queries.duration * 1000,
+            duplicate_queries=sum(duplicates.values()) - len(duplicates),
+            duplicates=[
+                {'sql': sql, 'count': count}
+                for sql, count in duplicates.most_common(DUPLICATES_KEPT)
+            ],
+        )
+        if profiler is not None:
+            profile.profile = self.save_stats(profiler, request)
+
+        logger.info(json.dumps({
+            'event': 'request_profile',
+            'method': profile.method,
+            'path': profile.path,
+            'view': profile.view,
+            'status': profile.status,
+            'duration_ms': round(profile.duration, 2),
+            'query_count': profile.query_count,
+            'query_ms': round(profile.query_duration, 2),
+            'duplicate_queries': profile.duplicate_queries,
+            'profile': profile.profile,
+        }))
+        try:
+            profile.save()
+        except Exception:
+            # Profiling must never break the request that it profiled.
+            logger.exception('Unable to save the request profile')
+
+        response['Server-Timing'] = (
+            f'db;desc="{profile.query_count} queries";'
+            f'dur={profile.query_duration:.1f}, total;dur={duration:.1f}'
+        )
+        return response
+
+    def save_stats(self, profiler, request) -> str:
+        """ Save the cProfile statistics of a request to a file named after
+        when it was made and its path, and return the file's path.
+        """
+        name = re.sub(r'[^\w-]+', '-', request.path).strip('-') or 'index'
+        filename = os.path.join(
+            settings.PROFILE_DIR,
+            f'{timezone.now():%Y%m%dT%H%M%S.%f}-{request.method}-{name}.prof',
+        )
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(filename)
+        return filename
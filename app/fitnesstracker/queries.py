@@ -0,0 +1,41 @@
+""" Recording of the database queries made while handling a request or running
+a block of code, without relying on DEBUG or the connection's query log.
+"""
+import time
+
+from django.db import connections
+
+class QueryRecorder:
+    """ QueryRecorder is a context manager that records the SQL and duration of
+    every query made on the given database connections while it is active.
+    """
+    def __init__(self, using=None):
+        self.using = using or list(connections)
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    def __enter__(self):
+        self.wrappers = [
+            connections[alias].execute_wrapper(self) for alias in self.using
+        ]
+        for wrapper in self.wrappers:
+            wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for wrapper in reversed(self.wrappers):
+            wrapper.__exit__(exc_type, exc_value, traceback)
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def duration(self) -> float:
+        """ The total time in seconds spent executing queries. """
+        return sum(duration for _, duration in self.queries)
@@ -11,9 +11,12 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 import os
+import tempfile
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +40,7 @@ CSRF_TRUSTED_ORIGINS = os.getenv(
 # Application definition
 
 INSTALLED_APPS = [
+    'fitnesstracker.apps.FitnessTrackerConfig',
     'measurements.apps.MeasurementsConfig',
     'nutrition.apps.NutritionConfig',
     'workouts.apps.WorkoutsConfig',
@@ -49,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'fitnesstracker.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -58,6 +63,26 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Profile every request, or only those with an X-Profile header from one of the
+# given IP addresses, which must be the addresses that the app sees the requests
+# coming from. See fitnesstracker/profiling.py.
+PROFILE = bool(int(os.getenv('FT_PROFILE', '0')))
+PROFILE_IPS = [ip for ip in os.getenv('FT_PROFILE_IPS', '').split(',') if ip]
+# Save the cProfile statistics of every profiled request to this directory, or
+# only of those with an "X-Profile: cprofile" header.
+PROFILE_DIR = os.getenv('FT_PROFILE_DIR', '')
+PROFILE_CPROFILE = bool(int(os.getenv('FT_PROFILE_CPROFILE', '0')))
+
+# The bearer token that requests for /metrics must give, if any.
+METRICS_TOKEN = os.getenv('FT_METRICS_TOKEN', '')
+
+# The name of the MeasurementType of body weight, in kg or lb, that the energy
+# burned by exercise is estimated from. See fitnesstracker/energy.py.
+BODY_WEIGHT_MEASUREMENT = os.getenv('FT_BODY_WEIGHT_MEASUREMENT', 'Weight')
+
+if PROFILE or PROFILE_IPS:
+    MIDDLEWARE.insert(0, 'fitnesstracker.profiling.ProfilingMiddleware')
+
 ROOT_URLCONF = 'fitnesstracker.urls'
 
 TEMPLATES = [
@@ -82,18 +107,148 @@ WSGI_APPLICATION = 'fitnesstracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+DB_ENGINE = os.getenv('FT_DB_ENGINE', 'sqlite3')
+
+# Take PostgreSQL connections from a psycopg connection pool in each process.
+DB_POOL = DB_ENGINE == 'postgresql' and bool(int(os.getenv('FT_DB_POOL', '0')))
+
+# Connections are kept open between requests for this many seconds. This must be
+# 0 with the pool, and should be under ASGI, where requests run in different
+# threads that would each keep their own connection open.
+DB_CONN_MAX_AGE = int(os.getenv(
+    'FT_DB_CONN_MAX_AGE',
+    '0' if DB_POOL or os.getenv('FT_SERVER_MODE') == 'asgi' else '60',
+))
+
 DATABASES = {
     'default': {
-        'ENGINE': f"django.db.backends.{os.getenv('FT_DB_ENGINE', 'sqlite3')}",
+        'ENGINE': (
+            'fitnesstracker.db.postgresql' if DB_POOL
+            else f'django.db.backends.{DB_ENGINE}'
+        ),
         'NAME': os.getenv('FT_DB_NAME', BASE_DIR / 'db.sqlite3'),
         'USER': os.getenv('FT_DB_USERNAME', default=''),
         'PASSWORD': os.getenv('FT_DB_PASSWORD', default=''),
         'HOST': os.getenv('FT_DB_HOST', default=''),
         'PORT': os.getenv('FT_DB_PORT', default=''),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        # Check that a reused connection still works before using it.
+        'CONN_HEALTH_CHECKS': bool(int(os.getenv('FT_DB_CONN_HEALTH_CHECKS', '1'))),
+        # PgBouncer in transaction pooling mode can run each statement on a
+        # different server connection, so the cursors that .iterator() would
+        # otherwise declare on the server do not work.
+        'DISABLE_SERVER_SIDE_CURSORS': bool(int(os.getenv('FT_DB_PGBOUNCER', '0'))),
+        'OPTIONS': {},
+    }
+}
+
+if DB_ENGINE == 'postgresql':
+    DATABASES['default']['OPTIONS']['connect_timeout'] = int(
+        os.getenv('FT_DB_CONNECT_TIMEOUT', '10')
+    )
+if DB_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('FT_DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('FT_DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.getenv('FT_DB_POOL_TIMEOUT', '30')),
+        'max_idle': float(os.getenv('FT_DB_POOL_MAX_IDLE', '600')),
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', ''),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(tempfile.gettempdir(), 'fitness-tracker-cache'),
+    ),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://localhost:6379'),
+    'memcached': (
+        'django.core.cache.backends.memcached.PyMemcacheCache', '127.0.0.1:11211',
+    ),
+    'dummy': ('django.core.cache.backends.dummy.DummyCache', ''),
+}
+
+CACHE_BACKEND = os.getenv('FT_CACHE_BACKEND', 'locmem')
+if CACHE_BACKEND not in CACHE_BACKENDS:
+    raise ImproperlyConfigured(
+        f'FT_CACHE_BACKEND must be one of {", ".join(CACHE_BACKENDS)}'
+    )
+
+# The local memory cache is not shared between processes, so each gunicorn
+# worker has its own copy of everything that is cached.
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND][0],
+        'LOCATION': os.getenv('FT_CACHE_LOCATION', CACHE_BACKENDS[CACHE_BACKEND][1]),
+        'TIMEOUT': int(os.getenv('FT_CACHE_TIMEOUT', '300')),
+        'KEY_PREFIX': os.getenv('FT_CACHE_KEY_PREFIX', 'ft'),
     }
 }
 
 
+# Sessions
+# https://docs.djangoproject.com/en/4.2/topics/http/sessions/
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    # Reads sessions from the cache and writes them through to the database.
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+# The cache backends that every worker, on every host, shares.
+SHARED_CACHE_BACKENDS = ('redis', 'memcached')
+
+SESSION_BACKEND = os.getenv(
+    'FT_SESSION_ENGINE',
+    'cached_db' if CACHE_BACKEND in SHARED_CACHE_BACKENDS else 'db',
+)
+if SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f'FT_SESSION_ENGINE must be one of {", ".join(SESSION_ENGINES)}'
+    )
+if SESSION_BACKEND == 'cache' and CACHE_BACKEND in ('locmem', 'dummy'):
+    # Each worker would only know about the sessions that it created.
+    raise ImproperlyConfigured(
+        'FT_SESSION_ENGINE=cache needs a cache that is shared between workers'
+    )
+if SESSION_BACKEND == 'cached_db' and CACHE_BACKEND == 'locmem':
+    # A session that is flushed, such as by logging out, would only be removed
+    # from the cache of the worker that flushed it, so the others would accept
+    # it until it expired from their own.
+    raise ImproperlyConfigured(
+        'FT_SESSION_ENGINE=cached_db needs a cache that is shared between workers'
+    )
+
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_COOKIE_AGE = int(os.getenv('FT_SESSION_COOKIE_AGE', str(60 * 60 * 24 * 14)))
+
+
+# Logging
+# https://docs.djangoproject.com/en/4.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'fitnesstracker.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from measurements.models import Measurement, MeasurementType
+from workouts.models import Exercise, Session, SessionExercise
+from .energy import energy_cache
+
+@receiver(post_save, sender=Measurement)
+@receiver(post_delete, sender=Measurement)
+@receiver(post_save, sender=MeasurementType)
+@receiver(post_delete, sender=MeasurementType)
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+@receiver(post_save, sender=SessionExercise)
+@receiver(post_delete, sender=SessionExercise)
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def invalidate_energy(sender, raw=False, **kwargs):
+    # The Journals' totals invalidate the energy through its dependency on
+    # their cache.
+    if not raw:
+        energy_cache.invalidate()
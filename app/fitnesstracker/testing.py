@@ -0,0 +1,47 @@
+""" Helpers for tests that check how the database executes the queries made by
+the admin.
+"""
+import re
+
+from django.contrib import admin
+from django.db import connection
+from django.test import RequestFactory
+
+def analyze():
+    """ Update the statistics that the query planner uses to choose indexes. """
+    with connection.cursor() as cursor:
+        cursor.execute('analyze')
+
+def changelist_queryset(model, user, params=None):
+    """ Return the queryset for the first page of the admin changelist for the
+    given model, as seen by user with the given filter and ordering params.
+    """
+    model_admin = admin.site._registry[model]
+    request = RequestFactory().get('/', params or {})
+    request.user = user
+    changelist = model_admin.get_changelist_instance(request)
+    return changelist.queryset[:changelist.list_per_page]
+
+def sequential_scans(queryset, tables) -> list:
+    """ Return the names of any of the given tables that the database reads in
+    full, rather than through an index, to execute the given queryset.
+
+    PostgreSQL reports these as a "Seq Scan". SQLite reports them as a "SCAN" of
+    the table, which is only acceptable when the table is scanned in the order
+    of an index that provides the rows in the order they are required.
+    """
+    plan = queryset.explain()
+
+    if connection.vendor == 'postgresql':
+        scanned = re.findall(r'Seq Scan on (\w+)', plan)
+    else:
+        sorted_in_full = 'USE TEMP B-TREE FOR ORDER BY' in plan
+        scanned = [
+            table
+            for table, index in re.findall(
+                r'\bSCAN (\w+)( USING (?:COVERING )?INDEX)?', plan
+            )
+            if not index or sorted_in_full
+        ]
+
+    return sorted(set(scanned) & set(tables))
@@ -0,0 +1,619 @@
+import csv
+import datetime
+import json
+import os
+import tempfile
+
+from importlib import import_module
+from importlib.util import find_spec
+from io import StringIO
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from fitnesstracker.cache import UNSHARED_TIMEOUT, VersionedCache
+from fitnesstracker.energy import daily_energy, with_burned_calories
+from fitnesstracker.metrics import _observe_query
+from fitnesstracker.models import RequestProfile
+from fitnesstracker.profiling import duplicate_queries
+from fitnesstracker.queries import QueryRecorder
+from measurements.models import Measurement, MeasurementType
+from nutrition.models import (
+    FoodCategory, FoodItem, Journal, JournalItem, JournalNutritionSummary,
+)
+from workouts.models import (
+    Exercise, Location, PersonalBest, Session, SessionExercise, SessionType,
+)
+
+class SeedAndBenchmarkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        call_command(
+            'seed_data', years=1, food_items=200, sessions=20,
+            readings_per_day=2, seed=1, stdout=StringIO(),
+        )
+
+    def test_seed_data(self):
+        self.assertEqual(FoodItem.objects.count(), 200)
+        self.assertEqual(Journal.objects.count(), 365)
+        self.assertEqual(JournalNutritionSummary.objects.count(), 365)
+        self.assertTrue(SessionExercise.objects.exists())
+        self.assertTrue(PersonalBest.objects.exists())
+        call_command('rebuild_personal_bests', '--check', stdout=StringIO())
+        self.assertEqual(Measurement.objects.count(), 365 * 5)
+
+    def test_benchmark_admin(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command(
+                'benchmark_admin', repeat=1, output=output, stdout=StringIO(),
+            )
+            call_command(
+                'benchmark_admin', repeat=1, compare=output, stdout=StringIO(),
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertIn('nutrition.journal changelist', report)
+        self.assertIn('nutrition.journalitem.food_item autocomplete', report)
+        for name, result in report.items():
+            self.assertEqual(result['status'], 200, name)
+
+    def test_benchmark_connections(self):
+        stdout = StringIO()
+        call_command('benchmark_connections', requests=3, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('New connection per request'))
+        self.assertIn('saved', lines[1])
+
+class SessionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+
+    @override_settings(
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+    )
+    def test_cached_db_sessions_skip_the_database(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('admin:index'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [q['sql'] for q in queries if 'django_session' in q['sql']],
+        )
+
+    @override_settings(CACHES={
+        **settings.CACHES,
+        **{
+            worker: {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': worker,
+            }
+            for worker in ('worker1', 'worker2')
+        },
+    })
+    def test_flushed_sessions_are_not_loaded_by_other_workers(self):
+        """ With the default local memory cache, each gunicorn worker has its
+        own cache, so a session that is logged out of on one worker must not
+        still be loaded from the cache of another.
+        """
+        engine = import_module(settings.SESSION_ENGINE)
+        def store(worker, key=None):
+            with override_settings(SESSION_CACHE_ALIAS=worker):
+                return engine.SessionStore(key)
+
+        session = store('worker1')
+        session['user'] = self.user.pk
+        session.save()
+        self.assertEqual(store('worker2', session.session_key)['user'], self.user.pk)
+        store('worker1', session.session_key).flush()
+        self.assertNotIn('user', store('worker2', session.session_key))
+
+@skipUnless(find_spec('psycopg') and find_spec('psycopg_pool'), 'psycopg is not installed')
+class PooledConnectionTests(SimpleTestCase):
+    """ The pooled PostgreSQL backend, with the pool itself mocked so that no
+    database is needed.
+    """
+    def wrapper(self, **settings_dict):
+        from fitnesstracker.db.postgresql.base import DatabaseWrapper
+        return DatabaseWrapper({
+            'ENGINE': 'fitnesstracker.db.postgresql',
+            'NAME': 'fitness_tracker',
+            'USER': 'ft',
+            'PASSWORD': '',
+            'HOST': 'localhost',
+            'PORT': '',
+            'OPTIONS': {'pool': {'max_size': 2}},
+            'ATOMIC_REQUESTS': False,
+            'AUTOCOMMIT': True,
+            'CONN_MAX_AGE': 0,
+            'CONN_HEALTH_CHECKS': False,
+            'TIME_ZONE': None,
+            'TEST': {},
+            **settings_dict,
+        }, 'pooled')
+
+    def test_connections_are_taken_from_and_returned_to_the_pool(self):
+        from fitnesstracker.db.postgresql import base
+        with mock.patch.object(base, 'ConnectionPool') as ConnectionPool:
+            pool = ConnectionPool.return_value
+            wrapper = self.wrapper()
+            checked = self.wrapper(CONN_HEALTH_CHECKS=True)
+            try:
+                connection = wrapper.get_new_connection(wrapper.get_connection_params())
+                self.assertIs(connection, pool.getconn.return_value)
+                self.assertEqual(ConnectionPool.call_args.kwargs['max_size'], 2)
+                self.assertNotIn('check', ConnectionPool.call_args.kwargs)
+
+                wrapper.connection = connection
+                wrapper._close()
+                pool.putconn.assert_called_once_with(connection)
+                self.assertIsNone(wrapper.connection)
+
+                # Health checks need a pool of their own.
+                checked.get_new_connection(checked.get_connection_params())
+                self.assertEqual(ConnectionPool.call_count, 2)
+                self.assertEqual(
+                    ConnectionPool.call_args.kwargs['check'],
+                    ConnectionPool.check_connection,
+                )
+                self.assertNotIn('check', checked.settings_dict['OPTIONS']['pool'])
+                wrapper.get_new_connection(wrapper.get_connection_params())
+                self.assertEqual(ConnectionPool.call_count, 2)
+            finally:
+                wrapper.close_pool()
+                checked.close_pool()
+            self.assertEqual(pool.close.call_count, 2)
+            self.assertNotIn(wrapper.pool_key, base.DatabaseWrapper._pools)
+
+    def test_persistent_connections_are_refused(self):
+        wrapper = self.wrapper(CONN_MAX_AGE=60)
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.pool
+
+PROFILING_MIDDLEWARE = [
+    'fitnesstracker.profiling.ProfilingMiddleware', *settings.MIDDLEWARE,
+]
+
+@override_settings(
+    MIDDLEWARE=PROFILING_MIDDLEWARE, PROFILE=False,
+    PROFILE_IPS=['127.0.0.1'], PROFILE_DIR='', PROFILE_CPROFILE=False,
+)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+        for day in (1, 2, 3):
+            Journal.objects.create(date=datetime.date(2024, 1, day))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_duplicate_queries(self):
+        queries = [('a', 0.1), ('b', 0.1), ('a', 0.1), ('c', 0.1), ('a', 0.1)]
+        self.assertEqual(duplicate_queries(queries), {'a': 3})
+
+    def test_profile_from_allowed_ip(self):
+        url = reverse('admin:nutrition_journal_changelist')
+        with self.assertLogs('fitnesstracker.profiling', 'INFO') as logs:
+            self.client.get(url)
+            self.client.get(url, REMOTE_ADDR='10.0.0.1', HTTP_X_PROFILE='1')
+            response = self.client.get(url, HTTP_X_PROFILE='1')
+        self.assertIn('Server-Timing', response)
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(
+            json.loads(logs.records[0].getMessage())['view'],
+            'admin:nutrition_journal_changelist',
+        )
+
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.status, 200)
+        self.assertGreater(profile.query_count, 0)
+        self.assertGreater(profile.duration, profile.query_duration)
+
+        response = self.client.get(
+            reverse('admin:fitnesstracker_requestprofile_slowest'),
+        )
+        self.assertContains(response, 'admin:nutrition_journal_changelist')
+        # Each view links to its profiles, slowest first.
+        url = reverse('admin:fitnesstracker_requestprofile_changelist')
+        self.assertContains(
+            response, f'{url}?view=admin%3Anutrition_journal_changelist&amp;o=-5',
+        )
+        changelist = self.client.get(url, {'o': '-5'}).context['cl']
+        self.assertEqual(
+            changelist.get_ordering(None, RequestProfile.objects.all())[0],
+            '-duration',
+        )
+
+    def test_cprofile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(PROFILE=True, PROFILE_DIR=directory), \
+                    self.assertLogs('fitnesstracker.profiling', 'INFO'):
+                self.client.get(reverse('admin:index'))
+                self.client.get(reverse('admin:index'), HTTP_X_PROFILE='cprofile')
+            profiles = RequestProfile.objects.order_by('pk')
+            self.assertIsNone(profiles[0].profile)
+            self.assertTrue(os.path.exists(profiles[1].profile))
+
+            # Only the profiles older than the given number of days are pruned,
+            # along with their statistics files.
+            old = profiles[1].profile
+            profiles.filter(pk=profiles[1].pk).update(
+                created=timezone.now() - datetime.timedelta(days=8),
+            )
+            call_command('prune_request_profiles', stdout=StringIO())
+            self.assertEqual(RequestProfile.objects.count(), 1)
+            self.assertFalse(os.path.exists(old))
+            call_command('prune_request_profiles', days=0, stdout=StringIO())
+            self.assertFalse(RequestProfile.objects.exists())
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+        weight = MeasurementType.objects.create(name='Weight', unit='kilograms')
+        Measurement.objects.create(type=weight, measurement=80.0)
+
+    def test_metrics(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('admin:nutrition_journal_changelist'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        metrics = response.content.decode()
+        self.assertIn(
+            'ft_http_request_duration_seconds_count{method="GET",'
+            'model="nutrition.journal",status="200",'
+            'view="admin:nutrition_journal_changelist"}',
+            metrics,
+        )
+        self.assertIn(
+            'ft_db_queries_total{view="admin:nutrition_journal_changelist"}',
+            metrics,
+        )
+        self.assertIn('ft_table_rows{table="measurements_measurement"} 1.0', metrics)
+        self.assertIn('ft_http_requests_in_progress 1.0', metrics)
+
+    def test_connection_opened_while_recording_queries(self):
+        # A connection opened inside a QueryRecorder is instrumented without
+        # leaving the recorder installed when it exits.
+        connection.execute_wrappers.remove(_observe_query)
+        with QueryRecorder() as queries:
+            connection_created.send(sender=type(connection), connection=connection)
+            User.objects.count()
+        self.assertEqual(connection.execute_wrappers, [_observe_query])
+        User.objects.count()
+        self.assertEqual(len(queries), 1)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret',
+        )
+        self.assertEqual(response.status_code, 200)
+
+class VersionedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.computed = []
+
+    def compute(self, value):
+        self.computed.append(value)
+        return value
+
+    def test_get_or_set(self):
+        versioned = VersionedCache('test')
+        for _ in range(2):
+            self.assertEqual(versioned.get_or_set(('a',), lambda: self.compute(1)), 1)
+            self.assertEqual(
+                versioned.get_or_set(('a',), lambda: self.compute(2), scope=2), 2,
+            )
+        self.assertEqual(self.computed, [1, 2])
+
+        # Nothing is invalidated until the transaction commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            versioned.invalidate(scope=2)
+            self.assertEqual(
+                versioned.get_or_set(('a',), lambda: self.compute(3), scope=2), 2,
+            )
+        self.assertEqual(versioned.get_or_set(('a',), lambda: self.compute(4)), 1)
+        self.assertEqual(
+            versioned.get_or_set(('a',), lambda: self.compute(5), scope=2), 5,
+        )
+        self.assertEqual(self.computed, [1, 2, 5])
+
+    def test_unshared_cache_timeout(self):
+        # The local memory cache of each process only keeps values briefly, as
+        # the other processes cannot invalidate them.
+        versioned = VersionedCache('test', timeout=300)
+        with mock.patch.object(caches['default'], 'set') as set:
+            versioned.get_or_set(('a',), lambda: self.compute(1))
+        self.assertEqual(set.call_args.args[2], UNSHARED_TIMEOUT)
+        self.assertEqual(
+            VersionedCache('test', timeout=2).get_timeout(caches['default']), 2,
+        )
+        self.assertEqual(
+            VersionedCache('test', timeout=None).get_timeout(caches['default']),
+            UNSHARED_TIMEOUT,
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': directory,
+            }
+            with override_settings(CACHES={**settings.CACHES, 'shared': shared}):
+                self.assertEqual(versioned.get_timeout(caches['shared']), 300)
+
+    def test_depends_on(self):
+        dependency = VersionedCache('dependency')
+        versioned = VersionedCache('test', depends_on=[(dependency, 1)])
+        self.assertEqual(versioned.get_or_set(('a',), lambda: self.compute(1)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            dependency.invalidate(scope=2)
+        self.assertEqual(versioned.get_or_set(('a',), lambda: self.compute(2)), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            dependency.invalidate(scope=1)
+        self.assertEqual(versioned.get_or_set(('a',), lambda: self.compute(3)), 3)
+
+class EnergyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+        cls.weight = MeasurementType.objects.create(
+            name='Weight', unit='kilograms', symbol='kg',
+        )
+        for day, value in ((datetime.date(2024, 2, 15), 80.0), (datetime.date(2024, 3, 2), 90.0)):
+            Measurement.objects.create(
+                type=cls.weight, measurement=value,
+                date=cls.at(day, 8),
+            )
+        run = Exercise.objects.create(name='Run', type='Aerobic')
+        cls.squat = Exercise.objects.create(name='Squat', type='Anaerobic')
+        stretch = Exercise.objects.create(name='Stretch', type='Flexibility')
+        session_type = SessionType.objects.create(name='Mixed')
+        location = Location.objects.create(name='Gym')
+        cls.sessions = [
+            Session.objects.create(
+                date=cls.at(day, 9), session_type=session_type, location=location,
+            )
+            for day in (datetime.date(2024, 3, 1), datetime.date(2024, 3, 2))
+        ]
+        # 7 MET × 80kg × 1 hour, recorded and unknown.
+        cls.running = SessionExercise.objects.create(
+            session=cls.sessions[0], exercise=run, duration=3600,
+        )
+        SessionExercise.objects.create(
+            session=cls.sessions[0], exercise=cls.squat, calories=200,
+        )
+        SessionExercise.objects.create(
+            session=cls.sessions[0], exercise=cls.squat, sets=3, reps=10,
+        )
+        # 2.5 MET × 90kg × half an hour.
+        SessionExercise.objects.create(
+            session=cls.sessions[1], exercise=stretch, duration=1800,
+        )
+
+        cls.porridge = FoodItem.objects.create(
+            name='Porridge', category=FoodCategory.objects.create(name='Cereals'),
+            unit_quantity=100.0, energy=350.0,
+        )
+        cls.journal = Journal.objects.create(date=datetime.date(2024, 3, 1))
+        JournalItem.objects.create(
+            journal=cls.journal, food_item=cls.porridge, quantity=100.0,
+        )
+        Journal.objects.create(date=datetime.date(2024, 3, 3))
+
+    @staticmethod
+    def at(day, hour):
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time(hour)))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_with_burned_calories(self):
+        rows = with_burned_calories(
+            SessionExercise.objects.filter(session=self.sessions[0]).order_by('pk')
+        )
+        self.assertEqual(
+            [(row.body_weight, row.burned_calories) for row in rows],
+            [(80.0, 560.0), (80.0, 200.0), (80.0, None)],
+        )
+
+    def test_daily_energy(self):
+        days = daily_energy()
+        self.assertEqual(
+            [(d['date'], d['intake'], d['burned'], d['estimated'], d['unestimated'], d['net']) for d in days],
+            [
+                (datetime.date(2024, 3, 1), 350.0, 760.0, 560.0, 1, -410.0),
+                (datetime.date(2024, 3, 2), None, 112.5, 112.5, 0, None),
+                (datetime.date(2024, 3, 3), 0.0, 0.0, 0.0, 0, 0.0),
+            ],
+        )
+        self.assertEqual(
+            [d['date'] for d in daily_energy(datetime.date(2024, 3, 2), datetime.date(2024, 3, 3))],
+            [datetime.date(2024, 3, 2)],
+        )
+
+        # The series is cached until the body weights, workouts or Journals
+        # change.
+        with self.assertNumQueries(0):
+            daily_energy()
+        with self.captureOnCommitCallbacks(execute=True):
+            Measurement.objects.create(
+                type=self.weight, measurement=100.0,
+                date=self.at(datetime.date(2024, 2, 28), 8),
+            )
+        self.assertEqual(daily_energy()[0]['burned'], 900.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            JournalItem.objects.create(
+                journal=self.journal, food_item=self.porridge, quantity=100.0,
+            )
+        self.assertEqual(daily_energy()[0]['net'], -200.0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.squat.type = 'Flexibility'
+            self.squat.save()
+            self.running.calories = 500
+            self.running.save()
+        self.assertEqual(daily_energy()[0]['burned'], 700.0)
+
+        # Without any body weights, every SessionExercise with a duration but
+        # no calories is counted as one that could not be estimated.
+        with self.captureOnCommitCallbacks(execute=True):
+            SessionExercise.objects.create(
+                session=self.sessions[1], exercise=self.squat, duration=600,
+            )
+        with override_settings(BODY_WEIGHT_MEASUREMENT='Body weight'):
+            self.assertEqual(
+                [(d['burned'], d['estimated'], d['unestimated']) for d in daily_energy()],
+                [(700.0, 0.0, 1), (0.0, 0.0, 2), (0.0, 0.0, 0)],
+            )
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('energy'), {'start': '2024-03-02'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [day['date'] for day in response.json()['days']],
+            ['2024-03-02', '2024-03-03'],
+        )
+        response = self.client.get(reverse('energy'), {'end': 'tomorrow'})
+        self.assertEqual(response.status_code, 400)
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+        food_item = FoodItem.objects.create(
+            name='Porridge', category=FoodCategory.objects.create(name='Cereals'),
+            unit_quantity=100.0, energy=350.0, fat=8.0, protein=12.0,
+        )
+        for day in (1, 2, 3):
+            journal = Journal.objects.create(date=datetime.date(2024, 1, day))
+            JournalItem.objects.create(
+                journal=journal, food_item=food_item, quantity=50.0 * day,
+            )
+        weight = MeasurementType.objects.create(
+            name='Weight', unit='kilograms', symbol='kg',
+        )
+        for day in (1, 2, 3):
+            Measurement.objects.create(
+                type=weight, measurement=80.0 + day,
+                date=timezone.make_aware(datetime.datetime(2024, 1, day, 7)),
+            )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, name, **params):
+        response = self.client.get(reverse('export', args=[name]), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        rows = list(csv.DictReader(StringIO(self.export(
+            'journal-items', start='2024-01-02',
+        ))))
+        self.assertEqual([row['date'] for row in rows], ['2024-01-02', '2024-01-03'])
+        self.assertEqual(float(rows[0]['energy']), 350.0)
+        self.assertEqual(rows[0]['food_item_name'], 'Porridge')
+
+    def test_ndjson(self):
+        rows = [
+            json.loads(line) for line in
+            self.export('journals', format='ndjson', end='2024-01-03').splitlines()
+        ]
+        self.assertEqual([row['date'] for row in rows], ['2024-01-01', '2024-01-02'])
+        self.assertEqual(rows[1]['total_energy'], 350.0)
+
+    async def test_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(
+            reverse('export', args=['measurements']), {'format': 'ndjson'},
+        )
+        self.assertEqual(response.status_code, 200)
+        # Over ASGI the lines are streamed from an async iterator.
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(
+            [json.loads(line)['measurement'] for line in lines],
+            [81.0, 82.0, 83.0],
+        )
+
+    def test_invalid_parameters(self):
+        for name, params in (
+            ('journals', {'format': 'xml'}),
+            ('journals', {'start': 'yesterday'}),
+            ('recipes', {}),
+        ):
+            response = self.client.get(reverse('export', args=[name]), params)
+            self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'measurements.csv')
+            call_command(
+                'export', 'measurements', output=output, chunk_size=1,
+                stdout=StringIO(),
+            )
+            with open(output, newline='') as f:
+                rows = list(csv.DictReader(f))
+        self.assertEqual(
+            [float(row['measurement']) for row in rows], [81.0, 82.0, 83.0],
+        )
+
+        stdout = StringIO()
+        call_command('export', 'sessions', format='ndjson', stdout=stdout)
+        self.assertEqual(stdout.getvalue(), '')
+
+class LoadTestTests(LiveServerTestCase):
+    def test_loadtest(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        Journal.objects.create(date=datetime.date(2024, 1, 1))
+        MeasurementType.objects.create(name='Weight', unit='kilograms')
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command(
+                'loadtest', base_url=self.live_server_url, requests=4,
+                concurrency=2, output=output, stdout=StringIO(),
+            )
+            with open(output) as f:
+                report = json.load(f)
+
+            stdout = StringIO()
+            call_command(
+                'loadtest', base_url=self.live_server_url, requests=2,
+                paths=['/api/nutrition/journals/'], compare=output,
+                stdout=stdout,
+            )
+
+        self.assertEqual(len(report), 4)
+        for path, result in report.items():
+            self.assertEqual(result['errors'], 0, path)
+            self.assertGreater(result['requests_per_second'], 0)
+        self.assertIn('req/s', stdout.getvalue())
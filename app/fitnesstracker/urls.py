@@ -15,8 +15,16 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+
+from . import views
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("api/energy/", views.energy, name="energy"),
+    path("api/export/<slug:name>/", views.export, name="export"),
+    path("api/measurements/", include("measurements.urls")),
+    path("api/nutrition/", include("nutrition.urls")),
+    path("api/workouts/", include("workouts.urls")),
+    path("metrics", views.metrics, name="metrics"),
 ]
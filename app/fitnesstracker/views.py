@@ -0,0 +1,68 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from prometheus_client import CONTENT_TYPE_LATEST
+
+from .asynchronous import async_require_GET, async_staff_member_required
+from .energy import daily_energy
+from .export import FORMATS, export_lines, parse_export_date
+from .metrics import latest
+
+@async_staff_member_required
+@async_require_GET
+async def export(request, name):
+    """ Stream one of the exports as a file download. The optional parameters
+    are:
+
+    * format: csv (the default) or ndjson.
+    * start and end: ISO 8601 dates to limit the export to.
+    """
+    format = request.GET.get('format', 'csv')
+    try:
+        start = parse_export_date(request.GET.get('start'))
+        end = parse_export_date(request.GET.get('end'))
+        # Django 4.2 reads the whole of a sync iterator into memory to serve it
+        # over ASGI, and the whole of an async iterator to serve it over WSGI,
+        # so use the kind that suits the server.
+        lines = export_lines(
+            name, format, start, end,
+            asynchronous=isinstance(request, ASGIRequest),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    filename = f'{name}-{timezone.localdate():%Y%m%d}.{format}'
+    return StreamingHttpResponse(
+        lines,
+        content_type=FORMATS[format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+@async_staff_member_required
+@async_require_GET
+async def energy(request):
+    """ Return the energy taken in, burned and the difference between them for
+    every day as JSON. The optional parameters start and end are ISO 8601
+    dates to limit the days to.
+    """
+    try:
+        start = parse_export_date(request.GET.get('start'))
+        end = parse_export_date(request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    start = timezone.localdate(start) if start else None
+    end = timezone.localdate(end) if end else None
+    return JsonResponse({'days': await sync_to_async(daily_energy)(start, end)})
+
+@require_GET
+def metrics(request):
+    """ Return the metrics in the Prometheus text format. If
+    settings.METRICS_TOKEN is set, it must be given as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401, headers={'WWW-Authenticate': 'Bearer'})
+    return HttpResponse(latest(), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,37 @@
+""" Gunicorn configuration for serving the app. FT_SERVER_MODE chooses between
+sync workers serving the WSGI application (wsgi, the default) and uvicorn
+workers serving the ASGI application (asgi), where each worker can handle many
+concurrent requests to the async views while they wait on the database.
+"""
+import os
+import shutil
+import tempfile
+
+mode = os.environ.get('FT_SERVER_MODE', 'wsgi')
+if mode not in ('wsgi', 'asgi'):
+    raise ValueError(f'FT_SERVER_MODE must be wsgi or asgi, not {mode!r}')
+
+bind = os.environ.get('FT_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('FT_WORKERS', 4))
+
+if mode == 'asgi':
+    wsgi_app = 'fitnesstracker.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'fitnesstracker.wsgi:application'
+
+# Each worker writes its metrics to files in this directory so that /metrics can
+# report the totals of all of them. See fitnesstracker/metrics.py.
+metrics_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'fitness-tracker-metrics'),
+)
+
+def on_starting(server):
+    # Start from zero rather than with the metrics of a previous run.
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
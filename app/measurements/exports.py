@@ -0,0 +1,29 @@
+""" Export of the Measurement history. The export returns its column names and a
+queryset of rows with those columns, for streaming by fitnesstracker.export.
+"""
+from django.db.models import F
+
+from .models import Measurement
+
+def measurements(start=None, end=None):
+    """ Every Measurement taken in the date range. """
+    rows = Measurement.objects.order_by('date', 'pk')
+    if start is not None:
+        rows = rows.filter(date__gte=start)
+    if end is not None:
+        rows = rows.filter(date__lt=end)
+
+    rows = rows.annotate(
+        type_name=F('type__name'),
+        unit=F('type__unit'),
+        symbol=F('type__symbol'),
+    )
+    columns = (
+        'id', 'date', 'type_id', 'type_name', 'measurement', 'unit', 'symbol',
+        'notes',
+    )
+    return columns, rows.values_list(*columns)
+
+EXPORTS = {
+    'measurements': measurements,
+}
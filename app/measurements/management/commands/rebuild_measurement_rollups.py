@@ -0,0 +1,100 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from measurements.models import MeasurementRollup, MeasurementType, series_cache
+from measurements.series import bucketed_series, rollup_series
+
+STATISTICS = ('count', 'sum', 'min', 'max', 'last', 'last_date')
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the day, week and month MeasurementRollups of every '
+        'MeasurementType from their Measurements, or check them against them '
+        'with --check.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report rollups that are missing or out of date without '
+                 'changing them',
+        )
+        parser.add_argument(
+            '--type', type=int, action='append', dest='types',
+            help='The ID of a MeasurementType to process, defaults to all',
+        )
+
+    def handle(self, *args, **options):
+        types = MeasurementType.objects.order_by('pk')
+        if options['types']:
+            types = types.filter(pk__in=options['types'])
+
+        if options['check']:
+            self.check_rollups(types)
+            return
+
+        written = 0
+        for type in types:
+            with transaction.atomic():
+                MeasurementRollup.objects.filter(type=type).delete()
+                for period, _name in MeasurementRollup.PERIODS:
+                    rollups = MeasurementRollup.objects.bulk_create(
+                        [
+                            MeasurementRollup(
+                                type=type, period=period, start=bucket['date'],
+                                **{s: bucket[s] for s in STATISTICS},
+                            )
+                            for bucket in bucketed_series(type, period)
+                        ],
+                        batch_size=1000,
+                    )
+                    written += len(rollups)
+                series_cache.invalidate(type.pk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} measurement rollups'
+        ))
+
+    def check_rollups(self, types):
+        problems = 0
+
+        for type in types:
+            for period, _name in MeasurementRollup.PERIODS:
+                expected = {b['date']: b for b in bucketed_series(type, period)}
+                actual = {r['date']: r for r in rollup_series(type, period)}
+
+                for start in expected.keys() | actual.keys():
+                    description = f'{type.name} {period} {start:%Y-%m-%d}'
+                    if start not in actual:
+                        problems += 1
+                        self.stdout.write(f'{description}: missing rollup')
+                        continue
+                    if start not in expected:
+                        problems += 1
+                        self.stdout.write(f'{description}: unexpected rollup')
+                        continue
+
+                    for statistic in STATISTICS:
+                        a = actual[start][statistic]
+                        e = expected[start][statistic]
+                        same = (
+                            math.isclose(a, e, rel_tol=1e-9, abs_tol=1e-9)
+                            if isinstance(e, float) else a == e
+                        )
+                        if not same:
+                            problems += 1
+                            self.stdout.write(
+                                f'{description}: {statistic} is {a} but '
+                                f'should be {e}'
+                            )
+
+        if problems:
+            raise CommandError(
+                f'Found {problems} problems with the measurement rollups, run '
+                'this command without --check to rebuild them'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'All of the measurement rollups are up to date'
+        ))
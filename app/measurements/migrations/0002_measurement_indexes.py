@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['-date', 'type'], name='measurement_date_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='measurement',
+            index=models.Index(fields=['type', '-date'], name='measurement_type_date_idx'),
+        ),
+    ]
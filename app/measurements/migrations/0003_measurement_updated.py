@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0002_measurement_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='measurement',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
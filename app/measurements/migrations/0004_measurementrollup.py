@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:34
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+import django.db.models.deletion
+
+PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def populate_rollups(apps, schema_editor):
+    Measurement = apps.get_model('measurements', 'Measurement')
+    MeasurementRollup = apps.get_model('measurements', 'MeasurementRollup')
+    type_ids = Measurement.objects.values_list('type_id', flat=True).distinct()
+
+    for type_id in type_ids:
+        measurements = Measurement.objects.filter(type_id=type_id)
+        last_values = dict(
+            measurements.order_by('date', 'pk').values_list('date', 'measurement')
+        )
+        for period, trunc in PERIODS.items():
+            buckets = (
+                measurements.annotate(bucket=trunc('date'))
+                .order_by()
+                .values('bucket')
+                .annotate(
+                    count=Count('pk'), sum=Sum('measurement'),
+                    min=Min('measurement'), max=Max('measurement'),
+                    last_date=Max('date'),
+                )
+            )
+            MeasurementRollup.objects.bulk_create(
+                [
+                    MeasurementRollup(
+                        type_id=type_id, period=period, start=b['bucket'],
+                        count=b['count'], sum=b['sum'], min=b['min'],
+                        max=b['max'], last=last_values[b['last_date']],
+                        last_date=b['last_date'],
+                    )
+                    for b in buckets
+                ],
+                batch_size=1000,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('measurements', '0003_measurement_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeasurementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=5)),
+                ('start', models.DateTimeField(help_text='The start of the day, week or month in the local time zone')),
+                ('count', models.PositiveIntegerField()),
+                ('sum', models.FloatField()),
+                ('min', models.FloatField()),
+                ('max', models.FloatField()),
+                ('last', models.FloatField(help_text='The value of the latest Measurement')),
+                ('last_date', models.DateTimeField()),
+                ('type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='measurements.measurementtype')),
+            ],
+            options={
+                'ordering': ['type', 'period', 'start'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='measurementrollup',
+            constraint=models.UniqueConstraint(fields=('type', 'period', 'start'), name='measurementrollup_type_period_start_unique'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
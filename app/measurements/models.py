@@ -1,8 +1,14 @@
+import datetime
+
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models import Case, F, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
+from fitnesstracker.cache import VersionedCache
+
 class MeasurementType(models.Model):
     """ MeasurementType represents anything that can be measured such as weight,
     blood pressure, heart rate or waist.
@@ -30,6 +36,7 @@ class Measurement(models.Model):
     """ Measurement represents a recording of a particular measurement type at a
     given point in time.
     """
+    updated = models.DateTimeField(auto_now=True)
     date = models.DateTimeField(default=timezone.now)
     type = models.ForeignKey(MeasurementType, on_delete=models.PROTECT)
     measurement = models.FloatField(
@@ -40,6 +47,215 @@ class Measurement(models.Model):
 
     class Meta:
         ordering = ["-date", "type",]
+        indexes = [
+            models.Index(fields=["-date", "type"], name="measurement_date_type_idx"),
+            models.Index(fields=["type", "-date"], name="measurement_type_date_idx"),
+        ]
 
     def __str__(self):
         return f'{self.type.name[:50]} - {self.measurement}{self.type.symbol}'
+
+def measurement_as_of(type_id, date) -> Subquery:
+    """ Return a subquery of the value of the latest Measurement of a
+    MeasurementType taken on or before a date, which is usually an OuterRef to
+    the date of each row of the outer query. Each is found with a lookup on
+    the measurement_type_date_idx index rather than a query per row.
+    """
+    return Subquery(
+        Measurement.objects.filter(type_id=type_id, date__lte=date)
+        .order_by('-date')
+        .values('measurement')[:1]
+    )
+
+def measurements_as_of(type_id, dates) -> list:
+    """ Return the value of the latest Measurement of a MeasurementType taken on
+    or before each of a list of dates, or None for dates before the first, in
+    the same order as the dates, with a single query however many there are.
+    Dates without a time, such as those of Journals, are as of the end of the
+    day in the current time zone.
+
+    On PostgreSQL each date is looked up on the measurement_type_date_idx index
+    with a LATERAL join. Other databases read the Measurements from the last
+    one before the earliest date until the latest date in order on the same
+    index and merge the sorted dates into them.
+    """
+    dates = [
+        date if isinstance(date, datetime.datetime)
+        else timezone.make_aware(datetime.datetime.combine(date, datetime.time.max))
+        for date in dates
+    ]
+    if not dates:
+        return []
+    if connection.vendor == 'postgresql':
+        return _lateral_as_of(type_id, dates)
+    return _merged_as_of(type_id, dates)
+
+def _lateral_as_of(type_id, dates):
+    table = connection.ops.quote_name(Measurement._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT m.measurement FROM unnest(%s::timestamptz[]) '
+            f'WITH ORDINALITY AS points(date, i) LEFT JOIN LATERAL ('
+            f'SELECT measurement FROM {table} '
+            f'WHERE type_id = %s AND date <= points.date '
+            f'ORDER BY date DESC LIMIT 1'
+            f') m ON true ORDER BY points.i',
+            [dates, type_id],
+        )
+        return [value for value, in cursor.fetchall()]
+
+def _merged_as_of(type_id, dates):
+    order = sorted(range(len(dates)), key=dates.__getitem__)
+    first, last = dates[order[0]], dates[order[-1]]
+    since = Coalesce(
+        Subquery(
+            Measurement.objects.filter(type_id=type_id, date__lte=first)
+            .order_by('-date')
+            .values('date')[:1]
+        ),
+        Value(first),
+        output_field=models.DateTimeField(),
+    )
+    measurements = (
+        Measurement.objects.filter(type_id=type_id, date__lte=last)
+        .filter(date__gte=since)
+        .order_by('date')
+        .values_list('date', 'measurement')
+        .iterator(chunk_size=5000)
+    )
+
+    values = [None] * len(dates)
+    value = None
+    upcoming = next(measurements, None)
+    for i in order:
+        while upcoming is not None and upcoming[0] <= dates[i]:
+            value = upcoming[1]
+            upcoming = next(measurements, None)
+        values[i] = value
+    return values
+
+def period_bounds(date: datetime.datetime, period: str):
+    """ Return the start and end of the day, week (starting on Monday) or month
+    in the current time zone that contains the given date.
+    """
+    day = timezone.localtime(date).date()
+    if period == 'day':
+        start = day
+        end = day + datetime.timedelta(days=1)
+    elif period == 'week':
+        start = day - datetime.timedelta(days=day.weekday())
+        end = start + datetime.timedelta(weeks=1)
+    elif period == 'month':
+        start = day.replace(day=1)
+        end = (start + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        raise ValueError(f'Invalid period: {period}')
+
+    return tuple(
+        timezone.make_aware(datetime.datetime.combine(d, datetime.time()))
+        for d in (start, end)
+    )
+
+class MeasurementRollup(models.Model):
+    """ MeasurementRollup holds the statistics for all of the Measurements of a
+    MeasurementType in a single day, week or month. They are kept up to date as
+    Measurements are saved and deleted so that statistics over long periods of
+    time only need to read a few rollups rather than every Measurement.
+    """
+    PERIODS = (
+        ('day', 'Day'),
+        ('week', 'Week'),
+        ('month', 'Month'),
+    )
+    updated = models.DateTimeField(auto_now=True)
+    type = models.ForeignKey(MeasurementType, on_delete=models.CASCADE)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    start = models.DateTimeField(
+        help_text=_('The start of the day, week or month in the local time zone'),
+    )
+    count = models.PositiveIntegerField()
+    sum = models.FloatField()
+    min = models.FloatField()
+    max = models.FloatField()
+    last = models.FloatField(help_text=_('The value of the latest Measurement'))
+    last_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ["type", "period", "start",]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["type", "period", "start"],
+                name="measurementrollup_type_period_start_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.type_id} | {self.period} | {self.start:%Y-%m-%d}'
+
+    def mean(self) -> float:
+        return self.sum / self.count
+
+    @classmethod
+    def add(cls, measurement: Measurement):
+        """ Add a newly created Measurement to the rollups that contain it
+        without having to recalculate them from all of their Measurements.
+        """
+        # Measurements can be created with ints, which can't be compared with
+        # the rollups' floats in the database.
+        value = float(measurement.measurement)
+        for period, _name in cls.PERIODS:
+            start, end = period_bounds(measurement.date, period)
+            updated = cls.objects.filter(
+                type_id=measurement.type_id, period=period, start=start,
+            ).update(
+                count=F('count') + 1,
+                sum=F('sum') + value,
+                min=Least('min', Value(value)),
+                max=Greatest('max', Value(value)),
+                last=Case(
+                    When(last_date__lte=measurement.date, then=Value(value)),
+                    default=F('last'),
+                ),
+                last_date=Greatest('last_date', Value(measurement.date)),
+                updated=timezone.now(),
+            )
+            if not updated:
+                cls.refresh(measurement.type_id, measurement.date, [period])
+
+    @classmethod
+    def refresh(cls, type_id, date: datetime.datetime, periods=None):
+        """ Recalculate the rollups of the given MeasurementType that contain
+        the given date from their Measurements, deleting any that no longer
+        have any Measurements.
+        """
+        for period in periods or [p for p, _name in cls.PERIODS]:
+            start, end = period_bounds(date, period)
+            measurements = Measurement.objects.filter(
+                type_id=type_id, date__gte=start, date__lt=end,
+            )
+            stats = measurements.aggregate(
+                count=models.Count('pk'),
+                sum=models.Sum('measurement'),
+                min=models.Min('measurement'),
+                max=models.Max('measurement'),
+            )
+            if not stats['count']:
+                cls.objects.filter(
+                    type_id=type_id, period=period, start=start,
+                ).delete()
+                continue
+
+            last = measurements.order_by('-date', '-pk').values(
+                'date', 'measurement',
+            ).first()
+            cls.objects.update_or_create(
+                type_id=type_id, period=period, start=start,
+                defaults={
+                    **stats,
+                    'last': last['measurement'],
+                    'last_date': last['date'],
+                },
+            )
+
+# The cached series of each MeasurementType, scoped by its ID.
+series_cache = VersionedCache('measurements:series')
@@ -0,0 +1,173 @@
+""" Time series of Measurements for charting. Series can be bucketed by day, week
+or month, with the statistics for each bucket read from the MeasurementRollups
+or calculated by the database, and downsampled to a given number of points with
+the Largest-Triangle-Three-Buckets (LTTB) algorithm.
+"""
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+from fitnesstracker.asynchronous import aiterator
+from .models import Measurement, MeasurementRollup, period_bounds
+
+PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+def measurements_for(type, start=None, end=None):
+    """ Return the Measurements of the given type taken from start (inclusive)
+    until end (exclusive).
+    """
+    measurements = Measurement.objects.filter(type=type)
+    if start is not None:
+        measurements = measurements.filter(date__gte=start)
+    if end is not None:
+        measurements = measurements.filter(date__lt=end)
+    return measurements
+
+def _raw_values(type, start, end):
+    return (
+        measurements_for(type, start, end)
+        .order_by('date', 'pk')
+        .values_list('date', 'measurement')
+    )
+
+def raw_series(type, start=None, end=None) -> list:
+    """ Return the date and value of every Measurement of the given type in the
+    date range in date order.
+    """
+    return [
+        {'date': date, 'value': value}
+        for date, value in _raw_values(type, start, end).iterator(chunk_size=5000)
+    ]
+
+async def araw_series(type, start=None, end=None) -> list:
+    """ An async version of raw_series(). """
+    return [
+        {'date': date, 'value': value}
+        async for date, value
+        in aiterator(_raw_values(type, start, end), chunk_size=5000)
+    ]
+
+def _rollups(type, period, start, end):
+    rollups = MeasurementRollup.objects.filter(type=type, period=period)
+    if start is not None:
+        rollups = rollups.filter(start__gte=period_bounds(start, period)[0])
+    if end is not None:
+        rollups = rollups.filter(start__lt=end)
+    return rollups.order_by('start')
+
+def _rollup_point(rollup) -> dict:
+    return {
+        'date': rollup.start,
+        'count': rollup.count,
+        'sum': rollup.sum,
+        'min': rollup.min,
+        'max': rollup.max,
+        'mean': rollup.mean(),
+        'last': rollup.last,
+        'last_date': rollup.last_date,
+    }
+
+def rollup_series(type, period: str, start=None, end=None) -> list:
+    """ Return the same statistics as bucketed_series() from the rollups of the
+    given type. Every bucket that overlaps the date range is included in full.
+    """
+    return [
+        _rollup_point(rollup) for rollup in _rollups(type, period, start, end)
+    ]
+
+async def arollup_series(type, period: str, start=None, end=None) -> list:
+    """ An async version of rollup_series(). """
+    return [
+        _rollup_point(rollup)
+        async for rollup in _rollups(type, period, start, end)
+    ]
+
+def bucketed_series(type, period: str, start=None, end=None) -> list:
+    """ Return the count, sum, minimum, maximum, mean and last value of the
+    Measurements of the given type in each day, week or month of the date
+    range, in date order, calculated from the Measurements themselves.
+    """
+    buckets = list(
+        measurements_for(type, start, end)
+        .annotate(bucket=PERIODS[period]('date'))
+        .order_by()
+        .values('bucket')
+        .annotate(
+            count=Count('pk'),
+            sum=Sum('measurement'),
+            min=Min('measurement'),
+            max=Max('measurement'),
+            mean=Avg('measurement'),
+            last_date=Max('date'),
+        )
+        .order_by('bucket')
+    )
+
+    # Look up the values of the last Measurement in every bucket together.
+    last_values = dict(
+        measurements_for(type, start, end)
+        .filter(date__in=[bucket['last_date'] for bucket in buckets])
+        .order_by('date', 'pk')
+        .values_list('date', 'measurement')
+    )
+
+    return [
+        {
+            'date': bucket['bucket'],
+            'count': bucket['count'],
+            'sum': bucket['sum'],
+            'min': bucket['min'],
+            'max': bucket['max'],
+            'mean': bucket['mean'],
+            'last': last_values.get(bucket['last_date']),
+            'last_date': bucket['last_date'],
+        }
+        for bucket in buckets
+    ]
+
+def lttb(points: list, threshold: int, x=None, y=None) -> list:
+    """ Downsample a list of points to threshold points using the Largest-
+    Triangle-Three-Buckets algorithm, which keeps the visual shape of the
+    series. The x and y functions return the coordinates of a point, by default
+    the timestamp of its date and its value.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    x = x or (lambda point: point['date'].timestamp())
+    y = y or (lambda point: point['value'])
+    xs = [x(point) for point in points]
+    ys = [y(point) for point in points]
+
+    # The first and last points are always kept, the rest are split into
+    # threshold - 2 buckets and the point from each bucket that forms the
+    # largest triangle with the previously chosen point and the average of the
+    # next bucket is kept.
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        start = int(i * every) + 1
+        end = next_start
+        largest, chosen = -1.0, start
+        for j in range(start, end):
+            area = abs(
+                (xs[a] - avg_x) * (ys[j] - ys[a])
+                - (xs[a] - xs[j]) * (avg_y - ys[a])
+            )
+            if area > largest:
+                largest, chosen = area, j
+
+        sampled.append(points[chosen])
+        a = chosen
+
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Measurement, MeasurementRollup, MeasurementType, series_cache
+
+@receiver(pre_save, sender=Measurement)
+def remember_previous_measurement(sender, instance, raw, **kwargs):
+    """ Keep a note of the type and date of a Measurement before it is saved so
+    that the rollups it used to belong to can be refreshed if they change.
+    """
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = (
+            Measurement.objects.filter(pk=instance.pk)
+            .values_list('type_id', 'date')
+            .first()
+        )
+
+@receiver(post_save, sender=Measurement)
+def update_rollups_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    series_cache.invalidate(instance.type_id)
+    if created:
+        MeasurementRollup.add(instance)
+        return
+
+    previous = getattr(instance, '_previous', None)
+    if previous and previous != (instance.type_id, instance.date):
+        series_cache.invalidate(previous[0])
+        MeasurementRollup.refresh(*previous)
+    MeasurementRollup.refresh(instance.type_id, instance.date)
+
+@receiver(post_delete, sender=Measurement)
+def update_rollups_on_delete(sender, instance, **kwargs):
+    series_cache.invalidate(instance.type_id)
+    MeasurementRollup.refresh(instance.type_id, instance.date)
+
+@receiver(post_save, sender=MeasurementType)
+@receiver(post_delete, sender=MeasurementType)
+def invalidate_series(sender, instance, **kwargs):
+    series_cache.invalidate(instance.pk)
@@ -1,3 +1,247 @@
+import datetime
+
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from fitnesstracker.testing import analyze, changelist_queryset, sequential_scans
+from nutrition.models import Journal
+from .models import (
+    Measurement, MeasurementRollup, MeasurementType, measurements_as_of,
+)
+from .series import bucketed_series, lttb, raw_series, rollup_series
+
+class MeasurementQueryPlanTests(TestCase):
+    """ The Measurement changelist should use indexes for its filtering and
+    ordering rather than reading the whole table.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.types = [
+            MeasurementType.objects.create(name=name, unit='unit', symbol='u')
+            for name in ('Weight', 'Heart rate', 'Waist', 'Blood pressure')
+        ]
+        now = timezone.now()
+        Measurement.objects.bulk_create([
+            Measurement(
+                date=now - datetime.timedelta(hours=i),
+                type=cls.types[i % len(cls.types)],
+                measurement=float(i % 100),
+            )
+            for i in range(10_000)
+        ])
+        analyze()
+
+    def assertNoSequentialScans(self, params=None):
+        queryset = changelist_queryset(Measurement, self.user, params)
+        self.assertEqual(
+            sequential_scans(queryset, ['measurements_measurement']), [],
+            queryset.explain(),
+        )
+
+    def test_changelist(self):
+        self.assertNoSequentialScans()
+
+    def test_changelist_by_type(self):
+        self.assertNoSequentialScans({'type__id__exact': self.types[0].pk})
+
+    def test_changelist_by_date(self):
+        since = timezone.now() - datetime.timedelta(days=7)
+        self.assertNoSequentialScans({'date__gte': since.isoformat()})
+
+class MeasurementSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.weight = MeasurementType.objects.create(
+            name='Weight', unit='kilograms', symbol='kg',
+        )
+        start = timezone.make_aware(datetime.datetime(2024, 1, 1, 8))
+        # Two readings a day for four weeks, with the later one 1kg heavier.
+        Measurement.objects.bulk_create([
+            Measurement(
+                date=start + datetime.timedelta(days=day, hours=hour),
+                type=cls.weight,
+                measurement=80.0 + day * 0.1 + hour / 12,
+            )
+            for day in range(28) for hour in (0, 12)
+        ])
+        call_command('rebuild_measurement_rollups', stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bucketed_series(self):
+        days = bucketed_series(self.weight, 'day')
+        self.assertEqual(len(days), 28)
+        self.assertEqual(days[0]['count'], 2)
+        self.assertAlmostEqual(days[0]['min'], 80.0)
+        self.assertAlmostEqual(days[0]['max'], 81.0)
+        self.assertAlmostEqual(days[0]['mean'], 80.5)
+        self.assertAlmostEqual(days[0]['last'], 81.0)
+
+        # 2024-01-01 was a Monday, so there are exactly four weeks.
+        weeks = bucketed_series(self.weight, 'week')
+        self.assertEqual([week['count'] for week in weeks], [14] * 4)
+        self.assertAlmostEqual(weeks[-1]['last'], 80.0 + 2.7 + 1.0)
+
+    def test_measurements_as_of(self):
+        heart_rate = MeasurementType.objects.create(
+            name='Heart rate', unit='beats per minute', symbol='bpm',
+        )
+        Measurement.objects.create(
+            type=heart_rate, measurement=60.0,
+            date=timezone.make_aware(datetime.datetime(2024, 1, 1, 19)),
+        )
+
+        def at(*args):
+            return timezone.make_aware(datetime.datetime(*args))
+        dates = [
+            at(2024, 1, 3, 21),
+            at(2023, 12, 31),
+            at(2024, 1, 1, 8),
+            at(2024, 1, 1, 19),
+            at(2024, 3, 1),
+            at(2024, 1, 3, 21),
+        ]
+        with self.assertNumQueries(1):
+            values = measurements_as_of(self.weight.pk, dates)
+        self.assertEqual(len(values), len(dates))
+        for value, expected in zip(values, [81.2, None, 80.0, 80.0, 83.7, 81.2]):
+            if expected is None:
+                self.assertIsNone(value)
+            else:
+                self.assertAlmostEqual(value, expected)
+
+        # Every date agrees with a lookup of each on its own.
+        dates = [at(2024, 1, 1) + datetime.timedelta(hours=7 * i) for i in range(100)]
+        self.assertEqual(
+            measurements_as_of(self.weight.pk, dates),
+            [
+                Measurement.objects.filter(type=self.weight, date__lte=date)
+                .values_list('measurement', flat=True).first()
+                for date in dates
+            ],
+        )
+        self.assertEqual(measurements_as_of(self.weight.pk, []), [])
+
+        # Journal dates are as of the end of the day.
+        journals = [
+            Journal.objects.create(date=datetime.date(2024, 1, day))
+            for day in (3, 1)
+        ]
+        values = measurements_as_of(
+            self.weight.pk, [journal.date for journal in journals],
+        )
+        self.assertAlmostEqual(values[0], 81.2)
+        self.assertAlmostEqual(values[1], 81.0)
+        self.assertEqual(measurements_as_of(heart_rate.pk, dates[:1]), [None])
+
+    def test_lttb(self):
+        series = raw_series(self.weight)
+        sampled = lttb(series, 10)
+        self.assertEqual(len(sampled), 10)
+        self.assertEqual(sampled[0], series[0])
+        self.assertEqual(sampled[-1], series[-1])
+        self.assertEqual(lttb(series, 100), series)
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        url = reverse('measurements:measurement_series', args=[self.weight.pk])
+
+        response = self.client.get(url, {'period': 'month', 'points': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['series'][0]['count'], 56)
+
+        response = self.client.get(url, {'points': 10})
+        self.assertEqual(len(response.json()['series']), 10)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        response = self.client.get(url, {'points': 10}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['series']), 56)
+        with self.captureOnCommitCallbacks(execute=True):
+            Measurement.objects.create(type=self.weight, measurement=79.0)
+        response = self.client.get(url, {'points': 10}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url)
+        self.assertEqual(len(response.json()['series']), 57)
+
+        response = self.client.get(url, {'period': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+class MeasurementRollupTests(TestCase):
+    def setUp(self):
+        self.weight = MeasurementType.objects.create(
+            name='Weight', unit='kilograms', symbol='kg',
+        )
+        self.start = timezone.make_aware(datetime.datetime(2024, 3, 4, 8))
+
+    def measure(self, days, value):
+        return Measurement.objects.create(
+            type=self.weight, measurement=value,
+            date=self.start + datetime.timedelta(days=days),
+        )
+
+    def assertRollupsMatch(self):
+        for period, _name in MeasurementRollup.PERIODS:
+            self.assertEqual(
+                rollup_series(self.weight, period),
+                bucketed_series(self.weight, period),
+            )
+        call_command('rebuild_measurement_rollups', '--check', stdout=StringIO())
+
+    def test_add(self):
+        self.measure(0, 80.0)
+        self.measure(1, 81)
+        # Out of order, so it is not the last in its week or month.
+        earlier = self.measure(-1, 79.0)
+        self.assertRollupsMatch()
+
+        # The earlier Measurement is on the Sunday before, in the previous week.
+        self.assertEqual(earlier.date.weekday(), 6)
+        week = MeasurementRollup.objects.get(
+            type=self.weight, period='week', start__gt=earlier.date,
+        )
+        self.assertEqual(
+            (week.count, week.min, week.max, week.last), (2, 80.0, 81.0, 81.0),
+        )
+        month = MeasurementRollup.objects.get(type=self.weight, period='month')
+        self.assertEqual((month.count, month.min, month.last), (3, 79.0, 81.0))
+
+    def test_change_and_delete(self):
+        first = self.measure(0, 80.0)
+        last = self.measure(1, 81.0)
+        last.measurement = 82.0
+        last.save()
+        self.assertRollupsMatch()
+
+        # Moving a Measurement to another month refreshes both months.
+        first.date = self.start - datetime.timedelta(days=10)
+        first.save()
+        self.assertEqual(
+            MeasurementRollup.objects.filter(type=self.weight, period='month').count(), 2,
+        )
+        self.assertRollupsMatch()
+
+        last.delete()
+        first.delete()
+        self.assertFalse(MeasurementRollup.objects.exists())
 
-# Create your tests here.
+    def test_check_finds_problems(self):
+        self.measure(0, 80.0)
+        MeasurementRollup.objects.filter(period='day').update(max=100.0)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_measurement_rollups', '--check', stdout=StringIO())
+        call_command('rebuild_measurement_rollups', stdout=StringIO())
+        self.assertRollupsMatch()
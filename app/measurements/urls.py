@@ -0,0 +1,11 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'measurements'
+urlpatterns = [
+    path(
+        'series/<int:type_id>/', views.measurement_series,
+        name='measurement_series',
+    ),
+]
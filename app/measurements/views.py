@@ -1,3 +1,97 @@
-from django.shortcuts import render
+import hashlib
 
-# Create your views here.
+from django.db.models import Count, Max, Sum
+from django.http import Http404, JsonResponse
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+
+from fitnesstracker.asynchronous import (
+    async_condition, async_require_GET, async_staff_member_required,
+)
+from .models import MeasurementRollup, MeasurementType, series_cache
+from .series import PERIODS, araw_series, arollup_series, lttb
+
+async def _series_state(request, type_id):
+    """ Return the number of Measurements of the given type and when their
+    monthly rollups were last updated, which together change whenever any of
+    them are added, changed or deleted. This is cached on the request as it is
+    needed for both the ETag and Last-Modified headers.
+    """
+    if not hasattr(request, '_series_state'):
+        request._series_state = await MeasurementRollup.objects.filter(
+            type_id=type_id, period='month',
+        ).aaggregate(
+            rollups=Count('pk'), count=Sum('count'), updated=Max('updated'),
+        )
+    return request._series_state
+
+async def _series_etag(request, type_id):
+    state = await _series_state(request, type_id)
+    key = f'{type_id}:{state["rollups"]}:{state["count"]}:{state["updated"]}:'
+    key += request.GET.urlencode()
+    return hashlib.sha1(key.encode()).hexdigest()
+
+async def _series_last_modified(request, type_id):
+    return (await _series_state(request, type_id))['updated']
+
+def _parse_date(value):
+    if not value:
+        return None
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Invalid date: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+@async_staff_member_required
+@async_require_GET
+@async_condition(etag_func=_series_etag, last_modified_func=_series_last_modified)
+async def measurement_series(request, type_id):
+    """ Return the Measurements of a MeasurementType as JSON. The optional
+    parameters are:
+
+    * period: day, week or month to return statistics for each bucket of time
+      rather than the individual Measurements.
+    * start and end: ISO 8601 dates to limit the series to.
+    * points: the maximum number of points to return, the series is downsampled
+      with LTTB if it has more than this.
+    """
+    try:
+        type = await MeasurementType.objects.aget(pk=type_id)
+    except MeasurementType.DoesNotExist:
+        raise Http404('No MeasurementType matches the given query.')
+    period = request.GET.get('period')
+    try:
+        start = _parse_date(request.GET.get('start'))
+        end = _parse_date(request.GET.get('end'))
+        points = int(request.GET.get('points', 0))
+        if period is not None and period not in PERIODS:
+            raise ValueError(f'Invalid period: {period}')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    async def load():
+        if period is None:
+            series = await araw_series(type, start, end)
+            y = None
+        else:
+            series = await arollup_series(type, period, start, end)
+            y = lambda point: point['mean']
+        if points:
+            series = lttb(series, points, y=y)
+        return series
+
+    series = await series_cache.aget_or_set(
+        (period, start, end, points), load, scope=type.pk,
+    )
+    return JsonResponse({
+        'type': {
+            'id': type.pk,
+            'name': type.name,
+            'unit': type.unit,
+            'symbol': type.symbol,
+        },
+        'period': period,
+        'series': series,
+    })
@@ -1,12 +1,87 @@
-from django.contrib import admin
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.exceptions import PermissionDenied
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
 # Register your models here.
-from .models import FoodCategory, FoodItem, Journal, JournalItem, TargetIntake
+from .imports import FoodItemImporter, read_rows
+from .models import (
+    FoodCategory, FoodItem, Journal, JournalItem, NUTRIENTS, RecipeComponent,
+    TargetIntake,
+)
+from .search import search_food_items
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """ PreloadedAutocompleteSelect is an AutocompleteSelect that renders its
+    selected option from an instance that has already been loaded, rather than
+    querying for it each time a form is rendered.
+    """
+    instances = {}
+
+    def optgroups(self, name, value, attr=None):
+        selected_choices = {
+            str(v) for v in value
+            if str(v) not in self.choices.field.empty_values
+        }
+        if not selected_choices or not selected_choices <= self.instances.keys():
+            return super().optgroups(name, value, attr)
+
+        default = (None, [], 0)
+        if not self.is_required and not self.allow_multiple_selected:
+            default[1].append(self.create_option(name, "", "", False, 0))
+        for pk in sorted(selected_choices):
+            default[1].append(self.create_option(
+                name, pk,
+                self.choices.field.label_from_instance(self.instances[pk]),
+                selected_choices, len(default[1]),
+            ))
+        return [default]
+
+class JournalItemFormSet(BaseInlineFormSet):
+    def _construct_form(self, i, **kwargs):
+        # Hand the FoodItem loaded by JournalItemInline.get_queryset() to the
+        # autocomplete widget so it does not need to fetch it again.
+        form = super()._construct_form(i, **kwargs)
+        # The admin wraps the widget in a RelatedFieldWidgetWrapper.
+        widget = form.fields["food_item"].widget
+        widget = getattr(widget, "widget", widget)
+        if form.instance.food_item_id and isinstance(
+            widget, PreloadedAutocompleteSelect
+        ):
+            widget.instances = {
+                str(form.instance.food_item_id): form.instance.food_item,
+            }
+        return form
+
+class FoodItemImportForm(forms.Form):
+    file = forms.FileField(
+        help_text="A CSV file with a header row, a JSON array of objects or "
+                  "newline-delimited JSON, with a code, name and category for "
+                  "each FoodItem",
+    )
+    format = forms.ChoiceField(choices=[
+        ("csv", "CSV"), ("json", "JSON"), ("ndjson", "Newline-delimited JSON"),
+    ])
 
 class FoodCategoryAdmin(admin.ModelAdmin):
     ordering = ["name",]
 
+class RecipeComponentInline(admin.TabularInline):
+    model = RecipeComponent
+    fk_name = "recipe"
+    extra = 0
+    autocomplete_fields = ["food_item",]
+    verbose_name = "recipe component"
+
 class FoodItemAdmin(admin.ModelAdmin):
+    inlines = [RecipeComponentInline,]
     list_display = [
         "favourite", "name", "category", "subcategory", "brand", "range",
     ]
@@ -17,16 +92,132 @@ class FoodItemAdmin(admin.ModelAdmin):
         "-favourite", "category__name", "subcategory", "brand", "range", "name",
     ]
 
+    def get_readonly_fields(self, request, obj=None):
+        # The nutrients of a recipe are calculated from its components.
+        if obj is not None and obj.components.exists():
+            return [*super().get_readonly_fields(request, obj), *NUTRIENTS]
+        return super().get_readonly_fields(request, obj)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the ranked, index backed search for the autocomplete used to
+        # select FoodItems, the changelist search keeps the default behaviour.
+        match = getattr(request, "resolver_match", None)
+        if match and match.url_name == "autocomplete":
+            # Rank enough matches to fill the requested page and show whether
+            # there is another.
+            try:
+                page = max(int(request.GET.get("page", 1)), 1)
+            except ValueError:
+                page = 1
+            limit = page * AutocompleteJsonView.paginate_by + 1
+            results = search_food_items(queryset, search_term, limit)
+            if results is not None:
+                return results, False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_urls(self):
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="nutrition_fooditem_import",
+            ),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """ Import a catalogue of FoodItems from an uploaded file. """
+        if not (self.has_add_permission(request)
+                and self.has_change_permission(request)):
+            raise PermissionDenied
+
+        form = FoodItemImportForm(request.POST or None, request.FILES or None)
+        if request.method == "POST" and form.is_valid():
+            upload = io.TextIOWrapper(
+                form.cleaned_data["file"], encoding="utf-8-sig", newline="",
+            )
+            try:
+                result = FoodItemImporter().import_rows(
+                    read_rows(upload, form.cleaned_data["format"]),
+                )
+            except ValueError as e:
+                form.add_error("file", f"Unable to read the file: {e}")
+            else:
+                messages.success(request, (
+                    f"Imported {result.imported:,} of {result.rows:,} food "
+                    f"items and rejected {len(result.rejected):,}."
+                ))
+                for line, errors in result.rejected[:10]:
+                    messages.warning(request, f"Line {line}: " + "; ".join(
+                        f"{name}: {error}" for name, error in errors.items()
+                    ))
+                return redirect("admin:nutrition_fooditem_changelist")
+
+        return TemplateResponse(
+            request, "admin/nutrition/fooditem/import.html", {
+                **self.admin_site.each_context(request),
+                "title": "Import food items",
+                "opts": self.model._meta,
+                "form": form,
+            },
+        )
+
 class JournalItemInline(admin.TabularInline):
     model = JournalItem
+    formset = JournalItemFormSet
     extra = 1
     autocomplete_fields = ["food_item",]
 
+    def get_queryset(self, request):
+        # Each row displays JournalItem.__str__(), which uses the Journal and
+        # FoodItem, and the selected FoodItem's label, which uses its category.
+        return super().get_queryset(request).select_related(
+            "journal", "food_item__category",
+        )
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "food_item":
+            kwargs["widget"] = PreloadedAutocompleteSelect(
+                db_field, self.admin_site, using=kwargs.get("using"),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+class TargetMetListFilter(admin.SimpleListFilter):
+    """ Filter Journals by whether they met the current TargetIntake, which is
+    worked out in the database rather than for each Journal in turn.
+    """
+    title = "target met"
+    parameter_name = "target_met"
+
+    def lookups(self, request, model_admin):
+        return [("yes", "Yes"), ("no", "No"),]
+
+    def queryset(self, request, queryset):
+        target = TargetIntake.current()
+        if self.value() not in ("yes", "no") or target is None:
+            return queryset
+        return queryset.with_adherence(target).filter(
+            target_met=self.value() == "yes",
+        )
+
 class JournalAdmin(admin.ModelAdmin):
     inlines = [JournalItemInline,]
-    list_filter = ["date",]
+    list_filter = ["date", TargetMetListFilter,]
     ordering = ["-date",]
 
+    def get_queryset(self, request):
+        # Journal.__str__() displays the nutrition totals, so calculate them for
+        # the whole page at once instead of with a query per Journal.
+        return super().get_queryset(request).with_nutrition()
+
+class JournalItemAdmin(admin.ModelAdmin):
+    autocomplete_fields = ["food_item",]
+    list_select_related = ["journal", "food_item",]
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "journal":
+            kwargs["queryset"] = Journal.objects.with_nutrition()
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
 class TargetIntakeAdmin(admin.ModelAdmin):
     list_display = [
         "name", "energy", "fat", "protein", "active",
@@ -35,5 +226,5 @@ class TargetIntakeAdmin(admin.ModelAdmin):
 admin.site.register(FoodCategory, FoodCategoryAdmin)
 admin.site.register(FoodItem, FoodItemAdmin)
 admin.site.register(Journal, JournalAdmin)
-admin.site.register(JournalItem)
+admin.site.register(JournalItem, JournalItemAdmin)
 admin.site.register(TargetIntake, TargetIntakeAdmin)
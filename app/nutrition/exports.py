@@ -0,0 +1,62 @@
+""" Exports of the Journals and JournalItems with their nutritional values. Each
+export returns its column names and a queryset of rows with those columns, for
+streaming by fitnesstracker.export.
+"""
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Journal, JournalItem
+from .nutrients import NUTRIENTS, amount_expressions
+
+def journals(start=None, end=None):
+    """ Every Journal in the date range with its nutritional totals, which are
+    read from the JournalNutritionSummaries.
+    """
+    rows = Journal.objects.order_by('date')
+    if start is not None:
+        rows = rows.filter(date__gte=timezone.localdate(start))
+    if end is not None:
+        rows = rows.filter(date__lt=timezone.localdate(end))
+
+    rows = rows.annotate(**{
+        f'total_{nutrient}': Coalesce(
+            F(f'nutrition_summary__{nutrient}'), Value(0.0),
+            output_field=FloatField(),
+        )
+        for nutrient in NUTRIENTS
+    })
+    columns = (
+        'id', 'date', 'incomplete_data', 'notes',
+        *[f'total_{nutrient}' for nutrient in NUTRIENTS],
+    )
+    return columns, rows.values_list(*columns)
+
+def journal_items(start=None, end=None):
+    """ Every JournalItem of the Journals in the date range with its FoodItem
+    and the amount of each nutrient that it contributed.
+    """
+    rows = JournalItem.objects.order_by('journal__date', 'added', 'pk')
+    if start is not None:
+        rows = rows.filter(journal__date__gte=timezone.localdate(start))
+    if end is not None:
+        rows = rows.filter(journal__date__lt=timezone.localdate(end))
+
+    rows = rows.annotate(
+        date=F('journal__date'),
+        food_item_name=F('food_item__name'),
+        brand=F('food_item__brand'),
+        category=F('food_item__category__name'),
+        units=F('food_item__unit_units'),
+        **amount_expressions(),
+    )
+    columns = (
+        'id', 'journal_id', 'date', 'added', 'type', 'food_item_id',
+        'food_item_name', 'brand', 'category', 'quantity', 'units', *NUTRIENTS,
+    )
+    return columns, rows.values_list(*columns)
+
+EXPORTS = {
+    'journals': journals,
+    'journal-items': journal_items,
+}
@@ -0,0 +1,249 @@
+""" Bulk importing of FoodItem catalogues from CSV or JSON.
+
+Rows are matched to existing FoodItems by their code and inserted or updated
+in batches with a single upsert query each. Rather than building and cleaning
+a model instance per row, the limits from the model fields' validators are
+looked up once and every row is checked against them directly, along with the
+same nutrient rules as FoodItem.clean().
+"""
+import csv
+import json
+import math
+from dataclasses import dataclass, field
+
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import transaction
+
+from .models import (
+    NUTRIENTS, FoodCategory, FoodItem, JournalItem, JournalNutritionSummary,
+    RecipeComponent,
+)
+
+# The fields that are read from each row, other than the category's name.
+STRING_FIELDS = ('code', 'name', 'subcategory', 'brand', 'range', 'notes')
+FLOAT_FIELDS = ('unit_quantity', *NUTRIENTS)
+REQUIRED_FIELDS = ('code', 'name', 'category')
+# The fields that the user sets themselves, which are only imported for new
+# FoodItems so that updating a catalogue does not overwrite them.
+USER_FIELDS = ('favourite', 'notes')
+UPDATE_FIELDS = (
+    'updated', *(name for name in STRING_FIELDS[1:] if name not in USER_FIELDS),
+    'category', 'unit_units', *FLOAT_FIELDS,
+)
+
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'', '0', 'false', 'f', 'no', 'n'}
+
+@dataclass
+class ImportResult:
+    """ The outcome of an import, with the line number and errors of every row
+    that was rejected.
+    """
+    rows: int = 0
+    imported: int = 0
+    rejected: list = field(default_factory=list)
+    refreshed_journals: int = 0
+
+def read_rows(file, format: str):
+    """ Yield the rows of a CSV file with a header, a JSON array of objects or
+    newline-delimited JSON objects as dicts. The file must be opened in text
+    mode.
+    """
+    if format == 'csv':
+        yield from csv.DictReader(file)
+    elif format == 'json':
+        yield from json.load(file)
+    elif format == 'ndjson':
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        raise ValueError(f'Invalid format: {format}')
+
+def _limits(model_field):
+    lower = upper = None
+    for validator in model_field.validators:
+        if isinstance(validator, MinValueValidator):
+            lower = validator.limit_value
+        elif isinstance(validator, MaxValueValidator):
+            upper = validator.limit_value
+    return lower, upper
+
+class FoodItemImporter:
+    """ FoodItemImporter validates and upserts rows of FoodItems. The
+    FoodCategories are cached by name and any that do not exist yet are
+    created. The recipes and JournalNutritionSummaries that use an updated
+    FoodItem whose nutrients have changed are refreshed.
+    """
+    def __init__(self, batch_size: int=2000, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.categories = {
+            name.casefold(): pk
+            for pk, name in FoodCategory.objects.values_list('pk', 'name')
+        }
+        opts = FoodItem._meta
+        self.max_lengths = {
+            name: opts.get_field(name).max_length for name in STRING_FIELDS
+        }
+        self.max_lengths['category'] = FoodCategory._meta.get_field('name').max_length
+        self.limits = {name: _limits(opts.get_field(name)) for name in FLOAT_FIELDS}
+        self.defaults = {
+            name: opts.get_field(name).get_default()
+            for name in ('unit_quantity', 'unit_units')
+        }
+        self.units = {value for value, _label in FoodItem.UNITS}
+
+    def import_rows(self, rows) -> ImportResult:
+        result = ImportResult()
+        codes = {}
+        batch = []
+
+        # Line 1 of a CSV file is its header.
+        for line, row in enumerate(rows, start=2):
+            result.rows += 1
+            values, errors = self.validate(row)
+            if not errors:
+                if values['code'] in codes:
+                    errors = {'code': f'Duplicate of line {codes[values["code"]]}'}
+                else:
+                    codes[values['code']] = line
+
+            if errors:
+                result.rejected.append((line, errors))
+            else:
+                batch.append(values)
+            if len(batch) >= self.batch_size:
+                self.save(batch, result)
+                batch = []
+
+        if batch:
+            self.save(batch, result)
+        return result
+
+    def validate(self, row: dict):
+        """ Return the cleaned values of a row and a dict of its errors. """
+        values = {}
+        errors = {}
+        if not isinstance(row, dict):
+            return values, {'row': f'{type(row).__name__} is not an object'}
+
+        for name in (*STRING_FIELDS, 'category'):
+            value = row.get(name)
+            value = str(value).strip() if value is not None else ''
+            if not value:
+                if name in REQUIRED_FIELDS:
+                    errors[name] = 'This field is required'
+                values[name] = None
+            elif len(value) > self.max_lengths[name]:
+                errors[name] = (
+                    f'Must be at most {self.max_lengths[name]} characters'
+                )
+            else:
+                values[name] = value
+
+        for name in FLOAT_FIELDS:
+            value = row.get(name)
+            if value is None or value == '':
+                values[name] = self.defaults.get(name)
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                errors[name] = f'{value!r} is not a number'
+                continue
+            if not math.isfinite(value):
+                errors[name] = f'{value!r} is not a finite number'
+                continue
+            lower, upper = self.limits[name]
+            if (lower is not None and value < lower) or (
+                upper is not None and value > upper
+            ):
+                errors[name] = f'Must be between {lower} and {upper}'
+            values[name] = value
+
+        units = row.get('unit_units') or self.defaults['unit_units']
+        if not isinstance(units, str) or units not in self.units:
+            errors['unit_units'] = f'{units!r} is not one of {sorted(self.units)}'
+        values['unit_units'] = units
+
+        favourite = row.get('favourite', '')
+        if isinstance(favourite, bool):
+            values['favourite'] = favourite
+        elif str(favourite).strip().lower() in TRUE_VALUES | FALSE_VALUES:
+            values['favourite'] = str(favourite).strip().lower() in TRUE_VALUES
+        else:
+            errors['favourite'] = f'{favourite!r} is not true or false'
+
+        if not errors:
+            errors = FoodItem.nutrient_errors(values)
+        return values, errors
+
+    def category_id(self, name: str) -> int:
+        key = name.casefold()
+        if key not in self.categories:
+            self.categories[key] = FoodCategory.objects.create(name=name).pk
+        return self.categories[key]
+
+    def save(self, batch: list, result: ImportResult):
+        """ Upsert a batch of validated rows and refresh the recipes and the
+        summaries of the Journals that use any FoodItems whose nutrients were
+        changed.
+        """
+        fields = ('unit_quantity', *NUTRIENTS)
+        with transaction.atomic():
+            existing = {
+                code: (pk, values)
+                for code, pk, *values in FoodItem.objects.filter(
+                    code__in=[values['code'] for values in batch],
+                ).values_list('code', 'pk', *fields)
+            }
+            # The nutrients of recipes are calculated from their components,
+            # so they keep them rather than take the imported ones.
+            recipe_ids = set(
+                RecipeComponent.objects.filter(
+                    recipe_id__in=[pk for pk, _values in existing.values()],
+                ).values_list('recipe_id', flat=True)
+            )
+            for values in batch:
+                if values['code'] in existing:
+                    pk, current = existing[values['code']]
+                    if pk in recipe_ids:
+                        values.update(zip(fields, current))
+
+            changed = [
+                existing[values['code']][0]
+                for values in batch
+                if values['code'] in existing
+                and existing[values['code']][1]
+                != [values[name] for name in fields]
+            ]
+
+            food_items = []
+            for values in batch:
+                values = dict(values)
+                values['category_id'] = self.category_id(values.pop('category'))
+                food_items.append(FoodItem(**values))
+            FoodItem.objects.bulk_create(
+                food_items,
+                update_conflicts=True,
+                unique_fields=['code'],
+                update_fields=UPDATE_FIELDS,
+            )
+
+            if changed:
+                journal_ids = list(
+                    JournalItem.objects.filter(food_item_id__in=changed)
+                    .values_list('journal_id', flat=True)
+                    .distinct()
+                )
+                JournalNutritionSummary.refresh(journal_ids)
+                result.refreshed_journals += len(journal_ids)
+                RecipeComponent.refresh_recipes(
+                    RecipeComponent.objects.filter(food_item_id__in=changed)
+                    .values_list('recipe_id', flat=True)
+                )
+
+        result.imported += len(batch)
+        if self.progress:
+            self.progress(result)
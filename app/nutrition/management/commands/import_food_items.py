@@ -0,0 +1,73 @@
+import csv
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nutrition.imports import FoodItemImporter, read_rows
+
+FORMATS = ('csv', 'json', 'ndjson')
+
+class Command(BaseCommand):
+    help = (
+        'Import a catalogue of FoodItems from a CSV, JSON or NDJSON file, '
+        'inserting new FoodItems and updating existing ones with the same '
+        'code. Rows that fail validation are reported and skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The file to import')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='The format of the file, defaults to its extension',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='The number of FoodItems to upsert with each query',
+        )
+        parser.add_argument(
+            '--rejected',
+            help='Write the rejected rows and their errors to the given CSV file',
+        )
+
+    def handle(self, *args, **options):
+        format = options['format']
+        if format is None:
+            format = os.path.splitext(options['path'])[1].lstrip('.').lower()
+            if format not in FORMATS:
+                raise CommandError(
+                    'Unable to tell the format from the file extension, use '
+                    '--format'
+                )
+
+        importer = FoodItemImporter(options['batch_size'], self.report_progress)
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                result = importer.import_rows(read_rows(f, format))
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Unable to read {options["path"]}: {e}')
+
+        for line, errors in result.rejected[:20]:
+            self.stdout.write(self.style.WARNING(
+                f'Line {line}: {self.format_errors(errors)}'
+            ))
+        if len(result.rejected) > 20:
+            self.stdout.write(f'...and {len(result.rejected) - 20} more')
+
+        if options['rejected']:
+            with open(options['rejected'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['line', 'errors'])
+                for line, errors in result.rejected:
+                    writer.writerow([line, self.format_errors(errors)])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.imported:,} of {result.rows:,} food items, '
+            f'rejected {len(result.rejected):,} and refreshed '
+            f'{result.refreshed_journals:,} journal nutrition summaries'
+        ))
+
+    def report_progress(self, result):
+        self.stdout.write(f'Imported {result.imported:,} food items...')
+
+    def format_errors(self, errors):
+        return '; '.join(f'{name}: {error}' for name, error in errors.items())
@@ -0,0 +1,96 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nutrition.models import (
+    Journal, JournalItem, JournalNutritionSummary, NUTRIENTS,
+)
+from nutrition.nutrients import batch_totals
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the JournalNutritionSummary table from the JournalItems of '
+        'every Journal, or check it against them with --check.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report summaries that are missing or out of date without '
+                 'changing them',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='The number of Journals to process with each query',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        journal_ids = list(
+            Journal.objects.order_by('pk').values_list('pk', flat=True)
+        )
+
+        if options['check']:
+            self.check_summaries(journal_ids, batch_size)
+            return
+
+        written = JournalNutritionSummary.refresh(journal_ids, batch_size)
+        JournalNutritionSummary.objects.exclude(journal__in=journal_ids).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} journal nutrition summaries'
+        ))
+
+    def totals(self, journal_ids):
+        """ Calculate the totals of the given Journals in Python from their
+        JournalItems, independently of the SQL used to refresh the summaries.
+        """
+        rows = {journal_id: [] for journal_id in journal_ids}
+        for journal_id, *row in JournalItem.objects.filter(
+            journal_id__in=journal_ids,
+        ).values_list(
+            'journal_id', 'quantity', 'food_item__unit_quantity',
+            *[f'food_item__{nutrient}' for nutrient in NUTRIENTS],
+        ):
+            rows[journal_id].append(row)
+        return {
+            journal_id: batch_totals(journal_rows)
+            for journal_id, journal_rows in rows.items()
+        }
+
+    def check_summaries(self, journal_ids, batch_size):
+        problems = 0
+
+        for i in range(0, len(journal_ids), batch_size):
+            batch = journal_ids[i:i + batch_size]
+            totals = self.totals(batch)
+            summaries = JournalNutritionSummary.objects.in_bulk(batch)
+
+            for journal_id in batch:
+                summary = summaries.get(journal_id)
+                if summary is None:
+                    # Journals without any JournalItems have nothing to
+                    # summarise until their first JournalItem is saved.
+                    if not any(totals[journal_id].values()):
+                        continue
+                    problems += 1
+                    self.stdout.write(f'Journal {journal_id}: missing summary')
+                    continue
+
+                for nutrient in NUTRIENTS:
+                    expected = totals[journal_id][nutrient]
+                    actual = getattr(summary, nutrient)
+                    if not math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9):
+                        problems += 1
+                        self.stdout.write(
+                            f'Journal {journal_id}: {nutrient} is {actual} '
+                            f'but should be {expected}'
+                        )
+
+        if problems:
+            raise CommandError(
+                f'Found {problems} problems with the journal nutrition '
+                'summaries, run this command without --check to rebuild them'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'All {len(journal_ids)} journal nutrition summaries are up to date'
+        ))
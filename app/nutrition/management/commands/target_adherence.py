@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from nutrition.models import TargetIntake
+from nutrition.reports import target_adherence
+
+class Command(BaseCommand):
+    help = (
+        'Report how many days in a date range met a TargetIntake, along with '
+        'the current and longest streaks of days that met it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start', type=parse_date,
+            help='The first date to report on, as YYYY-MM-DD',
+        )
+        parser.add_argument(
+            '--end', type=parse_date,
+            help='The date to report up to but not including, as YYYY-MM-DD',
+        )
+        parser.add_argument(
+            '--target',
+            help='The name of the TargetIntake, defaults to the current one',
+        )
+        parser.add_argument(
+            '--deviation', type=float, default=0.05,
+            help='How far from the target each nutrient may be, as a fraction',
+        )
+
+    def handle(self, *args, **options):
+        target = None
+        if options['target']:
+            target = TargetIntake.objects.filter(name=options['target']).first()
+            if target is None:
+                raise CommandError(f'No TargetIntake named {options["target"]}')
+
+        report = target_adherence(
+            options['start'], options['end'], target, options['deviation'],
+        )
+        if report is None:
+            raise CommandError('There is no active TargetIntake')
+
+        for day in report['journals']:
+            self.stdout.write(
+                f'{day["date"]} {"met" if day["target_met"] else "   "} '
+                f'energy {day["energy_deviation"]:+.1%}, '
+                f'protein {day["protein_deviation"]:+.1%}, '
+                f'salt {day["salt_deviation"]:+.1%}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{report["target"].name}: met on {report["met"]} of '
+            f'{report["days"]} days ({report["percentage"]:.1f}%), current '
+            f'streak {report["current_streak"]}, longest streak '
+            f'{report["longest_streak"]}'
+        ))
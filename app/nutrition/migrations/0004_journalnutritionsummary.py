@@ -0,0 +1,65 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:21
+
+from django.db import migrations, models
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+NUTRIENTS = (
+    'energy', 'fat', 'saturates', 'carbohydrates', 'sugars', 'protein', 'salt',
+)
+
+
+def populate_summaries(apps, schema_editor):
+    Journal = apps.get_model('nutrition', 'Journal')
+    JournalNutritionSummary = apps.get_model('nutrition', 'JournalNutritionSummary')
+    totals = Journal.objects.annotate(**{
+        nutrient: Coalesce(
+            Sum(
+                F('journalitem__quantity') /
+                F('journalitem__food_item__unit_quantity') *
+                F(f'journalitem__food_item__{nutrient}'),
+                output_field=FloatField(),
+            ),
+            Value(0.0),
+        )
+        for nutrient in NUTRIENTS
+    }).values('pk', *NUTRIENTS)
+    JournalNutritionSummary.objects.bulk_create(
+        [
+            JournalNutritionSummary(
+                journal_id=row['pk'],
+                **{nutrient: row[nutrient] for nutrient in NUTRIENTS},
+            )
+            for row in totals.iterator(chunk_size=2000)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0003_journal_incomplete_data'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JournalNutritionSummary',
+            fields=[
+                ('journal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition_summary', serialize=False, to='nutrition.journal')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('energy', models.FloatField(default=0.0)),
+                ('fat', models.FloatField(default=0.0)),
+                ('saturates', models.FloatField(default=0.0)),
+                ('carbohydrates', models.FloatField(default=0.0)),
+                ('sugars', models.FloatField(default=0.0)),
+                ('protein', models.FloatField(default=0.0)),
+                ('salt', models.FloatField(default=0.0)),
+            ],
+            options={
+                'verbose_name_plural': 'Journal nutrition summaries',
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,130 @@
+import warnings
+
+from django.db import DatabaseError, migrations, transaction
+
+FTS_TABLE = 'nutrition_fooditem_fts'
+TRIGRAM_INDEX_COLUMNS = ('name', 'subcategory', 'brand', 'range')
+
+# Favourite FoodItems have a "favourite" token in the flags column so that they
+# can be found quickly among a large number of matches.
+FLAGS = "case when {row}.favourite then 'favourite' else '' end"
+
+SQLITE_FORWARDS = [
+    f'''
+    create virtual table {FTS_TABLE} using fts5(
+        name, category, subcategory, brand, range, flags,
+        tokenize = "unicode61 remove_diacritics 2",
+        prefix = '1 2 3'
+    )
+    ''',
+    f'''
+    insert into {FTS_TABLE}
+                (rowid, name, category, subcategory, brand, range, flags)
+         select fi.id, fi.name, fc.name, fi.subcategory, fi.brand, fi.range,
+                {FLAGS.format(row='fi')}
+           from nutrition_fooditem fi
+     inner join nutrition_foodcategory fc on fc.id = fi.category_id
+    ''',
+    f'''
+    create trigger {FTS_TABLE}_insert after insert on nutrition_fooditem begin
+        insert into {FTS_TABLE}
+                    (rowid, name, category, subcategory, brand, range, flags)
+        values (
+            new.id, new.name,
+            (select name from nutrition_foodcategory where id = new.category_id),
+            new.subcategory, new.brand, new.range, {FLAGS.format(row='new')}
+        );
+    end
+    ''',
+    f'''
+    create trigger {FTS_TABLE}_update after update on nutrition_fooditem begin
+        update {FTS_TABLE}
+           set name = new.name,
+               category = (
+                   select name from nutrition_foodcategory
+                    where id = new.category_id
+               ),
+               subcategory = new.subcategory,
+               brand = new.brand,
+               range = new.range,
+               flags = {FLAGS.format(row='new')}
+         where rowid = old.id;
+    end
+    ''',
+    f'''
+    create trigger {FTS_TABLE}_delete after delete on nutrition_fooditem begin
+        delete from {FTS_TABLE} where rowid = old.id;
+    end
+    ''',
+    f'''
+    create trigger {FTS_TABLE}_category_update
+     after update of name on nutrition_foodcategory begin
+        update {FTS_TABLE}
+           set category = new.name
+         where rowid in (
+             select id from nutrition_fooditem where category_id = new.id
+         );
+    end
+    ''',
+]
+
+SQLITE_BACKWARDS = [
+    f'drop trigger if exists {FTS_TABLE}_category_update',
+    f'drop trigger if exists {FTS_TABLE}_delete',
+    f'drop trigger if exists {FTS_TABLE}_update',
+    f'drop trigger if exists {FTS_TABLE}_insert',
+    f'drop table if exists {FTS_TABLE}',
+]
+
+POSTGRESQL_FORWARDS = ['create extension if not exists pg_trgm'] + [
+    f'''
+    create index if not exists nutrition_fooditem_{column}_trgm
+        on nutrition_fooditem using gin (upper({column}) gin_trgm_ops)
+    '''
+    for column in TRIGRAM_INDEX_COLUMNS
+]
+
+POSTGRESQL_BACKWARDS = [
+    f'drop index if exists nutrition_fooditem_{column}_trgm'
+    for column in TRIGRAM_INDEX_COLUMNS
+]
+
+
+def execute(schema_editor, statements):
+    # The search indexes are an optimisation, so if they cannot be created, for
+    # example because SQLite was built without FTS5 or the database user cannot
+    # create extensions, the search falls back to the admin's default search.
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            with schema_editor.connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+    except DatabaseError as e:
+        warnings.warn(f'Unable to create the FoodItem search indexes: {e}')
+
+
+def create_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        execute(schema_editor, SQLITE_FORWARDS)
+    elif vendor == 'postgresql':
+        execute(schema_editor, POSTGRESQL_FORWARDS)
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        execute(schema_editor, SQLITE_BACKWARDS)
+    elif vendor == 'postgresql':
+        execute(schema_editor, POSTGRESQL_BACKWARDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0004_journalnutritionsummary'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0005_fooditem_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fooditem',
+            index=models.Index(fields=['category', '-favourite', 'subcategory', 'brand', 'range', 'name'], name='fooditem_category_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='journalitem',
+            index=models.Index(fields=['added'], name='journalitem_added_idx'),
+        ),
+    ]
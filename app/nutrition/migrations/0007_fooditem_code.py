@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:38
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+search = import_module('nutrition.migrations.0005_fooditem_search')
+
+# SQLite adds a unique column by copying the FoodItem table into a new one,
+# which the search index triggers prevent and would not survive, so they are
+# dropped beforehand and created again afterwards.
+DROP_TRIGGERS = [s for s in search.SQLITE_BACKWARDS if 'drop trigger' in s]
+CREATE_TRIGGERS = [s for s in search.SQLITE_FORWARDS if 'create trigger' in s]
+
+
+def execute_if_searchable(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "select 1 from sqlite_master where type = 'table' and name = %s",
+            [search.FTS_TABLE],
+        )
+        if cursor.fetchone() is None:
+            return
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_triggers(apps, schema_editor):
+    execute_if_searchable(schema_editor, DROP_TRIGGERS)
+
+
+def create_search_triggers(apps, schema_editor):
+    execute_if_searchable(schema_editor, CREATE_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0006_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        migrations.AddField(
+            model_name='fooditem',
+            name='code',
+            field=models.CharField(blank=True, help_text='A unique product code, such as a barcode, used to match the FoodItem when importing catalogues', max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
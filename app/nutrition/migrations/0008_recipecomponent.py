@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:47
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nutrition', '0007_fooditem_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeComponent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('quantity', models.FloatField(default=1.0, help_text='Quantity of the food item in the unit quantity of the recipe', validators=[django.core.validators.MinValueValidator(0.0), django.core.validators.MaxValueValidator(10000.0)])),
+                ('food_item', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='used_in', to='nutrition.fooditem')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='components', to='nutrition.fooditem')),
+            ],
+            options={
+                'ordering': ['recipe', 'added'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='recipecomponent',
+            constraint=models.UniqueConstraint(fields=('recipe', 'food_item'), name='recipecomponent_recipe_food_item_unique'),
+        ),
+    ]
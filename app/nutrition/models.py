@@ -1,9 +1,16 @@
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import connection, models
+from django.db import models
+from django.db.models import (
+    BooleanField, Case, F, FloatField, OuterRef, Q, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
+from fitnesstracker.cache import SharedVersionCache, VersionedCache
+from .nutrients import NUTRIENTS, amount, amounts, total_expressions
+
 class TargetIntake(models.Model):
     """ A TargetIntake is is the daily amount of a number of key nutrients that
     the user is aiming for. The default values are based on the EU's Reference
@@ -59,11 +66,20 @@ class TargetIntake(models.Model):
 
     @classmethod
     def current(cls):
+        """ Return the most recently updated active TargetIntake, or None. It
+        is cached in memory and invalidated by the signals in signals.py.
+        """
+        return _current_target_intake.get(cls._load_current)
+
+    @classmethod
+    def _load_current(cls):
         try:
             return cls.objects.filter(active=True).latest("updated")
         except TargetIntake.DoesNotExist:
             return None
 
+_current_target_intake = SharedVersionCache('nutrition:target-intake:current')
+
 class FoodCategory(models.Model):
     """ FoodCategory simply represents a high-level categorization of foods and
     beverages.
@@ -92,6 +108,11 @@ class FoodItem(models.Model):
     )
     added = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
+    code = models.CharField(
+        max_length=64, unique=True, null=True, blank=True,
+        help_text=_('A unique product code, such as a barcode, used to match '
+                    'the FoodItem when importing catalogues'),
+    )
     name = models.CharField(max_length=256)
     category = models.ForeignKey(FoodCategory, on_delete=models.PROTECT)
     subcategory = models.CharField(max_length=256, null=True, blank=True)
@@ -149,6 +170,17 @@ class FoodItem(models.Model):
             "-favourite", "category__name", "subcategory", "brand", "range",
             "name",
         ]
+        indexes = [
+            # The category name is constant within a category, so this covers
+            # the ordering of the changelist when it is filtered by category.
+            models.Index(
+                fields=[
+                    "category", "-favourite", "subcategory", "brand", "range",
+                    "name",
+                ],
+                name="fooditem_category_order_idx",
+            ),
+        ]
 
     def __str__(self):
         s = f'{self.category.name[:50]} | '
@@ -166,24 +198,197 @@ class FoodItem(models.Model):
         return f'{s}{self.name[:50]} ({self.unit_units})'
 
     def clean(self):
+        errors = self.nutrient_errors(
+            {nutrient: getattr(self, nutrient) for nutrient in NUTRIENTS}
+        )
+        if errors:
+            raise ValidationError(errors)
+
+    @staticmethod
+    def nutrient_errors(values: dict) -> dict:
+        """ Return the errors in the amounts of nutrients in values, such as
+        there being more saturated fat than fat, keyed by nutrient name.
+        """
         errors = {}
         msg = 'The amount of {0} cannot be greater than the amount of {1}'
 
-        if self.saturates and self.fat:
-            if self.saturates > self.fat:
+        if values.get('saturates') and values.get('fat'):
+            if values['saturates'] > values['fat']:
                 errors['saturates'] = msg.format('saturated fat', 'fat')
-        if self.sugars and self.carbohydrates:
-            if self.sugars > self.carbohydrates:
+        if values.get('sugars') and values.get('carbohydrates'):
+            if values['sugars'] > values['carbohydrates']:
                 errors['sugars'] = msg.format('sugars', 'carbohydrates')
 
-        if errors:
-            raise ValidationError(errors)
+        return errors
 
     def energy_kj(self):
         """ Convert the energy amount in kilocalories (kcal) to kilojoules (kJ).
         """
         return self.energy * 4.184
 
+class RecipeComponent(models.Model):
+    """ RecipeComponent is a quantity of a FoodItem used as an ingredient of a
+    recipe, which is itself a FoodItem. The components of a recipe make up the
+    unit quantity of the recipe, and its nutrients are the total of theirs,
+    kept up to date as the components and their nutrients change, so that a
+    whole meal can be logged as a single JournalItem.
+    """
+    # The most levels of recipes within recipes that are refreshed when a
+    # FoodItem changes, which stops any cycle that slips past clean() from
+    # refreshing forever.
+    MAX_DEPTH = 20
+
+    added = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+    recipe = models.ForeignKey(
+        FoodItem, on_delete=models.CASCADE, related_name='components',
+    )
+    food_item = models.ForeignKey(
+        FoodItem, on_delete=models.PROTECT, related_name='used_in',
+    )
+    quantity = models.FloatField(
+        default=1.0,
+        validators=[MinValueValidator(0.0), MaxValueValidator(10000.0)],
+        help_text=_('Quantity of the food item in the unit quantity of the recipe'),
+    )
+
+    class Meta:
+        ordering = ["recipe", "added",]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "food_item"],
+                name="recipecomponent_recipe_food_item_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe.name[:50]} | {self.quantity} {self.food_item.name[:50]}'
+
+    def clean(self):
+        if not (self.recipe_id and self.food_item_id):
+            return
+        if self.recipe_id in self.ingredient_ids([self.food_item_id]):
+            raise ValidationError({
+                'food_item': 'A recipe cannot contain itself, either directly '
+                             'or through one of its components',
+            })
+
+    @classmethod
+    def ingredient_ids(cls, food_item_ids) -> set:
+        """ Return the IDs of the given FoodItems and every FoodItem that they
+        contain, however deeply, with one query per level of recipes.
+        """
+        found = set(food_item_ids)
+        level = found
+        while level:
+            level = set(
+                cls.objects.filter(recipe_id__in=level)
+                .values_list('food_item_id', flat=True)
+            ) - found
+            found |= level
+        return found
+
+    @classmethod
+    def refresh_recipes(cls, recipe_ids) -> set:
+        """ Recalculate the nutrients of the given recipes from their
+        components, followed by the recipes that use them and so on, and then
+        the summaries of the Journals that use any of them. The nutrients of
+        recipes whose last component has been removed are cleared rather than
+        left at the totals of components they no longer have. Returns the IDs
+        of the recipes that were refreshed.
+        """
+        refreshed = set()
+        level = set(recipe_ids)
+        for _ in range(cls.MAX_DEPTH):
+            totals = {
+                row.pop('recipe_id'): row
+                for row in cls.objects.filter(recipe_id__in=level)
+                .order_by()
+                .values('recipe_id')
+                .annotate(**total_expressions())
+            }
+            recipes = list(FoodItem.objects.filter(pk__in=level).only('pk'))
+            if not recipes:
+                break
+
+            now = timezone.now()
+            for recipe in recipes:
+                recipe.updated = now
+                for nutrient in NUTRIENTS:
+                    setattr(recipe, nutrient, totals.get(recipe.pk, {}).get(nutrient))
+            FoodItem.objects.bulk_update(recipes, ['updated', *NUTRIENTS])
+            level = {recipe.pk for recipe in recipes}
+            refreshed |= level
+
+            level = set(
+                cls.objects.filter(food_item_id__in=level)
+                .values_list('recipe_id', flat=True)
+            )
+
+        if refreshed:
+            JournalNutritionSummary.refresh(
+                JournalItem.objects.filter(food_item_id__in=refreshed)
+                .values_list('journal_id', flat=True)
+                .distinct()
+            )
+        return refreshed
+
+class JournalQuerySet(models.QuerySet):
+    def with_nutrition(self):
+        """ Annotate each Journal with the total amount of each nutrient across
+        all of its JournalItems as total_<nutrient>. The totals for every
+        Journal in the queryset are calculated together in a single grouped
+        query rather than one query per Journal.
+        """
+        return self.annotate(**{
+            f'total_{nutrient}': expression
+            for nutrient, expression
+            in total_expressions('journalitem__').items()
+        })
+
+    def with_adherence(self, target: TargetIntake, deviation: float=0.05):
+        """ Annotate each Journal with how far its total of each nutrient is
+        from the target, as a fraction of the target, as <nutrient>_deviation
+        and whether every nutrient is within the given deviation of the target,
+        or for salt at most the target, as target_met. This matches
+        Journal.target_intake_met() but reads the totals from the
+        JournalNutritionSummaries so that it is evaluated in the database
+        without any grouping. The totals of any Journal without a summary are
+        calculated from its JournalItems instead.
+        """
+        totals = (
+            JournalItem.objects.filter(journal=OuterRef('pk'))
+            .order_by()
+            .values('journal')
+            .annotate(**total_expressions())
+        )
+        deviations = {}
+        for nutrient in NUTRIENTS:
+            total = Coalesce(
+                F(f'nutrition_summary__{nutrient}'),
+                Subquery(totals.values(nutrient)),
+                Value(0.0),
+                output_field=FloatField(),
+            )
+            amount = Value(getattr(target, nutrient), output_field=FloatField())
+            deviations[f'{nutrient}_deviation'] = (total - amount) / amount
+
+        met = Q(salt_deviation__lte=0.0)
+        for nutrient in NUTRIENTS:
+            if nutrient != 'salt':
+                met &= Q(**{
+                    f'{nutrient}_deviation__gte': -deviation,
+                    f'{nutrient}_deviation__lte': deviation,
+                })
+
+        return self.annotate(**deviations).annotate(
+            target_met=Case(
+                When(met, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+
 class Journal(models.Model):
     """ Journal represents a collection of one or more JournalItems of food or
     drink consumed over a single day.
@@ -196,6 +401,8 @@ class Journal(models.Model):
     notes = models.TextField(max_length=4096, null=True, blank=True)
     items = models.ManyToManyField(FoodItem, through="JournalItem")
 
+    objects = JournalQuerySet.as_manager()
+
     class Meta:
         ordering = ["date",]
 
@@ -209,45 +416,52 @@ class Journal(models.Model):
             f'{n["protein"]:.1f}g protein, {n["salt"]:.2f}g salt'
         )
     
+    @classmethod
+    def nutrition_for(cls, ids) -> dict:
+        """ Return a dictionary of nutrition totals keyed by Journal ID for each
+        of the given Journal IDs using a single query.
+        """
+        totals = [f'total_{nutrient}' for nutrient in NUTRIENTS]
+        rows = cls.objects.filter(pk__in=ids).with_nutrition().values_list(
+            'pk', *totals,
+        )
+        return {row[0]: dict(zip(NUTRIENTS, row[1:])) for row in rows}
+
     def nutrition(self):
-        # Doing this aggregation of each nutritional value for the journal entry
-        # in the database is 10x faster than doing it in the model.
-        query = '''
-          select
-                sum(ji.quantity / fi.unit_quantity * fi.energy) as energy,
-                sum(ji.quantity / fi.unit_quantity * fi.fat) as fat,
-                sum(ji.quantity / fi.unit_quantity * fi.saturates) as saturates,
-                sum(ji.quantity / fi.unit_quantity * fi.carbohydrates) as carbohydrates,
-                sum(ji.quantity / fi.unit_quantity * fi.sugars) as sugars,
-                sum(ji.quantity / fi.unit_quantity * fi.protein) as protein,
-                sum(ji.quantity / fi.unit_quantity * fi.salt) as salt
-            from nutrition_journal jo
-       left join nutrition_journalitem ji on jo.id = ji.journal_id
-      inner join nutrition_fooditem fi on fi.id = ji.food_item_id
-           where jo.id = %s
-        group by jo.id, jo.date
-        '''
-
-        with connection.cursor() as cursor:
-            cursor.execute(query, [self.id,])
-            row = cursor.fetchone()
+        # Use the totals if they have already been calculated for this Journal
+        # by JournalQuerySet.with_nutrition().
+        if hasattr(self, 'total_energy'):
+            return {
+                nutrient: getattr(self, f'total_{nutrient}')
+                for nutrient in NUTRIENTS
+            }
+
+        # Otherwise use the JournalNutritionSummary, which is a primary key
+        # lookup, or no query at all if it was fetched with select_related().
+        try:
+            summary = self.nutrition_summary
+        except JournalNutritionSummary.DoesNotExist:
+            summary = None
+        if summary is not None:
             return {
-                'energy': row[0] or 0,
-                'fat': row[1] or 0,
-                'saturates': row[2] or 0,
-                'carbohydrates': row[3] or 0,
-                'sugars': row[4] or 0,
-                'protein': row[5] or 0,
-                'salt': row[6] or 0,
+                nutrient: getattr(summary, nutrient) for nutrient in NUTRIENTS
             }
 
-    def target_intake_met(self, target: TargetIntake, deviation: float=0.05) -> bool:
+        return JournalItem.objects.filter(journal=self).aggregate(
+            **total_expressions(),
+        )
+
+    def target_intake_met(self, target: TargetIntake=None, deviation: float=0.05) -> bool:
         def within_deviation(value, target) -> bool:
             """ Check a given value is with a given deviation percentage of a
             target value (plus or minus).
             """
             return abs(target - value) <= target * deviation
 
+        target = target or TargetIntake.current()
+        if target is None:
+            return False
+
         n = self.nutrition()
         return (
             within_deviation(n['energy'], target.energy) and
@@ -259,7 +473,60 @@ class Journal(models.Model):
             n['salt'] <= target.salt
         )
 
-    
+class JournalNutritionSummary(models.Model):
+    """ JournalNutritionSummary holds the precalculated nutrition totals for a
+    single Journal. It is refreshed whenever one of the Journal's JournalItems
+    or their FoodItems change so that reading the totals for a Journal does not
+    require aggregating all of its JournalItems.
+    """
+    journal = models.OneToOneField(
+        Journal, on_delete=models.CASCADE, primary_key=True,
+        related_name='nutrition_summary',
+    )
+    updated = models.DateTimeField(auto_now=True)
+    energy = models.FloatField(default=0.0)
+    fat = models.FloatField(default=0.0)
+    saturates = models.FloatField(default=0.0)
+    carbohydrates = models.FloatField(default=0.0)
+    sugars = models.FloatField(default=0.0)
+    protein = models.FloatField(default=0.0)
+    salt = models.FloatField(default=0.0)
+
+    class Meta:
+        verbose_name_plural = 'Journal nutrition summaries'
+
+    def __str__(self):
+        return f'{self.journal_id} | {self.energy:.0f}kcal'
+
+    @classmethod
+    def refresh(cls, journal_ids, batch_size: int=500) -> int:
+        """ Recalculate and store the summaries for the given Journal IDs with
+        one aggregate query and one upsert per batch. Returns the number of
+        summaries that were written.
+        """
+        journal_ids = list(journal_ids)
+        written = 0
+
+        for i in range(0, len(journal_ids), batch_size):
+            totals = Journal.nutrition_for(journal_ids[i:i + batch_size])
+            summaries = [
+                cls(journal_id=journal_id, **nutrition)
+                for journal_id, nutrition in totals.items()
+            ]
+            cls.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['journal'],
+                update_fields=['updated', *NUTRIENTS],
+            )
+            written += len(summaries)
+
+        journal_totals_cache.invalidate()
+        return written
+
+# The cached reports and API responses made from the Journals and their totals.
+journal_totals_cache = VersionedCache('nutrition:journal-totals')
+
 class JournalItem(models.Model):
     """ JournalItem is an instance of a FoodItem consumed on a particular
     Journal day. The quantity consumed is recorded and used to calculate the
@@ -291,20 +558,34 @@ class JournalItem(models.Model):
 
     class Meta:
         ordering = ["added",]
+        indexes = [
+            models.Index(fields=["added"], name="journalitem_added_idx"),
+        ]
 
     def __str__(self):
+        n = self.nutrients()
         return (
             f'{self.journal.date} | {self.TYPES[self.type]} | '
-            f'{self.food_item.name[:50]} ({self.energy():.0f}kcal '
-            f'{self.fat():.1f}/{self.saturates():.1f}g fat/sats., '
-            f'{self.carbohydrates():.1f}/{self.sugars():.1f}g carbs/sugars, '
-            f'{self.protein():.1f}g protein, {self.salt():.2f}g salt)'
+            f'{self.food_item.name[:50]} ({n["energy"]:.0f}kcal '
+            f'{n["fat"]:.1f}/{n["saturates"]:.1f}g fat/sats., '
+            f'{n["carbohydrates"]:.1f}/{n["sugars"]:.1f}g carbs/sugars, '
+            f'{n["protein"]:.1f}g protein, {n["salt"]:.2f}g salt)'
+        )
+
+    def nutrients(self) -> dict:
+        """ Return the amount of every nutrient in this JournalItem, working out
+        the ratio of the quantity to the FoodItem's unit quantity only once.
+        """
+        food_item = self.food_item
+        return amounts(
+            self.quantity, food_item.unit_quantity,
+            [getattr(food_item, nutrient) for nutrient in NUTRIENTS],
         )
 
     def get_nutrition_amount(self, unit_nutrient_quantity):
-        if unit_nutrient_quantity == None:
-            return 0
-        return self.quantity / self.food_item.unit_quantity * unit_nutrient_quantity 
+        return amount(
+            self.quantity, self.food_item.unit_quantity, unit_nutrient_quantity,
+        )
 
     def energy(self):
         return self.get_nutrition_amount(self.food_item.energy)
@@ -0,0 +1,77 @@
+""" The single place where the amount of each nutrient in a quantity of a
+FoodItem is worked out, both in Python and as SQL expressions, so that every
+total calculated anywhere in the app agrees.
+
+The amount of a nutrient is quantity / unit_quantity * the FoodItem's value
+for the nutrient, with missing values counting as zero. The ratio is worked
+out once for all seven nutrients of a row, and batches of rows are processed a
+nutrient at a time, column by column, rather than a method call at a time.
+"""
+from django.db.models import F, FloatField, Sum, Value
+from django.db.models.functions import Coalesce
+
+# The nutrients that are recorded for each FoodItem and totalled for Journals.
+NUTRIENTS = (
+    'energy', 'fat', 'saturates', 'carbohydrates', 'sugars', 'protein', 'salt',
+)
+
+def amount(quantity: float, unit_quantity: float, value) -> float:
+    """ Return the amount of a single nutrient in quantity of a FoodItem with
+    the given unit quantity and value for the nutrient.
+    """
+    return (value or 0.0) * (quantity / unit_quantity)
+
+def amounts(quantity: float, unit_quantity: float, values) -> dict:
+    """ Return the amount of each nutrient in quantity of a FoodItem with the
+    given unit quantity and values for each nutrient, in NUTRIENTS order.
+    """
+    ratio = quantity / unit_quantity
+    return {
+        nutrient: (value or 0.0) * ratio
+        for nutrient, value in zip(NUTRIENTS, values)
+    }
+
+def batch_amounts(rows) -> list:
+    """ Return a tuple of the amount of each nutrient for every row of
+    (quantity, unit_quantity, *values), where values are in NUTRIENTS order.
+    """
+    rows = list(rows)
+    ratios = [row[0] / row[1] for row in rows]
+    columns = [
+        [(row[i] or 0.0) * ratio for row, ratio in zip(rows, ratios)]
+        for i in range(2, 2 + len(NUTRIENTS))
+    ]
+    return list(zip(*columns))
+
+def batch_totals(rows) -> dict:
+    """ Return the total amount of each nutrient across every row of
+    (quantity, unit_quantity, *values).
+    """
+    columns = list(zip(*batch_amounts(rows))) or [()] * len(NUTRIENTS)
+    return {nutrient: sum(column) for nutrient, column in zip(NUTRIENTS, columns)}
+
+def amount_expressions(prefix: str='') -> dict:
+    """ Return a SQL expression for the amount of each nutrient in a
+    JournalItem, keyed by nutrient. prefix is the path to the JournalItem from
+    the model being queried, such as "journalitem__".
+    """
+    ratio = F(f'{prefix}quantity') / F(f'{prefix}food_item__unit_quantity')
+    return {
+        nutrient: Coalesce(
+            ratio * F(f'{prefix}food_item__{nutrient}'), Value(0.0),
+            output_field=FloatField(),
+        )
+        for nutrient in NUTRIENTS
+    }
+
+def total_expressions(prefix: str='') -> dict:
+    """ Return a SQL aggregate for the total amount of each nutrient across a
+    group of JournalItems, keyed by nutrient. prefix is as for
+    amount_expressions().
+    """
+    return {
+        nutrient: Coalesce(
+            Sum(expression, output_field=FloatField()), Value(0.0),
+        )
+        for nutrient, expression in amount_expressions(prefix).items()
+    }
@@ -0,0 +1,60 @@
+""" Reports on how well the Journals over a period of time kept to a
+TargetIntake, evaluated for every Journal in a single query.
+"""
+import datetime
+
+from .models import NUTRIENTS, Journal, TargetIntake, journal_totals_cache
+
+def target_adherence(start: datetime.date=None, end: datetime.date=None,
+                     target: TargetIntake=None, deviation: float=0.05):
+    """ Return how many of the Journals from start (inclusive) until end
+    (exclusive) met the target, defaulting to the current TargetIntake, along
+    with the percentage that did, the current and longest streaks of
+    consecutive days that met it and the deviation of each Journal from it.
+    Days without a Journal break a streak. Returns None if there is no target.
+    The report is cached until the Journals or the target change.
+    """
+    target = target or TargetIntake.current()
+    if target is None:
+        return None
+    if target.pk is None:
+        return _target_adherence(start, end, target, deviation)
+    return journal_totals_cache.get_or_set(
+        ('target-adherence', start, end, target.pk, target.updated, deviation),
+        lambda: _target_adherence(start, end, target, deviation),
+    )
+
+def _target_adherence(start, end, target, deviation):
+    journals = Journal.objects.with_adherence(target, deviation).order_by('date')
+    if start is not None:
+        journals = journals.filter(date__gte=start)
+    if end is not None:
+        journals = journals.filter(date__lt=end)
+    fields = ['date', 'target_met', *[f'{n}_deviation' for n in NUTRIENTS]]
+    days = list(journals.values(*fields))
+
+    met = streak = longest = 0
+    previous = None
+    for day in days:
+        if day['target_met']:
+            met += 1
+            consecutive = (
+                previous is not None
+                and day['date'] - previous == datetime.timedelta(days=1)
+            )
+            streak = streak + 1 if consecutive else 1
+            longest = max(longest, streak)
+        else:
+            streak = 0
+        previous = day['date']
+
+    return {
+        'target': target,
+        'deviation': deviation,
+        'days': len(days),
+        'met': met,
+        'percentage': met / len(days) * 100 if days else 0.0,
+        'current_streak': streak,
+        'longest_streak': longest,
+        'journals': days,
+    }
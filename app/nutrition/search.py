@@ -0,0 +1,178 @@
+""" Ranked, index backed searching of FoodItems for the admin autocomplete.
+
+On PostgreSQL the name, subcategory, brand and range columns have pg_trgm GIN
+indexes which are used for substring matching, with the results ranked by word
+similarity. On SQLite a FTS5 table, which is kept up to date by triggers, is
+used for prefix matching, with the results ranked by BM25. Favourite FoodItems
+have their rank boosted on both.
+"""
+from django.db import connection
+from django.db.models import Case, IntegerField, When
+
+from .models import FoodCategory
+
+FTS_TABLE = 'nutrition_fooditem_fts'
+FTS_COLUMNS = ('name', 'category', 'subcategory', 'brand', 'range')
+FTS_COLUMN_FILTER = '{' + ' '.join(FTS_COLUMNS) + '}'
+TRIGRAM_INDEX_COLUMNS = ('name', 'subcategory', 'brand', 'range')
+
+# The factor that the rank of a favourite FoodItem is multiplied by.
+FAVOURITE_BOOST = 2.0
+
+# The most matches that FTS5 will rank, beyond this only favourites are ranked.
+MAX_RANKED_MATCHES = 2000
+
+# BM25 scores are negative, with lower being a better match. The column weights
+# are for the name, category, subcategory, brand, range and flags columns.
+RANKED_QUERY = f'''
+      select rowid
+        from {FTS_TABLE}
+       where {FTS_TABLE} match %s
+    order by bm25({FTS_TABLE}, 10.0, 2.0, 2.0, 5.0, 2.0, 0.0) *
+             case when flags = 'favourite' then %s else 1 end,
+             name
+       limit %s
+'''
+
+# Whether the search indexes exist, keyed by database vendor.
+_available = {}
+
+def search_available() -> bool:
+    """ Return True if the search indexes for the current database exist. They
+    are created by migrations, so this only needs to be checked once.
+    """
+    vendor = connection.vendor
+    if vendor not in _available:
+        if vendor == 'postgresql':
+            query = "select 1 from pg_extension where extname = 'pg_trgm'"
+        elif vendor == 'sqlite':
+            query = (
+                "select 1 from sqlite_master "
+                f"where type = 'table' and name = '{FTS_TABLE}'"
+            )
+        else:
+            _available[vendor] = False
+            return False
+
+        with connection.cursor() as cursor:
+            cursor.execute(query)
+            _available[vendor] = cursor.fetchone() is not None
+
+    return _available[vendor]
+
+def ranked_food_item_ids(term: str, limit: int=100):
+    """ Return the IDs of up to limit FoodItems matching every word in term,
+    best match first, or None if there is no search index to use.
+    """
+    words = term.split()
+    if not words or not search_available():
+        return None
+
+    if connection.vendor == 'postgresql':
+        return _postgresql_search(term, words, limit)
+    return _sqlite_search(words, limit)
+
+def search_food_items(queryset, term: str, limit: int=100):
+    """ Filter a FoodItem queryset down to the best matches for term, ordered by
+    rank. Returns None if there is no search index to use.
+    """
+    ids = ranked_food_item_ids(term, limit)
+    if ids is None:
+        return None
+
+    return queryset.filter(pk__in=ids).order_by(
+        Case(
+            *[When(pk=pk, then=rank) for rank, pk in enumerate(ids)],
+            output_field=IntegerField(),
+        ),
+    )
+
+def _escape_like(word: str) -> str:
+    return word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def _postgresql_search(term, words, limit):
+    # Look up the matching categories up front, there are few of them and it
+    # keeps every condition on the FoodItem table able to use an index.
+    conditions = []
+    params = []
+    for word in words:
+        pattern = f'%{_escape_like(word)}%'
+        category_ids = list(
+            FoodCategory.objects.filter(name__icontains=word)
+            .values_list('id', flat=True)
+        )
+        columns = [
+            f'upper(fi.{column}) like upper(%s)'
+            for column in TRIGRAM_INDEX_COLUMNS
+        ]
+        conditions.append(
+            f"({' or '.join(columns)} or fi.category_id = any(%s))"
+        )
+        params.extend([pattern] * len(TRIGRAM_INDEX_COLUMNS))
+        params.append(category_ids)
+
+    similarities = ', '.join(
+        [
+            f"word_similarity(%s, coalesce(fi.{column}, ''))"
+            for column in TRIGRAM_INDEX_COLUMNS
+        ] + ['word_similarity(%s, fc.name)']
+    )
+    query = f'''
+          select fi.id
+            from nutrition_fooditem fi
+      inner join nutrition_foodcategory fc on fc.id = fi.category_id
+           where {' and '.join(conditions)}
+        order by greatest({similarities}) *
+                 case when fi.favourite then %s else 1 end desc,
+                 fi.name
+           limit %s
+    '''
+    params.extend([term] * (len(TRIGRAM_INDEX_COLUMNS) + 1))
+    params.extend([FAVOURITE_BOOST, limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(query, params)
+        return [row[0] for row in cursor.fetchall()]
+
+def _sqlite_search(words, limit):
+    # Quote each word so that FTS5 does not interpret it as query syntax, make
+    # it a prefix query so that partially typed words match and exclude the
+    # flags column from the columns that are searched.
+    terms = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+    match = f'{FTS_COLUMN_FILTER} : ({terms})'
+
+    with connection.cursor() as cursor:
+        # Only count as far as is needed to know whether to rank every match.
+        cursor.execute(
+            f'''
+            select count(*) from (
+                select rowid from {FTS_TABLE}
+                 where {FTS_TABLE} match %s
+                 limit %s
+            )
+            ''',
+            [match, MAX_RANKED_MATCHES + 1],
+        )
+        matches = cursor.fetchone()[0]
+
+        if matches <= MAX_RANKED_MATCHES:
+            cursor.execute(RANKED_QUERY, [match, FAVOURITE_BOOST, limit])
+            return [row[0] for row in cursor.fetchall()]
+
+        # Ranking a very large number of matches, such as for the first letter
+        # or two of a common word, is slow and of little use. Instead, rank just
+        # the matching favourites and follow them with the other matches in the
+        # order they appear in the index.
+        cursor.execute(
+            RANKED_QUERY, [f'{match} AND flags : favourite', 1.0, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f'''
+            select rowid from {FTS_TABLE}
+             where {FTS_TABLE} match %s
+             limit %s
+            ''',
+            [f'{match} NOT flags : favourite', limit - len(ids)],
+        )
+        return ids + [row[0] for row in cursor.fetchall()]
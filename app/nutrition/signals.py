@@ -0,0 +1,99 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    FoodItem, Journal, JournalItem, JournalNutritionSummary, NUTRIENTS,
+    RecipeComponent, TargetIntake, _current_target_intake, journal_totals_cache,
+)
+
+@receiver(pre_save, sender=JournalItem)
+def remember_previous_journal(sender, instance, raw, **kwargs):
+    """ Keep a note of the Journal a JournalItem belonged to before it is saved
+    so that both Journals can be refreshed if it is moved between them.
+    """
+    instance._previous_journal_id = None
+    if instance.pk and not raw:
+        instance._previous_journal_id = (
+            JournalItem.objects.filter(pk=instance.pk)
+            .values_list('journal_id', flat=True)
+            .first()
+        )
+
+@receiver(post_save, sender=JournalItem)
+def refresh_summary_on_item_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    journal_ids = {instance.journal_id}
+    previous_journal_id = getattr(instance, '_previous_journal_id', None)
+    if previous_journal_id is not None:
+        journal_ids.add(previous_journal_id)
+    JournalNutritionSummary.refresh(journal_ids)
+
+@receiver(post_delete, sender=JournalItem)
+def refresh_summary_on_item_delete(sender, instance, **kwargs):
+    JournalNutritionSummary.refresh([instance.journal_id])
+
+@receiver(pre_save, sender=FoodItem)
+def remember_previous_nutrients(sender, instance, raw, **kwargs):
+    """ Keep a note of whether any of the values that affect the nutrition
+    totals of a FoodItem are about to change.
+    """
+    instance._nutrients_changed = False
+    if instance.pk and not raw:
+        fields = ['unit_quantity', *NUTRIENTS]
+        previous = (
+            FoodItem.objects.filter(pk=instance.pk).values_list(*fields).first()
+        )
+        current = tuple(getattr(instance, field) for field in fields)
+        instance._nutrients_changed = previous != current
+
+@receiver(post_save, sender=FoodItem)
+def refresh_summaries_on_food_item_save(sender, instance, created, raw, **kwargs):
+    if created or raw or not getattr(instance, '_nutrients_changed', False):
+        return
+    journal_ids = (
+        JournalItem.objects.filter(food_item=instance)
+        .values_list('journal_id', flat=True)
+        .distinct()
+    )
+    JournalNutritionSummary.refresh(journal_ids)
+    RecipeComponent.refresh_recipes(
+        instance.used_in.values_list('recipe_id', flat=True)
+    )
+
+@receiver(pre_save, sender=RecipeComponent)
+def remember_previous_recipe(sender, instance, raw, **kwargs):
+    """ Keep a note of the recipe a RecipeComponent belonged to before it is
+    saved so that both recipes can be refreshed if it is moved between them.
+    """
+    instance._previous_recipe_id = None
+    if instance.pk and not raw:
+        instance._previous_recipe_id = (
+            RecipeComponent.objects.filter(pk=instance.pk)
+            .values_list('recipe_id', flat=True)
+            .first()
+        )
+
+@receiver(post_save, sender=RecipeComponent)
+def refresh_recipe_on_component_save(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    recipe_ids = {instance.recipe_id}
+    previous_recipe_id = getattr(instance, '_previous_recipe_id', None)
+    if previous_recipe_id is not None:
+        recipe_ids.add(previous_recipe_id)
+    RecipeComponent.refresh_recipes(recipe_ids)
+
+@receiver(post_delete, sender=RecipeComponent)
+def refresh_recipe_on_component_delete(sender, instance, **kwargs):
+    RecipeComponent.refresh_recipes([instance.recipe_id])
+
+@receiver(post_save, sender=TargetIntake)
+@receiver(post_delete, sender=TargetIntake)
+def invalidate_current_target_intake(sender, **kwargs):
+    _current_target_intake.invalidate()
+
+@receiver(post_save, sender=Journal)
+@receiver(post_delete, sender=Journal)
+def invalidate_journal_totals(sender, **kwargs):
+    journal_totals_cache.invalidate()
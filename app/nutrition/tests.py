@@ -1,3 +1,700 @@
+import datetime
+import json
+import os
+import tempfile
+
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from fitnesstracker.cache import SharedVersionCache
+from fitnesstracker.testing import analyze, changelist_queryset, sequential_scans
+from .models import (
+    FoodCategory, FoodItem, Journal, JournalItem, JournalNutritionSummary,
+    NUTRIENTS, RecipeComponent, TargetIntake, _current_target_intake,
+)
+from .imports import FoodItemImporter, read_rows
+from .nutrients import amount_expressions, batch_amounts, batch_totals
+from .reports import target_adherence
+from .search import ranked_food_item_ids
+
+def create_food_item(category, **kwargs):
+    values = {
+        'name': 'Porridge', 'unit_quantity': 100.0, 'energy': 380.0,
+        'fat': 8.0, 'saturates': 1.5, 'carbohydrates': 60.0, 'sugars': 1.0,
+        'protein': 11.0, 'salt': 0.02,
+    }
+    values.update(kwargs)
+    return FoodItem.objects.create(category=category, **values)
+
+class JournalNutritionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = FoodCategory.objects.create(name='Cereals')
+        cls.oats = create_food_item(category)
+        cls.milk = create_food_item(
+            category, name='Milk', energy=46.0, fat=1.6, saturates=1.0,
+            carbohydrates=4.8, sugars=4.8, protein=3.5, salt=0.1,
+        )
+        cls.journals = []
+        for day in range(3):
+            journal = Journal.objects.create(
+                date=datetime.date(2024, 1, 1) + datetime.timedelta(days=day),
+            )
+            JournalItem.objects.create(
+                journal=journal, food_item=cls.oats, quantity=40.0 + day,
+            )
+            JournalItem.objects.create(
+                journal=journal, food_item=cls.milk, quantity=200.0,
+            )
+            cls.journals.append(journal)
+        cls.empty = Journal.objects.create(date=datetime.date(2024, 2, 1))
+        cls.user = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_with_nutrition_matches_nutrition(self):
+        journals = Journal.objects.with_nutrition()
+        self.assertEqual(len(journals), 4)
+        for journal in journals:
+            expected = Journal.objects.get(pk=journal.pk).nutrition()
+            for nutrient in NUTRIENTS:
+                self.assertAlmostEqual(
+                    journal.nutrition()[nutrient], expected[nutrient],
+                )
+
+    def test_with_nutrition_uses_one_query(self):
+        with self.assertNumQueries(1):
+            [str(journal) for journal in Journal.objects.with_nutrition()]
+
+    async def test_views(self):
+        url = reverse('nutrition:journal_nutrition')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        # AsyncClient has no async login methods in Django 4.2.
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(url, {'end': '2024-01-03'})
+        self.assertEqual(response.status_code, 200)
+        journals = response.json()['journals']
+        self.assertEqual(
+            [journal['date'] for journal in journals],
+            ['2024-01-01', '2024-01-02'],
+        )
+        self.assertAlmostEqual(journals[0]['total_energy'], 244.0)
+
+        response = await self.async_client.get(
+            reverse('nutrition:journal_nutrition_detail', args=['2024-02-01']),
+        )
+        self.assertEqual(response.json()['total_energy'], 0.0)
+
+        # The totals are cached until an item is added to one of the Journals.
+        def add_item():
+            with self.captureOnCommitCallbacks(execute=True):
+                JournalItem.objects.create(
+                    journal=self.empty, food_item=self.oats, quantity=100.0,
+                )
+        response = await self.async_client.get(
+            reverse('nutrition:journal_nutrition_detail', args=['2024-02-01']),
+        )
+        self.assertEqual(response.json()['total_energy'], 0.0)
+        await sync_to_async(add_item)()
+        response = await self.async_client.get(
+            reverse('nutrition:journal_nutrition_detail', args=['2024-02-01']),
+        )
+        self.assertEqual(response.json()['total_energy'], 380.0)
+        for date in ('2024-03-01', '2024-02-30', 'today'):
+            response = await self.async_client.get(
+                reverse('nutrition:journal_nutrition_detail', args=[date]),
+            )
+            self.assertEqual(response.status_code, 404)
+
+    def test_nutrition_for(self):
+        ids = [journal.pk for journal in self.journals] + [self.empty.pk]
+        with self.assertNumQueries(1):
+            totals = Journal.nutrition_for(ids)
+        self.assertAlmostEqual(totals[self.journals[0].pk]['energy'], 244.0)
+        self.assertEqual(totals[self.empty.pk]['energy'], 0.0)
+
+class NutrientEngineTests(TestCase):
+    def test_python_and_sql_agree(self):
+        category = FoodCategory.objects.create(name='Cereals')
+        journal = Journal.objects.create(date=datetime.date(2024, 1, 1))
+        for quantity, values in ((40.0, {}), (250.0, {'unit_quantity': 1.0, 'salt': None})):
+            JournalItem.objects.create(
+                journal=journal, food_item=create_food_item(category, **values),
+                quantity=quantity,
+            )
+
+        items = JournalItem.objects.select_related('food_item').annotate(
+            **{f'sql_{n}': e for n, e in amount_expressions().items()},
+        )
+        rows = [
+            (item.quantity, item.food_item.unit_quantity,
+             *[getattr(item.food_item, n) for n in NUTRIENTS])
+            for item in items
+        ]
+        for item, batch in zip(items, batch_amounts(rows)):
+            for nutrient, value in zip(NUTRIENTS, batch):
+                self.assertAlmostEqual(getattr(item, f'sql_{nutrient}'), value)
+                self.assertAlmostEqual(item.nutrients()[nutrient], value)
+        self.assertEqual(items[1].salt(), 0.0)
+
+        totals = batch_totals(rows)
+        for nutrient in NUTRIENTS:
+            self.assertAlmostEqual(journal.nutrition()[nutrient], totals[nutrient])
+        self.assertEqual(batch_totals([]), dict.fromkeys(NUTRIENTS, 0))
+
+class RecipeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = FoodCategory.objects.create(name='Meals')
+        cls.oats = create_food_item(category, name='Oats')
+        cls.milk = create_food_item(
+            category, name='Milk', energy=46.0, fat=1.6, saturates=1.0,
+            carbohydrates=4.8, sugars=4.8, protein=3.5, salt=0.1,
+        )
+        cls.porridge = create_food_item(
+            category, name='Porridge', unit_quantity=1.0, unit_units='servings',
+        )
+        cls.journal = Journal.objects.create(date=datetime.date(2024, 1, 1))
+        JournalItem.objects.create(
+            journal=cls.journal, food_item=cls.porridge, quantity=2.0,
+        )
+
+    def add(self, recipe, food_item, quantity):
+        component = RecipeComponent(recipe=recipe, food_item=food_item, quantity=quantity)
+        component.full_clean()
+        component.save()
+        return component
+
+    def assertNutrients(self, food_item, expected):
+        food_item.refresh_from_db()
+        for nutrient in NUTRIENTS:
+            self.assertAlmostEqual(getattr(food_item, nutrient), expected[nutrient])
+
+    def expected(self, *components):
+        return {
+            nutrient: sum(
+                getattr(food_item, nutrient) * quantity / food_item.unit_quantity
+                for food_item, quantity in components
+            )
+            for nutrient in NUTRIENTS
+        }
+
+    def test_nutrients_follow_components(self):
+        self.add(self.porridge, self.oats, 40.0)
+        milk = self.add(self.porridge, self.milk, 200.0)
+        expected = self.expected((self.oats, 40.0), (self.milk, 200.0))
+        self.assertNutrients(self.porridge, expected)
+        self.assertAlmostEqual(
+            JournalNutritionSummary.objects.get().energy, expected['energy'] * 2,
+        )
+
+        self.milk.energy = 64.0
+        self.milk.save()
+        self.assertNutrients(
+            self.porridge, self.expected((self.oats, 40.0), (self.milk, 200.0)),
+        )
+
+        milk.delete()
+        self.assertNutrients(self.porridge, self.expected((self.oats, 40.0)))
+        self.assertAlmostEqual(
+            JournalNutritionSummary.objects.get().energy,
+            self.porridge.energy * 2,
+        )
+
+        # A recipe without any components has no nutrients to total.
+        self.porridge.components.get().delete()
+        self.porridge.refresh_from_db()
+        for nutrient in NUTRIENTS:
+            self.assertIsNone(getattr(self.porridge, nutrient))
+        self.assertEqual(JournalNutritionSummary.objects.get().energy, 0.0)
+
+    def test_import_keeps_recipe_nutrients(self):
+        self.add(self.porridge, self.oats, 40.0)
+        FoodItem.objects.filter(pk=self.porridge.pk).update(code='porridge')
+        FoodItem.objects.filter(pk=self.milk.pk).update(code='milk')
+        self.porridge.refresh_from_db()
+        expected = self.expected((self.oats, 40.0))
+
+        result = FoodItemImporter().import_rows(read_rows(StringIO(
+            'code,name,category,unit_quantity,energy\n'
+            'porridge,Oat porridge,Meals,100,999\nmilk,Milk,Meals,100,50\n'
+        ), 'csv'))
+        self.assertEqual(result.imported, 2)
+        self.assertNutrients(self.porridge, expected)
+        self.assertEqual(self.porridge.name, 'Oat porridge')
+        self.assertEqual(self.porridge.unit_quantity, 1.0)
+        self.milk.refresh_from_db()
+        self.assertEqual(self.milk.energy, 50.0)
+
+    def test_nested_recipes_and_cycles(self):
+        breakfast = create_food_item(
+            self.oats.category, name='Breakfast', unit_quantity=1.0,
+        )
+        self.add(self.porridge, self.oats, 40.0)
+        self.add(breakfast, self.porridge, 1.0)
+        self.add(breakfast, self.milk, 100.0)
+
+        self.oats.protein = 20.0
+        self.oats.save()
+        self.porridge.refresh_from_db()
+        self.assertNutrients(
+            breakfast, self.expected((self.porridge, 1.0), (self.milk, 100.0)),
+        )
+        self.assertAlmostEqual(self.porridge.protein, 8.0)
+
+        for recipe, food_item in (
+            (self.porridge, self.porridge),
+            (self.porridge, breakfast),
+            (self.oats, breakfast),
+        ):
+            with self.assertRaises(ValidationError):
+                self.add(recipe, food_item, 1.0)
+
+class TargetIntakeCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.target = TargetIntake.objects.create(name='Maintenance', active=True)
+        category = FoodCategory.objects.create(name='Cereals')
+        oats = create_food_item(category)
+        for day in range(1, 29):
+            journal = Journal.objects.create(date=datetime.date(2024, 2, day))
+            JournalItem.objects.create(
+                journal=journal, food_item=oats, quantity=100.0 * day,
+            )
+
+    def setUp(self):
+        # The cache outlives the transaction that each test is rolled back in.
+        _current_target_intake.invalidate()
+
+    def test_current_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(TargetIntake.current(), self.target)
+            self.assertEqual(TargetIntake.current(), self.target)
+
+        journals = list(Journal.objects.with_nutrition())
+        with self.assertNumQueries(0):
+            met = [journal.target_intake_met() for journal in journals]
+        self.assertEqual(met.count(True), 0)
+
+    def test_invalidated_on_save_and_delete(self):
+        TargetIntake.current()
+        cutting = TargetIntake.objects.create(name='Cutting', energy=1800.0, active=True)
+        self.assertEqual(TargetIntake.current(), cutting)
+        cutting.active = False
+        cutting.save()
+        self.assertEqual(TargetIntake.current(), self.target)
+        self.target.delete()
+        self.assertIsNone(TargetIntake.current())
+
+    def test_invalidated_in_other_processes_on_commit(self):
+        # Another process has its own copy of the cache.
+        other = SharedVersionCache(_current_target_intake.key, check_interval=0)
+        self.assertEqual(other.get(TargetIntake._load_current), self.target)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.target.active = False
+            self.target.save()
+            self.assertEqual(other.get(TargetIntake._load_current), self.target)
+        self.assertIsNone(other.get(TargetIntake._load_current))
+
+class TargetAdherenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.target = TargetIntake.objects.create(name='Maintenance', active=True)
+        # 100g of this FoodItem meets the default target exactly.
+        food_item = create_food_item(
+            FoodCategory.objects.create(name='Meals'), name='Everything',
+            **{nutrient: getattr(cls.target, nutrient) for nutrient in NUTRIENTS},
+        )
+        for day, quantity in ((1, 100), (2, 97), (3, 90), (4, 100), (6, 100), (7, 100)):
+            journal = Journal.objects.create(date=datetime.date(2024, 1, day))
+            JournalItem.objects.create(
+                journal=journal, food_item=food_item, quantity=quantity,
+            )
+
+    def setUp(self):
+        _current_target_intake.invalidate()
+        cache.clear()
+
+    def test_matches_target_intake_met(self):
+        for journal in Journal.objects.with_adherence(self.target):
+            self.assertEqual(
+                journal.target_met, journal.target_intake_met(self.target),
+                journal.date,
+            )
+
+    def test_without_summaries(self):
+        JournalNutritionSummary.objects.all().delete()
+        self.test_matches_target_intake_met()
+        met = Journal.objects.with_adherence(self.target).filter(target_met=True)
+        self.assertEqual(met.count(), 5)
+
+    def test_report(self):
+        with self.assertNumQueries(1):
+            report = target_adherence(target=self.target)
+        self.assertEqual((report['days'], report['met']), (6, 5))
+        self.assertAlmostEqual(report['percentage'], 500 / 6)
+        self.assertEqual((report['current_streak'], report['longest_streak']), (2, 2))
+        self.assertAlmostEqual(report['journals'][1]['energy_deviation'], -0.03)
+
+        report = target_adherence(datetime.date(2024, 1, 3), datetime.date(2024, 1, 6))
+        self.assertEqual((report['days'], report['met'], report['current_streak']), (2, 1, 1))
+
+    def test_admin_filter(self):
+        self.client.force_login(self.user)
+        url = reverse('admin:nutrition_journal_changelist')
+        for value, count in (('yes', 5), ('no', 1)):
+            response = self.client.get(url, {'target_met': value})
+            self.assertEqual(response.context['cl'].result_count, count)
+
+class JournalNutritionSummaryTests(TestCase):
+    def setUp(self):
+        category = FoodCategory.objects.create(name='Cereals')
+        self.oats = create_food_item(category)
+        self.journal = Journal.objects.create(date=datetime.date(2024, 1, 1))
+        self.other = Journal.objects.create(date=datetime.date(2024, 1, 2))
+
+    def summary(self, journal):
+        return JournalNutritionSummary.objects.get(journal=journal)
+
+    def test_item_save_and_delete(self):
+        item = JournalItem.objects.create(
+            journal=self.journal, food_item=self.oats, quantity=50.0,
+        )
+        self.assertAlmostEqual(self.summary(self.journal).energy, 190.0)
+
+        item.quantity = 100.0
+        item.save()
+        self.assertAlmostEqual(self.summary(self.journal).energy, 380.0)
+
+        item.delete()
+        self.assertEqual(self.summary(self.journal).energy, 0.0)
+
+    def test_item_moved_between_journals(self):
+        item = JournalItem.objects.create(
+            journal=self.journal, food_item=self.oats, quantity=50.0,
+        )
+        item.journal = self.other
+        item.save()
+        self.assertEqual(self.summary(self.journal).energy, 0.0)
+        self.assertAlmostEqual(self.summary(self.other).energy, 190.0)
+
+    def test_food_item_nutrients_changed(self):
+        JournalItem.objects.create(
+            journal=self.journal, food_item=self.oats, quantity=50.0,
+        )
+        self.oats.energy = 400.0
+        self.oats.save()
+        self.assertAlmostEqual(self.summary(self.journal).energy, 200.0)
+
+    def test_nutrition_reads_summary(self):
+        JournalItem.objects.create(
+            journal=self.journal, food_item=self.oats, quantity=50.0,
+        )
+        journal = Journal.objects.select_related('nutrition_summary').get(
+            pk=self.journal.pk,
+        )
+        with self.assertNumQueries(0):
+            self.assertAlmostEqual(journal.nutrition()['energy'], 190.0)
+
+    def test_rebuild_command(self):
+        JournalItem.objects.create(
+            journal=self.journal, food_item=self.oats, quantity=50.0,
+        )
+        JournalNutritionSummary.objects.filter(journal=self.journal).update(
+            energy=1.0,
+        )
+        with self.assertRaises(CommandError):
+            call_command('rebuild_nutrition_summaries', '--check', stdout=StringIO())
+
+        call_command('rebuild_nutrition_summaries', stdout=StringIO())
+        call_command('rebuild_nutrition_summaries', '--check', stdout=StringIO())
+        self.assertAlmostEqual(self.summary(self.journal).energy, 190.0)
+
+class JournalItemAdminQueryCountTests(TestCase):
+    """ The JournalItem changelist and the Journal change form should render
+    with the same number of queries however many JournalItems are shown.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        category = FoodCategory.objects.create(name='Cereals')
+        cls.food_items = [
+            create_food_item(category, name=f'Food {i}') for i in range(10)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_journal(self, day, items):
+        journal = Journal.objects.create(date=datetime.date(2024, 1, day))
+        for food_item in self.food_items[:items]:
+            JournalItem.objects.create(journal=journal, food_item=food_item)
+        return journal
+
+    def count_queries(self, url):
+        # Warm up any caches, such as the ContentType cache, first.
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_journal_item_changelist(self):
+        url = reverse('admin:nutrition_journalitem_changelist')
+        self.create_journal(1, 2)
+        few = self.count_queries(url)
+        self.create_journal(2, 10)
+        self.assertEqual(self.count_queries(url), few)
+
+    def test_journal_change_form(self):
+        small = self.create_journal(1, 2)
+        large = self.create_journal(2, 10)
+        url = 'admin:nutrition_journal_change'
+        self.assertEqual(
+            self.count_queries(reverse(url, args=[small.pk])),
+            self.count_queries(reverse(url, args=[large.pk])),
+        )
+
+class FoodItemSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.cereals = FoodCategory.objects.create(name='Cereals')
+        dairy = FoodCategory.objects.create(name='Dairy')
+        cls.oats = create_food_item(cls.cereals, name='Rolled oats')
+        cls.oat_milk = create_food_item(dairy, name='Oat milk', brand='Oatly')
+        cls.milk = create_food_item(dairy, name='Semi-skimmed milk')
+
+    def test_prefix_match_and_rank(self):
+        self.assertEqual(ranked_food_item_ids('oat'), [self.oat_milk.pk, self.oats.pk])
+        self.assertEqual(ranked_food_item_ids('oat mil'), [self.oat_milk.pk])
+        self.assertEqual(ranked_food_item_ids('dairy'), [self.oat_milk.pk, self.milk.pk])
+
+    def test_favourites_are_boosted(self):
+        self.oats.favourite = True
+        self.oats.save()
+        self.assertEqual(ranked_food_item_ids('oat'), [self.oats.pk, self.oat_milk.pk])
+
+    def test_index_follows_changes(self):
+        self.cereals.name = 'Breakfast'
+        self.cereals.save()
+        self.assertEqual(ranked_food_item_ids('breakfast'), [self.oats.pk])
+        self.milk.name = 'Whole milk'
+        self.milk.save()
+        self.assertEqual(ranked_food_item_ids('whole'), [self.milk.pk])
+        self.milk.delete()
+        self.assertEqual(ranked_food_item_ids('whole'), [])
+
+    def test_autocomplete(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'term': 'oat', 'app_label': 'nutrition',
+            'model_name': 'journalitem', 'field_name': 'food_item',
+        })
+        self.assertEqual(
+            [int(result['id']) for result in response.json()['results']],
+            [self.oat_milk.pk, self.oats.pk],
+        )
+
+    def test_autocomplete_pages(self):
+        FoodItem.objects.bulk_create([
+            FoodItem(name=f'Oat bar {i}', category=self.cereals) for i in range(130)
+        ])
+        self.client.force_login(self.user)
+        ids = []
+        for page in range(1, 10):
+            response = self.client.get(reverse('admin:autocomplete'), {
+                'term': 'oat', 'app_label': 'nutrition', 'page': page,
+                'model_name': 'journalitem', 'field_name': 'food_item',
+            }).json()
+            ids += [int(result['id']) for result in response['results']]
+            if not response['pagination']['more']:
+                break
+        self.assertEqual(page, 7)
+        self.assertEqual(len(ids), 132)
+        self.assertEqual(len(set(ids)), 132)
+
+IMPORT_CSV = """code,name,category,brand,favourite,unit_quantity,energy,fat,saturates,carbohydrates,sugars
+001,Rolled oats,Cereals,,yes,100,380,8,1.5,60,1
+002,Oat milk,dairy,Oatly,,100,46,1.5,0.2,6.7,4
+003,Bad fats,Dairy,,,100,100,1,2,,
+004,Too much energy,Dairy,,,100,100000,,,,
+,No code,Dairy,,,,,,,,
+001,Duplicate,Cereals,,,,,,,,
+005,Bad units,Dairy,,maybe,,,,,,
+"""
+
+class FoodItemImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.cereals = FoodCategory.objects.create(name='Cereals')
+
+    def import_csv(self, text, batch_size=2):
+        return FoodItemImporter(batch_size).import_rows(
+            read_rows(StringIO(text), 'csv'),
+        )
+
+    def test_import(self):
+        result = self.import_csv(IMPORT_CSV)
+        self.assertEqual((result.rows, result.imported), (7, 2))
+        self.assertEqual(
+            {line: sorted(errors) for line, errors in result.rejected},
+            {
+                4: ['saturates'], 5: ['energy'], 6: ['code'], 7: ['code'],
+                8: ['favourite'],
+            },
+        )
+
+        oats = FoodItem.objects.get(code='001')
+        self.assertEqual(oats.category, self.cereals)
+        self.assertTrue(oats.favourite)
+        self.assertIsNone(oats.brand)
+        # Categories are matched regardless of case and created when missing.
+        self.assertEqual(FoodItem.objects.get(code='002').category.name, 'dairy')
+        self.assertEqual(FoodCategory.objects.count(), 2)
+
+    def test_invalid_values(self):
+        result = self.import_csv(
+            'code,name,category,energy,fat\n'
+            '010,Not a number,Cereals,nan,1\n011,Infinite,Cereals,100,inf\n'
+        )
+        self.assertEqual(
+            [(line, sorted(errors)) for line, errors in result.rejected],
+            [(2, ['energy']), (3, ['fat'])],
+        )
+        rows = [
+            ['012', 'Not an object'],
+            {'code': '013', 'name': 'Listed units', 'category': 'Cereals',
+             'unit_units': ['g']},
+            {'code': '014', 'name': 'Granola', 'category': 'Cereals'},
+        ]
+        result = FoodItemImporter().import_rows(
+            read_rows(StringIO(json.dumps(rows)), 'json'),
+        )
+        self.assertEqual(
+            [(line, sorted(errors)) for line, errors in result.rejected],
+            [(2, ['row']), (3, ['unit_units'])],
+        )
+        self.assertEqual(
+            list(FoodItem.objects.values_list('code', flat=True)), ['014'],
+        )
+
+    def test_update_refreshes_summaries(self):
+        self.import_csv(IMPORT_CSV)
+        oats = FoodItem.objects.get(code='001')
+        journal = Journal.objects.create(date=datetime.date(2024, 1, 1))
+        JournalItem.objects.create(journal=journal, food_item=oats, quantity=50.0)
+
+        result = self.import_csv(
+            'code,name,category,energy\n001,Jumbo oats,Cereals,400\n'
+        )
+        self.assertEqual(result.refreshed_journals, 1)
+        oats.refresh_from_db()
+        self.assertEqual((oats.name, oats.energy, oats.fat), ('Jumbo oats', 400.0, None))
+        self.assertEqual(JournalNutritionSummary.objects.get().energy, 200.0)
+        if connection.vendor == 'sqlite':
+            self.assertEqual(ranked_food_item_ids('jumbo'), [oats.pk])
+
+    def test_update_keeps_user_fields(self):
+        self.import_csv(IMPORT_CSV)
+        FoodItem.objects.filter(code='002').update(favourite=True, notes='Skimmed')
+
+        self.import_csv(
+            'code,name,category,energy\n001,Jumbo oats,Cereals,400\n'
+            '002,Semi-skimmed milk,Dairy,50\n'
+        )
+        self.assertEqual(
+            list(
+                FoodItem.objects.filter(code__in=['001', '002'])
+                .order_by('code').values_list('name', 'favourite', 'notes')
+            ),
+            [
+                ('Jumbo oats', True, None),
+                ('Semi-skimmed milk', True, 'Skimmed'),
+            ],
+        )
+
+    def test_command_and_admin_upload(self):
+        ndjson = '{"code": "010", "name": "Granola", "category": "Cereals"}\n'
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalogue.ndjson')
+            with open(path, 'w') as f:
+                f.write(ndjson)
+            call_command('import_food_items', path, stdout=StringIO())
+        self.assertTrue(FoodItem.objects.filter(code='010').exists())
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:nutrition_fooditem_changelist'))
+        self.assertContains(response, reverse('admin:nutrition_fooditem_import'))
+        response = self.client.get(reverse('admin:nutrition_fooditem_import'))
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(reverse('admin:nutrition_fooditem_import'), {
+            'format': 'csv',
+            'file': SimpleUploadedFile('catalogue.csv', IMPORT_CSV.encode()),
+        })
+        self.assertRedirects(response, reverse('admin:nutrition_fooditem_changelist'))
+        self.assertEqual(FoodItem.objects.count(), 3)
+
+class NutritionQueryPlanTests(TestCase):
+    """ The JournalItem and FoodItem changelists should use indexes for their
+    filtering and ordering rather than reading the whole table.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.categories = [
+            FoodCategory.objects.create(name=f'Category {i}') for i in range(20)
+        ]
+        food_items = FoodItem.objects.bulk_create([
+            FoodItem(
+                name=f'Food {i}', category=cls.categories[i % 20],
+                favourite=i % 50 == 0,
+            )
+            for i in range(5_000)
+        ])
+        journals = Journal.objects.bulk_create([
+            Journal(date=datetime.date(2015, 1, 1) + datetime.timedelta(days=i))
+            for i in range(1_000)
+        ])
+        JournalItem.objects.bulk_create([
+            JournalItem(journal=journal, food_item=food_items[(journal.pk * i) % 5_000])
+            for journal in journals for i in range(5)
+        ])
+        analyze()
+
+    def assertNoSequentialScans(self, model, tables, params=None):
+        queryset = changelist_queryset(model, self.user, params)
+        self.assertEqual(
+            sequential_scans(queryset, tables), [], queryset.explain(),
+        )
+
+    def test_journal_item_changelist(self):
+        self.assertNoSequentialScans(JournalItem, ['nutrition_journalitem'])
 
-# Create your tests here.
+    def test_food_item_changelist_by_category(self):
+        # The unfiltered changelist is ordered by the category's name first, so
+        # no index on nutrition_fooditem alone can provide its ordering.
+        self.assertNoSequentialScans(
+            FoodItem, ['nutrition_fooditem'],
+            {'category__id__exact': self.categories[0].pk},
+        )
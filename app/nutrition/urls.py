@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'nutrition'
+urlpatterns = [
+    path('journals/', views.journal_nutrition, name='journal_nutrition'),
+    path(
+        'journals/<str:date>/', views.journal_nutrition_detail,
+        name='journal_nutrition_detail',
+    ),
+]
@@ -1,3 +1,54 @@
-from django.shortcuts import render
+from django.http import Http404, JsonResponse
+from django.utils.dateparse import parse_date
 
-# Create your views here.
+from fitnesstracker.asynchronous import (
+    aiterator, async_require_GET, async_staff_member_required,
+)
+from fitnesstracker.export import parse_export_date
+from .exports import journals
+from .models import Journal, journal_totals_cache
+
+@async_staff_member_required
+@async_require_GET
+async def journal_nutrition(request):
+    """ Return the nutritional totals of every Journal as JSON in date order.
+    The optional parameters start and end are ISO 8601 dates to limit the
+    Journals to.
+    """
+    try:
+        start = parse_export_date(request.GET.get('start'))
+        end = parse_export_date(request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    async def load():
+        columns, rows = journals(start, end)
+        return [dict(zip(columns, row)) async for row in aiterator(rows)]
+
+    return JsonResponse({
+        'journals': await journal_totals_cache.aget_or_set(
+            ('journals', start, end), load,
+        ),
+    })
+
+@async_staff_member_required
+@async_require_GET
+async def journal_nutrition_detail(request, date):
+    """ Return the nutritional totals of the Journal for the given date. """
+    async def load():
+        columns, rows = journals()
+        try:
+            return dict(zip(columns, await rows.aget(date=day)))
+        except Journal.DoesNotExist:
+            return None
+
+    try:
+        day = parse_date(date)
+    except ValueError:
+        day = None
+    journal = None
+    if day is not None:
+        journal = await journal_totals_cache.aget_or_set(('journal', day), load)
+    if journal is None:
+        raise Http404('No Journal matches the given query.')
+    return JsonResponse(journal)
@@ -1,7 +1,31 @@
+import datetime
+
 from django.contrib import admin
+from django.db.models import Prefetch
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 
 # Register your models here.
-from .models import Exercise, Location, Session, SessionExercise, SessionType
+from fitnesstracker.energy import with_burned_calories
+from .analytics import LOADS, exercise_summaries, weekly_load
+from .models import (
+    Exercise, Location, PersonalBest, Session, SessionExercise, SessionType,
+    exercise_choices, facet_counts,
+)
+
+class CountedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """ CountedRelatedFieldListFilter shows how many objects there are with
+    each choice. The counts are of the whole table rather than the filtered
+    changelist, so that they can be counted in a single query and cached until
+    the objects change instead of being counted again for every page.
+    """
+    def field_choices(self, field, request, model_admin):
+        counts = facet_counts(model_admin.model, self.field_path)
+        return [
+            (pk, f"{label} ({counts.get(pk, 0):,})")
+            for pk, label in super().field_choices(field, request, model_admin)
+        ]
 
 class LocationAdmin(admin.ModelAdmin):
     search_fields = ["name", "address",]
@@ -9,27 +33,135 @@ class LocationAdmin(admin.ModelAdmin):
 class SessionExerciseInline(admin.TabularInline):
     model = SessionExercise
     extra = 1
+    readonly_fields = ["personal_best",]
+
+    def get_queryset(self, request):
+        # Each row displays SessionExercise.__str__(), which uses the Exercise.
+        # Fetch the PersonalBests of every row at once for their badges,
+        # without ordering them by their Exercise's name, which is the same.
+        return super().get_queryset(request).select_related(
+            "exercise",
+        ).prefetch_related(Prefetch(
+            "personal_bests",
+            queryset=PersonalBest.objects.order_by("metric", "band"),
+        ))
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == "exercise":
+            # Give every row the same cached choices rather than querying for
+            # the Exercises again to render each one.
+            empty = [] if formfield.empty_label is None else [("", formfield.empty_label)]
+            formfield.choices = empty + exercise_choices.get(
+                lambda: list(Exercise.objects.values_list("pk", "name"))
+            )
+        return formfield
+
+    @admin.display(description="Personal best")
+    def personal_best(self, obj):
+        if obj.pk is None:
+            return ""
+        return ", ".join(best.describe() for best in obj.personal_bests.all())
 
 class SessionAdmin(admin.ModelAdmin):
     inlines = [SessionExerciseInline,]
     list_display = ["date", "session_type", "location",]
-    list_filter = ["date", "session_type", "location__name",]
+    list_filter = [
+        "date",
+        ("session_type", CountedRelatedFieldListFilter),
+        ("location", CountedRelatedFieldListFilter),
+    ]
+    list_select_related = ["session_type", "location",]
+    search_fields = ["session_type__name", "location__name", "notes",]
+    # Ordering by session_type would order by the SessionType's name, which
+    # stops the session_date_type_idx index being used to order the results.
+    ordering = ["-date",]
 
 class ExerciseAdmin(admin.ModelAdmin):
     list_display = ["name", "type",]
     list_filter = ["type",]
     search_fields = ["name",]
 
+    def get_urls(self):
+        return [
+            path(
+                "analytics/",
+                self.admin_site.admin_view(self.analytics_view),
+                name="workouts_exercise_analytics",
+            ),
+        ] + super().get_urls()
+
+    def analytics_view(self, request):
+        """ Summarise every Exercise and the weekly training load over the last
+        twelve weeks, or the number of weeks given in the weeks parameter. The
+        load parameter chooses the measure of the training load.
+        """
+        try:
+            weeks = max(int(request.GET.get("weeks", 12)), 1)
+        except ValueError:
+            weeks = 12
+        load = request.GET.get("load")
+        if load not in LOADS:
+            load = LOADS[0]
+        start = timezone.now() - datetime.timedelta(weeks=weeks)
+        return TemplateResponse(
+            request, "admin/workouts/exercise/analytics.html", {
+                **self.admin_site.each_context(request),
+                "title": f"Training over the last {weeks} weeks",
+                "opts": self.model._meta,
+                "load": load,
+                "number_of_weeks": weeks,
+                "loads": LOADS,
+                "exercises": exercise_summaries(start),
+                "weeks": weekly_load(load, start=start),
+            },
+        )
+
 class SessionExerciseAdmin(admin.ModelAdmin):
     list_display = [
         "session", "exercise",
-        "duration", "distance", "calories",
+        "duration", "distance", "burned_calories",
         "weight", "sets", "reps",
     ]
-    list_filter = ["session__date", "exercise",]
+    list_filter = [
+        "session__date", ("exercise", CountedRelatedFieldListFilter),
+    ]
+    list_select_related = ["session__session_type", "exercise",]
+    ordering = ["-session__date", "added",]
+    autocomplete_fields = ["session",]
+
+    def get_queryset(self, request):
+        return with_burned_calories(super().get_queryset(request))
+
+    @admin.display(description="Calories", ordering="burned_calories")
+    def burned_calories(self, obj):
+        if obj.burned_calories is None:
+            return None
+        # Mark the calories that were estimated rather than recorded.
+        prefix = "~" if obj.calories is None else ""
+        return f"{prefix}{obj.burned_calories:.0f}"
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "session":
+            # The selected Session's label uses its SessionType.
+            kwargs["queryset"] = Session.objects.select_related("session_type")
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+class PersonalBestAdmin(admin.ModelAdmin):
+    list_display = ["exercise", "metric", "band", "value", "session_exercise",]
+    list_filter = ["metric", "exercise",]
+    list_select_related = ["exercise", "session_exercise__exercise",]
+    readonly_fields = [field.name for field in PersonalBest._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 admin.site.register(Location, LocationAdmin)
 admin.site.register(SessionType)
 admin.site.register(Session, SessionAdmin)
 admin.site.register(Exercise, ExerciseAdmin)
 admin.site.register(SessionExercise, SessionExerciseAdmin)
+admin.site.register(PersonalBest, PersonalBestAdmin)
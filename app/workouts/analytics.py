@@ -0,0 +1,238 @@
+""" Training analytics for the SessionExercises, computed in the database.
+
+Each SessionExercise is annotated with its volume (weight × sets × reps), its
+estimated one repetition maximum and its pace. The personal records of an
+Exercise and the acute:chronic ratio of the weekly training load are found
+with window functions, so each is a single query however long the history is
+rather than a loop over every set in Python.
+"""
+import datetime
+
+from django.db import NotSupportedError, connection
+from django.db.models import (
+    Case, Count, ExpressionWrapper, F, FloatField, Func, Max, Min, OuterRef,
+    Subquery, Sum, Value, When, Window,
+)
+from django.db.models.functions import Coalesce, RowNumber, TruncWeek
+from django.db.models.expressions import RowRange
+from django.utils import timezone
+
+from .models import Session, SessionExercise
+
+# The metrics that personal records are kept for and whether a higher value is
+# better, which it is for all of them but pace, in seconds per kilometre.
+RECORD_METRICS = {
+    'estimated_1rm': True,
+    'volume': True,
+    'distance': True,
+    'pace': False,
+}
+
+# The measures of training load that the weekly load can be calculated from.
+LOADS = ('volume', 'duration', 'distance', 'calories')
+
+# The number of weeks, including the current one, that the chronic load is the
+# average weekly load of.
+CHRONIC_WEEKS = 4
+
+EPOCH = datetime.date(1970, 1, 1)
+
+class DaysSinceEpoch(Func):
+    """ The number of days from 1970-01-01 until a date or a naive datetime,
+    which is what the truncation functions return in the current time zone.
+    """
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(
+            f'DaysSinceEpoch is not supported on {connection.vendor}'
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='(julianday(%(expressions)s) - 2440587.5)',
+            **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template='(EXTRACT(EPOCH FROM %(expressions)s) / 86400)',
+            **extra_context,
+        )
+
+def session_exercises(exercise=None, start: datetime.datetime=None,
+                      end: datetime.datetime=None):
+    """ Return the SessionExercises of an Exercise, or of every Exercise, from
+    start (inclusive) until end (exclusive), annotated with:
+
+    * volume: the weight in kg × sets × reps, where all three were recorded.
+    * estimated_1rm: the most weight that could be lifted once, estimated with
+      the Epley formula from a positive weight and the reps.
+    * pace: the seconds taken per kilometre, where both were recorded.
+    """
+    rows = SessionExercise.objects.annotate(
+        volume=ExpressionWrapper(
+            F('weight') * F('sets') * F('reps'), output_field=FloatField(),
+        ),
+        estimated_1rm=Case(
+            When(weight__gt=0, reps=1, then=F('weight')),
+            When(
+                weight__gt=0, reps__gt=1,
+                then=F('weight') * (Value(1.0) + F('reps') / Value(30.0)),
+            ),
+            output_field=FloatField(),
+        ),
+        pace=Case(
+            When(
+                distance__gt=0, duration__isnull=False,
+                then=F('duration') * Value(1000.0) / F('distance'),
+            ),
+            output_field=FloatField(),
+        ),
+    )
+    if exercise is not None:
+        rows = rows.filter(exercise=exercise)
+    if start is not None:
+        rows = rows.filter(session__date__gte=start)
+    if end is not None:
+        rows = rows.filter(session__date__lt=end)
+    return rows
+
+def exercise_summaries(start: datetime.datetime=None, end: datetime.datetime=None):
+    """ Return the totals and bests of every Exercise that was performed from
+    start (inclusive) until end (exclusive), in order of name.
+    """
+    return (
+        session_exercises(start=start, end=end)
+        .values('exercise_id', 'exercise__name', 'exercise__type')
+        .annotate(
+            sessions=Count('session_id', distinct=True),
+            sets=Sum('sets'),
+            volume=Sum('volume'),
+            best_estimated_1rm=Max('estimated_1rm'),
+            distance=Sum('distance'),
+            duration=Sum('duration'),
+            best_pace=Min('pace'),
+            last_performed=Max('session__date'),
+        )
+        .order_by('exercise__name')
+    )
+
+def personal_records(exercise=None, metric: str='estimated_1rm'):
+    """ Return the SessionExercises that set a personal record for the metric,
+    in order of Exercise and date. The first SessionExercise of an Exercise
+    with a value is always a record, and each later record beat the one before
+    it. Without an Exercise this returns the record history of every one.
+    """
+    if metric not in RECORD_METRICS:
+        raise ValueError(f'Invalid metric: {metric}')
+    higher = RECORD_METRICS[metric]
+    order_by = [F('session__date').asc(), F('pk').asc()]
+    rows = session_exercises(exercise).filter(**{f'{metric}__isnull': False})
+    # A record is the best value of its Exercise so far and the first time that
+    # the value was reached, so that equalling a record does not set another.
+    rows = rows.annotate(
+        best=Window(
+            (Max if higher else Min)(metric),
+            partition_by=[F('exercise_id')],
+            order_by=order_by,
+            frame=RowRange(start=None, end=0),
+        ),
+        occurrence=Window(
+            RowNumber(),
+            partition_by=[F('exercise_id'), F(metric)],
+            order_by=order_by,
+        ),
+    )
+    return rows.filter(**{metric: F('best')}, occurrence=1).order_by(
+        'exercise_id', 'session__date', 'pk',
+    )
+
+def weekly_load(load: str='volume', exercise=None,
+                start: datetime.datetime=None, end: datetime.datetime=None):
+    """ Return the training load of every week from start (inclusive) until end
+    (exclusive) that has any Sessions, with the acute:chronic workload
+    ratio, which compares the week's load with the average of the last
+    CHRONIC_WEEKS weeks. A ratio well above 1 is a sudden increase in training.
+
+    The load is the total of the volume in kg, the duration in minutes, the
+    distance in km or the calories of the SessionExercises. The weeks are
+    summed and the chronic load is averaged over them in a single query, with
+    a window that spans a range of days so that weeks without any training
+    count as no load. The ratio is None until there are CHRONIC_WEEKS weeks of
+    history.
+    """
+    if load not in LOADS:
+        raise ValueError(f'Invalid load: {load}')
+    value = {
+        'volume': F('volume'),
+        'duration': F('duration') / Value(60.0),
+        'distance': F('distance') / Value(1000.0),
+        'calories': F('calories'),
+    }[load]
+
+    # Load the weeks before start that its chronic load is averaged over.
+    history = CHRONIC_WEEKS - 1
+    sessions = Session.objects.all()
+    monday = None
+    if start is not None:
+        monday = timezone.localdate(start)
+        monday -= datetime.timedelta(days=monday.weekday())
+        sessions = sessions.filter(date__gte=timezone.make_aware(
+            datetime.datetime.combine(
+                monday - datetime.timedelta(weeks=history), datetime.time(),
+            )
+        ))
+    if end is not None:
+        sessions = sessions.filter(date__lt=end)
+    # Each Session is totalled before the Sessions are grouped into weeks, so
+    # that the week of each Session is found once rather than for every one
+    # of its SessionExercises, which SQLite does slowly in Python.
+    totals = (
+        session_exercises(exercise)
+        .filter(session=OuterRef('pk'))
+        .values('session')
+        .annotate(total=Sum(value, output_field=FloatField()))
+        .values('total')
+    )
+    weeks = (
+        sessions.annotate(
+            session_load=Coalesce(Subquery(totals), 0.0),
+            week=TruncWeek('date'),
+        )
+        .values('week')
+        .annotate(day=DaysSinceEpoch('week'), training_load=Sum('session_load'))
+        .values_list('day', 'training_load')
+        .order_by()
+    )
+    sql, params = weeks.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT day, training_load, SUM(training_load) OVER ('
+            f'ORDER BY day RANGE BETWEEN {history * 7} PRECEDING AND CURRENT ROW'
+            f') FROM ({sql}) weeks ORDER BY day',
+            params,
+        )
+        rows = cursor.fetchall()
+
+    result = []
+    first = None
+    for day, acute, total in rows:
+        day = round(day)
+        first = day if first is None else first
+        week = EPOCH + datetime.timedelta(days=day)
+        if monday is not None and week < monday:
+            continue
+        chronic = total / CHRONIC_WEEKS
+        ratio = None
+        if day - first >= history * 7 and chronic:
+            ratio = acute / chronic
+        result.append({
+            'week': week,
+            'load': acute,
+            'chronic_load': chronic,
+            'ratio': ratio,
+        })
+    return result
@@ -0,0 +1,50 @@
+""" Exports of the exercise Sessions and the SessionExercises performed in them.
+Each export returns its column names and a queryset of rows with those columns,
+for streaming by fitnesstracker.export.
+"""
+from django.db.models import F
+
+from .models import Session, SessionExercise
+
+def sessions(start=None, end=None):
+    """ Every Session in the date range. """
+    rows = Session.objects.order_by('date', 'pk')
+    if start is not None:
+        rows = rows.filter(date__gte=start)
+    if end is not None:
+        rows = rows.filter(date__lt=end)
+
+    rows = rows.annotate(
+        session_type_name=F('session_type__name'),
+        location_name=F('location__name'),
+    )
+    columns = (
+        'id', 'date', 'session_type_id', 'session_type_name', 'location_id',
+        'location_name', 'notes',
+    )
+    return columns, rows.values_list(*columns)
+
+def session_exercises(start=None, end=None):
+    """ Every SessionExercise of the Sessions in the date range. """
+    rows = SessionExercise.objects.order_by('session__date', 'session', 'added')
+    if start is not None:
+        rows = rows.filter(session__date__gte=start)
+    if end is not None:
+        rows = rows.filter(session__date__lt=end)
+
+    rows = rows.annotate(
+        date=F('session__date'),
+        exercise_name=F('exercise__name'),
+        exercise_type=F('exercise__type'),
+    )
+    columns = (
+        'id', 'session_id', 'date', 'exercise_id', 'exercise_name',
+        'exercise_type', 'duration', 'distance', 'calories', 'weight', 'sets',
+        'reps', 'notes',
+    )
+    return columns, rows.values_list(*columns)
+
+EXPORTS = {
+    'sessions': sessions,
+    'session-exercises': session_exercises,
+}
@@ -0,0 +1,86 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from workouts.models import PersonalBest
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the PersonalBests of every Exercise from their '
+        'SessionExercises, or check them against them with --check.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report personal bests that are missing or out of date '
+                 'without changing them',
+        )
+
+    def handle(self, *args, **options):
+        expected = PersonalBest.compute()
+
+        if options['check']:
+            self.check_personal_bests(expected)
+            return
+
+        with transaction.atomic():
+            PersonalBest.objects.all().delete()
+            bests = PersonalBest.objects.bulk_create(
+                [
+                    PersonalBest(
+                        exercise_id=exercise_id, metric=metric, band=band,
+                        value=value, session_exercise_id=session_exercise_id,
+                    )
+                    for (exercise_id, metric, band), (value, session_exercise_id)
+                    in expected.items()
+                ],
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(bests)} personal bests'
+        ))
+
+    def check_personal_bests(self, expected):
+        problems = 0
+        actual = {
+            (best.exercise_id, best.metric, best.band): best
+            for best in PersonalBest.objects.all()
+        }
+
+        for key in expected.keys() | actual.keys():
+            description = f'Exercise {key[0]} {key[1]} {key[2]}'
+            if key not in actual:
+                problems += 1
+                self.stdout.write(f'{description}: missing personal best')
+                continue
+            if key not in expected:
+                problems += 1
+                self.stdout.write(f'{description}: unexpected personal best')
+                continue
+
+            value, session_exercise_id = expected[key]
+            best = actual[key]
+            if not math.isclose(best.value, value, rel_tol=1e-9, abs_tol=1e-9):
+                problems += 1
+                self.stdout.write(
+                    f'{description}: value is {best.value} but should be {value}'
+                )
+            elif best.session_exercise_id != session_exercise_id:
+                problems += 1
+                self.stdout.write(
+                    f'{description}: held by SessionExercise '
+                    f'{best.session_exercise_id} but should be '
+                    f'{session_exercise_id}'
+                )
+
+        if problems:
+            raise CommandError(
+                f'Found {problems} problems with the personal bests, run this '
+                'command without --check to rebuild them'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'All of the personal bests are up to date'
+        ))
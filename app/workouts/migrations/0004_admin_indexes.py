@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0003_sessionexercise_calories'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['-date', 'session_type'], name='session_date_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['session_type', '-date'], name='session_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sessionexercise',
+            index=models.Index(fields=['exercise', 'session'], name='sessionexercise_exercise_idx'),
+        ),
+    ]
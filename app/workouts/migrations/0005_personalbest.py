@@ -0,0 +1,71 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+DISTANCE_BANDS = (0, 1000, 5000, 10_000, 21_097, 42_195)
+
+
+def populate_personal_bests(apps, schema_editor):
+    SessionExercise = apps.get_model('workouts', 'SessionExercise')
+    PersonalBest = apps.get_model('workouts', 'PersonalBest')
+    bests = {}
+    rows = SessionExercise.objects.order_by('session__date', 'pk').values_list(
+        'pk', 'exercise_id', 'weight', 'reps', 'distance', 'duration',
+    )
+    for pk, exercise_id, weight, reps, distance, duration in rows.iterator():
+        values = []
+        if weight is not None and weight > 0 and reps:
+            values.append(('weight', reps, weight))
+        if distance and duration:
+            band = max(b for b in DISTANCE_BANDS if b <= distance)
+            values.append(('pace', band, -duration * 1000 / distance))
+        if duration:
+            values.append(('duration', 0, float(duration)))
+        for metric, band, value in values:
+            key = (exercise_id, metric, band)
+            if key not in bests or value > bests[key][0]:
+                bests[key] = (value, pk)
+
+    PersonalBest.objects.bulk_create(
+        [
+            PersonalBest(
+                exercise_id=exercise_id, metric=metric, band=band,
+                # Paces were negated so that the fastest is the highest.
+                value=-value if metric == 'pace' else value,
+                session_exercise_id=pk,
+            )
+            for (exercise_id, metric, band), (value, pk) in bests.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('workouts', '0004_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalBest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('metric', models.CharField(choices=[('weight', 'Weight'), ('pace', 'Pace'), ('duration', 'Duration')], max_length=8)),
+                ('band', models.PositiveIntegerField(help_text='The number of reps of a weight, the lower bound in metres of the distance band of a pace or 0 for a duration')),
+                ('value', models.FloatField(help_text='The weight in kg, pace in seconds per km or duration in seconds')),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_bests', to='workouts.exercise')),
+                ('session_exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_bests', to='workouts.sessionexercise')),
+            ],
+            options={
+                'ordering': ['exercise', 'metric', 'band'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='personalbest',
+            constraint=models.UniqueConstraint(fields=('exercise', 'metric', 'band'), name='personalbest_exercise_metric_band_unique'),
+        ),
+        migrations.RunPython(populate_personal_bests, migrations.RunPython.noop),
+    ]
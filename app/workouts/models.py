@@ -1,8 +1,11 @@
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Q, Value
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
+from fitnesstracker.cache import SharedVersionCache, VersionedCache
+
 class Location(models.Model):
     """ Location represents a geographical place where an exercise session takes
     place, for example a gym or a park.
@@ -44,6 +47,10 @@ class Session(models.Model):
 
     class Meta:
         ordering = ["-date", "session_type",]
+        indexes = [
+            models.Index(fields=["-date", "session_type"], name="session_date_type_idx"),
+            models.Index(fields=["session_type", "-date"], name="session_type_date_idx"),
+        ]
 
     def __str__(self):
         return f'{self.date.strftime("%Y-%m-%d")}: {self.session_type}'
@@ -111,6 +118,9 @@ class SessionExercise(models.Model):
 
     class Meta:
         ordering = ["session", "added",]
+        indexes = [
+            models.Index(fields=["exercise", "session"], name="sessionexercise_exercise_idx"),
+        ]
 
     def __str__(self):
         duration = distance = calories = weight = sets = reps = ''
@@ -133,3 +143,194 @@ class SessionExercise(models.Model):
             f'{duration}{distance}{calories}{weight}{sets}{reps}'
         )
         return s.rstrip(', ')
+
+class PersonalBest(models.Model):
+    """ PersonalBest holds the best SessionExercise of an Exercise for a metric:
+    the heaviest weight lifted for a number of reps, the fastest pace over a
+    distance band or the longest duration. They are kept up to date as
+    SessionExercises are saved and deleted so that whether a SessionExercise
+    is a personal best can be looked up rather than found by comparing it with
+    every other SessionExercise of its Exercise.
+    """
+    METRICS = (
+        ('weight', 'Weight'),
+        ('pace', 'Pace'),
+        ('duration', 'Duration'),
+    )
+    # The lower bounds in metres of the distance bands that paces are compared
+    # within, so that a 1km sprint is not compared with a marathon.
+    DISTANCE_BANDS = (0, 1000, 5000, 10_000, 21_097, 42_195)
+
+    updated = models.DateTimeField(auto_now=True)
+    exercise = models.ForeignKey(
+        Exercise, on_delete=models.CASCADE, related_name="personal_bests",
+    )
+    metric = models.CharField(max_length=8, choices=METRICS)
+    band = models.PositiveIntegerField(
+        help_text=_(
+            'The number of reps of a weight, the lower bound in metres of the '
+            'distance band of a pace or 0 for a duration'
+        ),
+    )
+    value = models.FloatField(
+        help_text=_('The weight in kg, pace in seconds per km or duration in seconds'),
+    )
+    session_exercise = models.ForeignKey(
+        SessionExercise, on_delete=models.CASCADE, related_name="personal_bests",
+    )
+
+    class Meta:
+        ordering = ["exercise", "metric", "band",]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["exercise", "metric", "band"],
+                name="personalbest_exercise_metric_band_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.exercise_id} | {self.describe()} | {self.value}'
+
+    def describe(self) -> str:
+        if self.metric == 'weight':
+            return f'Weight × {self.band} reps'
+        if self.metric == 'pace':
+            return f'Pace over {self.band / 1000:g}km+'
+        return 'Duration'
+
+    @classmethod
+    def higher_is_better(cls, metric: str) -> bool:
+        return metric != 'pace'
+
+    @classmethod
+    def band_of(cls, distance: int) -> int:
+        return max(band for band in cls.DISTANCE_BANDS if band <= distance)
+
+    @classmethod
+    def values_of(cls, session_exercise: SessionExercise) -> dict:
+        """ Return the value of each (metric, band) that a SessionExercise can
+        be a personal best for.
+        """
+        se = session_exercise
+        values = {}
+        if se.weight is not None and se.weight > 0 and se.reps:
+            values[('weight', se.reps)] = se.weight
+        if se.distance and se.duration:
+            values[('pace', cls.band_of(se.distance))] = se.duration * 1000 / se.distance
+        if se.duration:
+            values[('duration', 0)] = float(se.duration)
+        return values
+
+    @classmethod
+    def compute(cls) -> dict:
+        """ Return the value and SessionExercise ID of every personal best,
+        keyed by (exercise ID, metric, band), found in a single pass over all
+        of the SessionExercises.
+        """
+        bests = {}
+        rows = SessionExercise.objects.order_by('session__date', 'pk').only(
+            'exercise_id', 'weight', 'reps', 'distance', 'duration',
+        )
+        for row in rows.iterator(chunk_size=2000):
+            for (metric, band), value in cls.values_of(row).items():
+                key = (row.exercise_id, metric, band)
+                best = bests.get(key)
+                if best is None or (
+                    value > best[0] if cls.higher_is_better(metric)
+                    else value < best[0]
+                ):
+                    bests[key] = (value, row.pk)
+        return bests
+
+    @classmethod
+    def candidates(cls, exercise_id, metric: str, band: int):
+        """ Return the SessionExercises of an Exercise that count towards the
+        personal best for the metric and band, annotated with their value and
+        ordered from the best, with the earliest first when they are equal.
+        """
+        rows = SessionExercise.objects.filter(exercise_id=exercise_id)
+        if metric == 'weight':
+            rows = rows.filter(weight__gt=0, reps=band).annotate(value=F('weight'))
+        elif metric == 'pace':
+            upper = [b for b in cls.DISTANCE_BANDS if b > band]
+            rows = rows.filter(distance__gte=max(band, 1), duration__isnull=False)
+            if upper:
+                rows = rows.filter(distance__lt=upper[0])
+            rows = rows.annotate(value=ExpressionWrapper(
+                F('duration') * Value(1000.0) / F('distance'),
+                output_field=models.FloatField(),
+            ))
+        elif metric == 'duration':
+            rows = rows.filter(duration__isnull=False).annotate(value=F('duration'))
+        else:
+            raise ValueError(f'Invalid metric: {metric}')
+        value = F('value').desc() if cls.higher_is_better(metric) else F('value').asc()
+        return rows.order_by(value, 'session__date', 'pk')
+
+    @classmethod
+    def add(cls, session_exercise: SessionExercise):
+        """ Make a SessionExercise the personal best for every metric that it
+        beats the current best of, or equals it in an earlier Session, without
+        looking at any other SessionExercises.
+        """
+        date = session_exercise.session.date
+        for (metric, band), value in cls.values_of(session_exercise).items():
+            bests = cls.objects.filter(
+                exercise_id=session_exercise.exercise_id, metric=metric, band=band,
+            )
+            lookup = 'value__lt' if cls.higher_is_better(metric) else 'value__gt'
+            # The same order as candidates(), so that the earliest of equal
+            # SessionExercises holds the best.
+            beaten = Q(**{lookup: value}) | Q(value=value) & (
+                Q(session_exercise__session__date__gt=date)
+                | Q(
+                    session_exercise__session__date=date,
+                    session_exercise_id__gt=session_exercise.pk,
+                )
+            )
+            updated = bests.filter(beaten).update(
+                value=value, session_exercise=session_exercise,
+                updated=timezone.now(),
+            )
+            if not updated and not bests.exists():
+                cls.objects.create(
+                    exercise_id=session_exercise.exercise_id, metric=metric,
+                    band=band, value=value, session_exercise=session_exercise,
+                )
+
+    @classmethod
+    def refresh(cls, exercise_id, metric: str, band: int):
+        """ Find the personal best of an Exercise for the metric and band from
+        its SessionExercises, deleting it if there are none.
+        """
+        best = cls.candidates(exercise_id, metric, band).values('pk', 'value').first()
+        if best is None:
+            cls.objects.filter(
+                exercise_id=exercise_id, metric=metric, band=band,
+            ).delete()
+            return
+        cls.objects.update_or_create(
+            exercise_id=exercise_id, metric=metric, band=band,
+            defaults={'value': best['value'], 'session_exercise_id': best['pk']},
+        )
+
+# The (ID, name) of every Exercise, which are the choices of each row of the
+# SessionExerciseInline.
+exercise_choices = SharedVersionCache('workouts:exercise-choices')
+
+# The number of Sessions or SessionExercises with each value of the fields that
+# the admin filters them by, scoped by the model's label.
+facet_cache = VersionedCache('workouts:facets')
+
+def facet_counts(model, field_path: str) -> dict:
+    """ Return the number of instances of a model with each value of a field,
+    counted in a single query and cached until any of them change.
+    """
+    def count():
+        return dict(
+            model._default_manager.order_by().values_list(field_path)
+            .annotate(count=models.Count('pk'))
+        )
+    return facet_cache.get_or_set(
+        ('counts', field_path), count, scope=model._meta.label_lower,
+    )
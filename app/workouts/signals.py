@@ -0,0 +1,73 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    Exercise, PersonalBest, Session, SessionExercise, exercise_choices,
+    facet_cache,
+)
+
+def _held(session_exercise):
+    return list(
+        PersonalBest.objects.filter(session_exercise=session_exercise)
+        .values_list('exercise_id', 'metric', 'band')
+    )
+
+@receiver(post_save, sender=SessionExercise)
+def update_personal_bests_on_save(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    # A changed SessionExercise may no longer be the best for the metrics that
+    # it held, even under its previous Exercise.
+    if not created:
+        for key in _held(instance):
+            PersonalBest.refresh(*key)
+    PersonalBest.add(instance)
+
+@receiver(pre_delete, sender=SessionExercise)
+def remember_personal_bests(sender, instance, **kwargs):
+    """ Keep a note of the personal bests that a SessionExercise holds before
+    they are deleted along with it so that they can be found again from the
+    remaining SessionExercises.
+    """
+    instance._held_personal_bests = _held(instance)
+
+@receiver(post_delete, sender=SessionExercise)
+def update_personal_bests_on_delete(sender, instance, **kwargs):
+    for key in getattr(instance, '_held_personal_bests', []):
+        PersonalBest.refresh(*key)
+
+@receiver(pre_save, sender=Session)
+def remember_session_date(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    instance._previous_date = (
+        Session.objects.filter(pk=instance.pk).values_list('date', flat=True).first()
+    )
+
+@receiver(post_save, sender=Session)
+def update_personal_bests_on_date_change(sender, instance, created, raw, **kwargs):
+    """ Equal SessionExercises hold a personal best in date order, so moving a
+    Session can change which of them holds it.
+    """
+    previous = getattr(instance, '_previous_date', None)
+    if raw or created or previous is None or previous == instance.date:
+        return
+    keys = {
+        (session_exercise.exercise_id, metric, band)
+        for session_exercise in instance.sessionexercise_set.all()
+        for metric, band in PersonalBest.values_of(session_exercise)
+    }
+    for key in keys:
+        PersonalBest.refresh(*key)
+
+@receiver(post_save, sender=Session)
+@receiver(post_delete, sender=Session)
+@receiver(post_save, sender=SessionExercise)
+@receiver(post_delete, sender=SessionExercise)
+def invalidate_facets(sender, **kwargs):
+    facet_cache.invalidate(sender._meta.label_lower)
+
+@receiver(post_save, sender=Exercise)
+@receiver(post_delete, sender=Exercise)
+def invalidate_exercise_choices(sender, **kwargs):
+    exercise_choices.invalidate()
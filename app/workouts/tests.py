@@ -1,3 +1,368 @@
+import datetime
+import io
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from fitnesstracker.testing import analyze, changelist_queryset, sequential_scans
+from .analytics import exercise_summaries, personal_records, weekly_load
+from .models import (
+    Exercise, Location, PersonalBest, Session, SessionExercise, SessionType,
+)
+
+class WorkoutQueryPlanTests(TestCase):
+    """ The Session and SessionExercise changelists should use indexes for
+    their filtering and ordering rather than reading the whole table.
+    """
+    tables = ['workouts_session', 'workouts_sessionexercise']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.session_types = [
+            SessionType.objects.create(name=name)
+            for name in ('Lower body', 'Upper body', 'Parkrun')
+        ]
+        location = Location.objects.create(name='Gym')
+        cls.exercises = [
+            Exercise.objects.create(name=f'Exercise {i}') for i in range(20)
+        ]
+        now = timezone.now()
+        sessions = Session.objects.bulk_create([
+            Session(
+                date=now - datetime.timedelta(days=i),
+                session_type=cls.session_types[i % len(cls.session_types)],
+                location=location,
+            )
+            for i in range(2_000)
+        ])
+        SessionExercise.objects.bulk_create([
+            SessionExercise(
+                session=session,
+                exercise=cls.exercises[(session.pk + i) % len(cls.exercises)],
+                sets=3, reps=10,
+            )
+            for session in sessions for i in range(5)
+        ])
+        analyze()
+
+    def assertNoSequentialScans(self, model, params=None):
+        queryset = changelist_queryset(model, self.user, params)
+        self.assertEqual(
+            sequential_scans(queryset, self.tables), [], queryset.explain(),
+        )
+
+    def test_session_changelist(self):
+        self.assertNoSequentialScans(Session)
+        self.assertNoSequentialScans(
+            Session, {'session_type__id__exact': self.session_types[0].pk},
+        )
+
+    def test_session_exercise_changelist(self):
+        since = timezone.now() - datetime.timedelta(days=7)
+        self.assertNoSequentialScans(SessionExercise)
+        self.assertNoSequentialScans(
+            SessionExercise, {'session__date__gte': since.isoformat()},
+        )
+        self.assertNoSequentialScans(
+            SessionExercise, {'exercise__id__exact': self.exercises[0].pk},
+        )
+
+class WorkoutAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        session_type = SessionType.objects.create(name='Full body')
+        location = Location.objects.create(name='Gym')
+        cls.squat = Exercise.objects.create(name='Squat')
+        cls.running = Exercise.objects.create(name='Run', type='Aerobic')
+        # Mondays, with a week without any sessions after the fourth.
+        weeks = [0, 1, 2, 3, 5]
+        cls.sessions = [
+            Session.objects.create(
+                date=timezone.make_aware(datetime.datetime(2024, 1, 1, 9))
+                + datetime.timedelta(weeks=week),
+                session_type=session_type, location=location,
+            )
+            for week in weeks
+        ]
+        # (weight, reps) of three sets of squats in each session.
+        squats = [(100.0, 5), (100.0, 8), (100.0, 8), (110.0, 3), (120.0, 1)]
+        for session, (weight, reps) in zip(cls.sessions, squats):
+            SessionExercise.objects.create(
+                session=session, exercise=cls.squat,
+                weight=weight, sets=3, reps=reps,
+            )
+        for session, duration in zip(cls.sessions, [1500, 1440, 1500, 1380, 1400]):
+            SessionExercise.objects.create(
+                session=session, exercise=cls.running,
+                distance=5000, duration=duration,
+            )
+
+    def test_exercise_summaries(self):
+        summaries = {s['exercise__name']: s for s in exercise_summaries()}
+        squat = summaries['Squat']
+        self.assertEqual(squat['sessions'], 5)
+        self.assertEqual(squat['sets'], 15)
+        self.assertAlmostEqual(squat['volume'], 300 * (5 + 8 + 8) + 330 * 3 + 360)
+        # The Epley formula for 100kg × 8 beats 110kg × 3 and 120kg × 1.
+        self.assertAlmostEqual(squat['best_estimated_1rm'], 100 * (1 + 8 / 30))
+        self.assertAlmostEqual(summaries['Run']['best_pace'], 276.0)
+        self.assertIsNone(summaries['Run']['volume'])
+
+    def test_personal_records(self):
+        # Equalling the record in the third session does not set another.
+        self.assertEqual(
+            [r.session for r in personal_records(self.squat)],
+            self.sessions[:2],
+        )
+        self.assertEqual(
+            [r.session for r in personal_records(self.squat, 'volume')],
+            self.sessions[:2],
+        )
+        # A lower pace is better.
+        self.assertEqual(
+            [r.pace for r in personal_records(self.running, 'pace')],
+            [300.0, 288.0, 276.0],
+        )
+        self.assertEqual(
+            personal_records(metric='estimated_1rm').count(), 2,
+        )
+        with self.assertRaises(ValueError):
+            personal_records(self.squat, 'calories')
+
+    def test_weekly_load(self):
+        weeks = weekly_load('volume', self.squat)
+        self.assertEqual(
+            [week['week'] for week in weeks],
+            [datetime.date(2024, 1, 1) + datetime.timedelta(weeks=w) for w in (0, 1, 2, 3, 5)],
+        )
+        self.assertEqual([week['load'] for week in weeks], [1500, 2400, 2400, 990, 360])
+        self.assertEqual([week['ratio'] for week in weeks][:3], [None, None, None])
+        self.assertAlmostEqual(weeks[3]['chronic_load'], (1500 + 2400 + 2400 + 990) / 4)
+        self.assertAlmostEqual(weeks[3]['ratio'], 990 / weeks[3]['chronic_load'])
+        # The empty fifth week counts as no load in the chronic load.
+        self.assertAlmostEqual(weeks[4]['chronic_load'], (2400 + 990 + 360) / 4)
+
+        # The weeks before start are still used for the chronic load.
+        start = timezone.make_aware(datetime.datetime(2024, 1, 24))
+        weeks = weekly_load('duration', self.running, start=start)
+        self.assertEqual(weeks[0]['week'], datetime.date(2024, 1, 22))
+        self.assertAlmostEqual(weeks[0]['chronic_load'], (1500 + 1440 + 1500 + 1380) / 60 / 4)
+
+    async def test_views(self):
+        url = reverse('workouts:exercise_summary')
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+
+        # AsyncClient has no async login methods in Django 4.2.
+        await sync_to_async(self.async_client.force_login)(self.user)
+        response = await self.async_client.get(url, {'start': '2024-01-20'})
+        exercises = response.json()['exercises']
+        self.assertEqual([e['exercise__name'] for e in exercises], ['Run', 'Squat'])
+        self.assertEqual(exercises[1]['sessions'], 2)
+
+        url = reverse('workouts:exercise_records', args=[self.running.pk])
+        response = await self.async_client.get(url, {'metric': 'pace'})
+        records = response.json()['records']
+        self.assertEqual([r['value'] for r in records], [300.0, 288.0, 276.0])
+        self.assertEqual(records[1]['previous_best'], 300.0)
+        response = await self.async_client.get(url, {'metric': 'reps'})
+        self.assertEqual(response.status_code, 400)
+
+        url = reverse('workouts:training_load')
+        response = await self.async_client.get(url, {'load': 'distance'})
+        self.assertEqual([w['load'] for w in response.json()['weeks']], [5.0] * 5)
+        response = await self.async_client.get(url, {'load': 'sets'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_admin_analytics(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:workouts_exercise_changelist'))
+        self.assertContains(response, reverse('admin:workouts_exercise_analytics'))
+        response = self.client.get(
+            reverse('admin:workouts_exercise_analytics'),
+            {'weeks': 1000, 'load': 'duration'},
+        )
+        self.assertContains(response, 'Squat')
+        self.assertContains(response, '2024-01-22')
+
+class PersonalBestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        session_type = SessionType.objects.create(name='Full body')
+        location = Location.objects.create(name='Gym')
+        cls.squat = Exercise.objects.create(name='Squat')
+        cls.deadlift = Exercise.objects.create(name='Deadlift')
+        cls.sessions = [
+            Session.objects.create(
+                date=timezone.make_aware(datetime.datetime(2024, 1, day, 9)),
+                session_type=session_type, location=location,
+            )
+            for day in (1, 2, 3)
+        ]
+
+    def add(self, session, exercise=None, **kwargs):
+        return SessionExercise.objects.create(
+            session=self.sessions[session], exercise=exercise or self.squat,
+            **kwargs,
+        )
+
+    def best(self, metric, band, exercise=None):
+        return PersonalBest.objects.filter(
+            exercise=exercise or self.squat, metric=metric, band=band,
+        ).first()
+
+    def assertUpToDate(self):
+        call_command('rebuild_personal_bests', '--check', stdout=io.StringIO())
+
+    def test_incremental_updates(self):
+        first = self.add(0, weight=100.0, sets=3, reps=5)
+        self.assertEqual(self.best('weight', 5).session_exercise, first)
+        # Equalling a personal best does not take it from the first to set it.
+        self.add(1, weight=100.0, sets=3, reps=5)
+        self.assertEqual(self.best('weight', 5).session_exercise, first)
+        second = self.add(2, weight=102.5, sets=3, reps=5)
+        self.assertEqual(self.best('weight', 5).value, 102.5)
+        self.assertEqual(self.best('weight', 5).session_exercise, second)
+        self.assertIsNone(self.best('weight', 3))
+        self.assertUpToDate()
+
+        # The best is found again when its holder gets worse, moves to another
+        # Exercise or is deleted.
+        second.weight = 90.0
+        second.save()
+        self.assertEqual(self.best('weight', 5).session_exercise, first)
+        first.exercise = self.deadlift
+        first.save()
+        self.assertEqual(self.best('weight', 5, self.deadlift).session_exercise, first)
+        self.assertEqual(self.best('weight', 5).value, 100.0)
+        self.assertUpToDate()
+        SessionExercise.objects.filter(exercise=self.squat).delete()
+        self.assertIsNone(self.best('weight', 5))
+        first.delete()
+        self.assertFalse(PersonalBest.objects.exists())
+
+    def test_equal_bests_are_held_by_the_earliest(self):
+        later = self.add(2, weight=100.0, sets=3, reps=5)
+        # Added afterwards, but in an earlier Session.
+        earlier = self.add(1, weight=100.0, sets=3, reps=5)
+        self.assertEqual(self.best('weight', 5).session_exercise, earlier)
+        self.assertUpToDate()
+
+        self.sessions[2].date = timezone.make_aware(datetime.datetime(2023, 12, 31, 9))
+        self.sessions[2].save()
+        self.assertEqual(self.best('weight', 5).session_exercise, later)
+        self.assertUpToDate()
+
+    def test_paces_and_durations(self):
+        slow = self.add(0, distance=5000, duration=1500)
+        fast = self.add(1, distance=5200, duration=1456)
+        sprint = self.add(2, distance=400, duration=60)
+        self.assertEqual(self.best('pace', 5000).session_exercise, fast)
+        self.assertAlmostEqual(self.best('pace', 5000).value, 280.0)
+        self.assertEqual(self.best('pace', 0).session_exercise, sprint)
+        self.assertEqual(self.best('duration', 0).session_exercise, slow)
+        self.assertUpToDate()
+
+        PersonalBest.objects.all().delete()
+        call_command('rebuild_personal_bests', stdout=io.StringIO())
+        self.assertEqual(PersonalBest.objects.count(), 3)
+        self.assertUpToDate()
+
+    def test_inline_badges(self):
+        for weight in (100.0, 90.0, 105.0):
+            self.add(0, weight=weight, sets=3, reps=5)
+        self.client.force_login(self.user)
+        url = reverse('admin:workouts_session_change', args=[self.sessions[0].pk])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertContains(response, 'Weight × 5 reps', count=1)
+        self.assertEqual(
+            len([q for q in queries if 'workouts_personalbest' in q['sql']]), 1,
+        )
+
+class WorkoutAdminTests(TestCase):
+    """ The workouts admin pages should make the same number of queries however
+    many rows they display.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        cls.session_types = [
+            SessionType.objects.create(name=name) for name in ('Legs', 'Arms')
+        ]
+        cls.locations = [
+            Location.objects.create(name=name) for name in ('Gym', 'Park')
+        ]
+        cls.exercises = [
+            Exercise.objects.create(name=f'Exercise {i}') for i in range(5)
+        ]
+        cls.session = cls.add_session(0)
+
+    @classmethod
+    def add_session(cls, i):
+        session = Session.objects.create(
+            date=timezone.now() - datetime.timedelta(days=i),
+            session_type=cls.session_types[i % 2], location=cls.locations[i % 2],
+        )
+        for exercise in cls.exercises[:i % 5 + 1]:
+            SessionExercise.objects.create(
+                session=session, exercise=exercise, weight=50.0, sets=3, reps=10,
+            )
+        return session
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def query_counts(self, urls):
+        counts = []
+        for url in urls:
+            # Count the queries once the facet counts and choices are cached.
+            self.client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        return counts
+
+    def test_fixed_query_counts(self):
+        se = SessionExercise.objects.filter(session=self.session).first()
+        urls = [
+            reverse('admin:workouts_session_changelist'),
+            reverse('admin:workouts_sessionexercise_changelist'),
+            reverse('admin:workouts_session_change', args=[self.session.pk]),
+            reverse('admin:workouts_sessionexercise_change', args=[se.pk]),
+            reverse('admin:workouts_personalbest_changelist'),
+        ]
+        before = self.query_counts(urls)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(1, 20):
+                self.add_session(i)
+            for exercise in self.exercises:
+                SessionExercise.objects.create(
+                    session=self.session, exercise=exercise, sets=3, reps=10,
+                )
+        self.assertEqual(self.query_counts(urls), before)
+
+    def test_facet_counts(self):
+        url = reverse('admin:workouts_sessionexercise_changelist')
+        self.assertContains(self.client.get(url), 'Exercise 0 (1)')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_session(1)
+        response = self.client.get(url)
+        self.assertContains(response, 'Exercise 0 (2)')
+        self.assertContains(response, 'Exercise 2 (0)')
 
-# Create your tests here.
+        response = self.client.get(reverse('admin:workouts_session_changelist'))
+        self.assertContains(response, 'Legs (1)')
+        self.assertContains(response, 'Park (1)')
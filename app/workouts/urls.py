@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'workouts'
+urlpatterns = [
+    path('exercises/', views.exercise_summary, name='exercise_summary'),
+    path(
+        'exercises/<int:exercise_id>/records/', views.exercise_records,
+        name='exercise_records',
+    ),
+    path(
+        'exercises/<int:exercise_id>/bests/', views.exercise_personal_bests,
+        name='exercise_personal_bests',
+    ),
+    path('load/', views.training_load, name='training_load'),
+]
@@ -1,3 +1,121 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.http import Http404, JsonResponse
 
-# Create your views here.
+from fitnesstracker.asynchronous import (
+    aiterator, async_require_GET, async_staff_member_required,
+)
+from fitnesstracker.export import parse_export_date
+from .analytics import (
+    RECORD_METRICS, exercise_summaries, personal_records, weekly_load,
+)
+from .models import Exercise, PersonalBest
+
+@async_staff_member_required
+@async_require_GET
+async def exercise_summary(request):
+    """ Return the totals and bests of every Exercise as JSON. The optional
+    parameters start and end are ISO 8601 dates to limit the SessionExercises
+    to.
+    """
+    try:
+        start = parse_export_date(request.GET.get('start'))
+        end = parse_export_date(request.GET.get('end'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'exercises': [
+            exercise async for exercise in aiterator(exercise_summaries(start, end))
+        ],
+    })
+
+@async_staff_member_required
+@async_require_GET
+async def exercise_records(request, exercise_id):
+    """ Return the history of the personal records of an Exercise as JSON, for
+    the estimated_1rm, or the metric given in the metric parameter.
+    """
+    try:
+        exercise = await Exercise.objects.aget(pk=exercise_id)
+    except Exercise.DoesNotExist:
+        raise Http404('No Exercise matches the given query.')
+    metric = request.GET.get('metric', 'estimated_1rm')
+    if metric not in RECORD_METRICS:
+        return JsonResponse({'error': f'Invalid metric: {metric}'}, status=400)
+
+    records = []
+    previous = None
+    rows = personal_records(exercise, metric).values(
+        'pk', 'session_id', 'session__date', 'weight', 'sets', 'reps',
+        'distance', 'duration', metric,
+    )
+    async for row in aiterator(rows):
+        records.append({
+            'id': row['pk'],
+            'session': row['session_id'],
+            'date': row['session__date'],
+            'weight': row['weight'],
+            'sets': row['sets'],
+            'reps': row['reps'],
+            'distance': row['distance'],
+            'duration': row['duration'],
+            'value': row[metric],
+            'previous_best': previous,
+        })
+        previous = row[metric]
+    return JsonResponse({
+        'exercise': {'id': exercise.pk, 'name': exercise.name},
+        'metric': metric,
+        'records': records,
+    })
+
+@async_staff_member_required
+@async_require_GET
+async def exercise_personal_bests(request, exercise_id):
+    """ Return the current PersonalBests of an Exercise as JSON. """
+    try:
+        exercise = await Exercise.objects.aget(pk=exercise_id)
+    except Exercise.DoesNotExist:
+        raise Http404('No Exercise matches the given query.')
+
+    bests = PersonalBest.objects.filter(exercise=exercise).values(
+        'metric', 'band', 'value', 'session_exercise_id',
+        'session_exercise__session_id', 'session_exercise__session__date',
+    )
+    return JsonResponse({
+        'exercise': {'id': exercise.pk, 'name': exercise.name},
+        'personal_bests': [
+            {
+                'metric': best['metric'],
+                'band': best['band'],
+                'value': best['value'],
+                'session_exercise': best['session_exercise_id'],
+                'session': best['session_exercise__session_id'],
+                'date': best['session_exercise__session__date'],
+            }
+            async for best in aiterator(bests)
+        ],
+    })
+
+@async_staff_member_required
+@async_require_GET
+async def training_load(request):
+    """ Return the weekly training load and acute:chronic workload ratio as
+    JSON. The optional parameters are:
+
+    * load: volume (the default), duration, distance or calories.
+    * exercise: the ID of an Exercise to limit the load to.
+    * start and end: ISO 8601 dates to limit the weeks to.
+    """
+    try:
+        start = parse_export_date(request.GET.get('start'))
+        end = parse_export_date(request.GET.get('end'))
+        exercise = request.GET.get('exercise')
+        if exercise is not None:
+            exercise = int(exercise)
+        weeks = await sync_to_async(weekly_load)(
+            request.GET.get('load', 'volume'), exercise, start, end,
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({'weeks': weeks})